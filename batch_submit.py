@@ -0,0 +1,342 @@
+# Headless HUD and deadline submission of many shots.
+#
+# No window created, every scene handled by its own mayapy worker
+# process and a few workers run in parallel. A worker
+#   1. opens the scene
+#   2. builds or updates the HUD of the cameras from a json HUD preset
+#   3. submits the HW2.0 render of every camera, the Draft mov and the
+#      publish when asked, through SubmitToDeadline. Every camera
+#      renders its own render snapshot scene, the working scene is
+#      only saved with --no-submit
+# and writes its result as json. The summary of all the shots printed
+# as json once every worker finished. The controlling process does not
+# import maya, it can run from mayapy or any python.
+#
+# Example
+#   mayapy -m playblast_manager.batch_submit --scenes shot_010.ma shot_020.ma
+#          --cameras shotCam --hud-preset anim_hud.json --workers 4
+#          --pool anim --publish-mov
+#
+# Shot summary
+#   {"scene": "shot_010.ma", "status": "submitted", "error": "",
+#    "cameras": {"|shotCam": {"hud": "hud__shotCam_Text_HUD",
+#                             "jobs": {"Deadline Maya Job ID": "6530..."},
+#                             "error": ""}},
+#    "log": ".../0000.log", "seconds": 42.1}
+#
+# --publish-mov needs the toolkit engine of the shot, started by the
+# mayapy of the studio environment.
+#
+from __future__ import print_function
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+
+# "Deadline Maya Job ID=6530a1...", the lines of the submission messages
+JOB_ID_PATTERN = re.compile(r'^(?P<label>.+?)=(?P<job_id>\S+)$')
+
+
+def get_job_ids(msgs):
+
+    """ Returns dictionary of the job label and the job id out of the
+    submission messages"""
+
+    job_ids = {}
+    for line in msgs.splitlines():
+        match = JOB_ID_PATTERN.match(line.strip())
+        if match:
+            job_ids[match.group('label')] = match.group('job_id')
+    return job_ids
+
+
+def submit_scene(job):
+
+    """ Build the HUDs and submit the cameras of the open scene
+
+    Args:
+        job: dictionary of the worker options
+
+    Returns:
+        dictionary of the camera and its result"""
+
+    import maya.cmds as cmds
+    from . import hud_rig
+    from . import scene_query
+    from . import submit_to_deadline
+    from .hud_oprations import HardwareRenderOperations
+
+    config = hud_rig.load_preset(job['hud_preset']) if job['hud_preset'] else None
+    burn_in = config is not None and hud_rig.get_mode_index(config) == hud_rig.HUD_BURN_IN
+
+    cameras = job['cameras'] or scene_query.SceneSnapshot().cameras
+    results = {}
+    found_cameras = []
+    for camera in cameras:
+        long_names = cmds.ls(camera, long=True)
+        if not long_names:
+            results[camera] = {'hud': '', 'jobs': {}, 'error': "camera not found"}
+            continue
+        results[long_names[0]] = {'hud': '', 'jobs': {}, 'error': ''}
+        found_cameras.append(long_names[0])
+
+    if config is not None and not burn_in:
+        for camera in list(found_cameras):
+            try:
+                results[camera]['hud'] = hud_rig.apply_hud(camera, config)
+            except Exception as err:
+                # Not submitted without its HUD, the other cameras go on
+                results[camera]['error'] = "HUD failed: %s" %err
+                found_cameras.remove(camera)
+
+    if job['no_submit']:
+        cmds.file(save=True, force=True)
+        return results
+
+    scene_file = cmds.file(query=True, sceneName=True)
+    scene_name = os.path.splitext(os.path.basename(scene_file))[0]
+    start_frame = job['start_frame']
+    if start_frame is None:
+        start_frame = int(cmds.playbackOptions(q=True, min=True))
+    end_frame = job['end_frame']
+    if end_frame is None:
+        end_frame = int(cmds.playbackOptions(q=True, max=True))
+    folder_path = job['folder_path'] or \
+                  cmds.workspace(q=True, rootDirectory=True) + "images/"
+    job_name = job['job_name'] or scene_name
+    file_name = job['file_name'] or scene_name
+
+    submissions = []
+    for camera in found_cameras:
+        burn_in_lines, burn_in_frame_counter = \
+                    hud_rig.get_burn_in_lines(config, camera) if burn_in else ([], False)
+        camera_job_name = job_name
+        camera_file_name = file_name
+        if len(found_cameras) > 1:
+            camera_short_name = camera.split('|')[-1].replace(':', '_')
+            camera_job_name = "%s_%s" %(job_name, camera_short_name)
+            camera_file_name = "%s_%s" %(file_name, camera_short_name)
+        try:
+            render_operations = HardwareRenderOperations(
+                        job_name,
+                        camera_job_name,
+                        job['comment'],
+                        job['pool'],
+                        job['priority'],
+                        job['chunksize'],
+                        1,
+                        camera,
+                        start_frame,
+                        end_frame,
+                        scene_file,
+                        folder_path=folder_path,
+                        file_name=camera_file_name,
+                        publish_mov=job['publish_mov'],
+                        submit_farm=True,
+                        draft_segment_size=job['draft_segment_size'],
+                        encode_profile=job['encode_profile'],
+                        burn_in_lines=burn_in_lines,
+                        burn_in_frame_counter=burn_in_frame_counter
+            )
+            # Every camera renders its own snapshot scene
+            submissions.append((camera, render_operations.do_render()))
+        except Exception as err:
+            results[camera]['error'] = str(err)
+
+    # The job chains of the cameras submitted in parallel as one batch,
+    # every submission keeps the messages of its own jobs and the batch
+    # keeps the error of every camera
+    submit_errors = [''] * len(submissions)
+    try:
+        if len(submissions) > 1:
+            batch = submit_to_deadline.SubmitBatchToDeadline(
+                        [submission for camera, submission in submissions],
+                        batch_name=job_name
+            )
+            batch.submit()
+            submit_errors = batch.errors
+        elif submissions:
+            submissions[0][1].submit()
+    except Exception as err:
+        submit_errors = [str(err)] * len(submissions)
+    for (camera, submission), submit_error in zip(submissions, submit_errors):
+        results[camera]['error'] = submit_error.strip()
+        results[camera]['jobs'] = get_job_ids(submission.msgs)
+        if not results[camera]['jobs'] and not results[camera]['error']:
+            results[camera]['error'] = submission.msgs.strip() or "nothing submitted"
+    return results
+
+
+def run_worker(job_file):
+
+    """ Worker process, handles a single scene and writes its result
+    file"""
+
+    with open(job_file, "r") as read_file:
+        job = json.load(read_file)
+    result = {'scene': job['scene'], 'status': 'failed', 'cameras': {}, 'error': ''}
+
+    import maya.standalone
+    maya.standalone.initialize(name='python')
+    try:
+        import maya.cmds as cmds
+        cmds.file(job['scene'], open=True, force=True)
+        result['cameras'] = submit_scene(job)
+        failed = [camera for camera, camera_result in result['cameras'].items()
+                  if camera_result['error']]
+        if not result['cameras']:
+            result['error'] = "no camera found"
+        elif failed:
+            result['error'] = "%s of %s cameras failed" %(len(failed), len(result['cameras']))
+        else:
+            result['status'] = 'hud_only' if job['no_submit'] else 'submitted'
+    except Exception as err:
+        result['error'] = str(err)
+    finally:
+        with open(job['result_file'], "w") as write_file:
+            json.dump(result, write_file, indent=4)
+        maya.standalone.uninitialize()
+    return 0 if result['status'] != 'failed' else 1
+
+
+def run_scenes(scenes, job, workers=2, mayapy=''):
+
+    """ Run a worker process for every scene, at most workers of them
+    at once
+
+    Args:
+        scenes: maya scene files
+        job: dictionary of the worker options shared by all the scenes
+        workers: parallel worker processes
+        mayapy: mayapy executable
+
+    Returns:
+        list of the shot summaries in the order of the scenes"""
+
+    mayapy = mayapy or os.environ.get('MAYAPY', '') or sys.executable
+    work_dir = tempfile.mkdtemp(prefix='playblast_batch_')
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    package_name = os.path.basename(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+                [package_dir] + [path for path in [env.get('PYTHONPATH')] if path]
+    )
+
+    def run(index_scene):
+        index, scene = index_scene
+        job_file = os.path.join(work_dir, "%04d.json" %index)
+        log_file = os.path.join(work_dir, "%04d.log" %index)
+        scene_job = dict(job)
+        scene_job['scene'] = scene
+        scene_job['result_file'] = os.path.join(work_dir, "%04d.result.json" %index)
+        with open(job_file, "w") as write_file:
+            json.dump(scene_job, write_file, indent=4)
+
+        start = time.time()
+        with open(log_file, "w") as log:
+            return_code = subprocess.call([mayapy,
+                                           '-m', '%s.batch_submit' %package_name,
+                                           '--worker', job_file],
+                                          stdout=log,
+                                          stderr=subprocess.STDOUT,
+                                          env=env)
+        try:
+            with open(scene_job['result_file'], "r") as read_file:
+                result = json.load(read_file)
+        except (IOError, OSError, ValueError):
+            result = {'scene': scene, 'status': 'failed', 'cameras': {},
+                      'error': "worker exited with %s" %return_code}
+        result['log'] = log_file
+        result['seconds'] = round(time.time() - start, 2)
+        sys.stderr.write("%s %s %s\n" %(result['status'], scene, result['error']))
+        sys.stderr.flush()
+        return result
+
+    pool = ThreadPool(max(1, workers))
+    try:
+        return pool.map(run, list(enumerate(scenes)))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
+
+    parser = argparse.ArgumentParser(
+                description="Build the HUDs and submit many shots to deadline")
+    parser.add_argument('--worker', default='', help=argparse.SUPPRESS)
+    parser.add_argument('--scenes', nargs='+', default=[],
+                        help="maya scene files")
+    parser.add_argument('--scene-list', default='',
+                        help="text file of maya scene files, one per line")
+    parser.add_argument('--cameras', nargs='+', default=[],
+                        help="cameras of every scene, defaults to all the cameras")
+    parser.add_argument('--hud-preset', default='',
+                        help="json HUD preset, the HUDs are left as they are without it")
+    parser.add_argument('--workers', type=int, default=2,
+                        help="parallel mayapy worker processes")
+    parser.add_argument('--mayapy', default='',
+                        help="mayapy executable, defaults to $MAYAPY or this python")
+    parser.add_argument('--no-submit', action='store_true',
+                        help="only build the HUDs and save the scenes")
+    parser.add_argument('--job-name', default='',
+                        help="deadline batch name, defaults to the scene name")
+    parser.add_argument('--file-name', default='',
+                        help="exr and mov name, defaults to the scene name")
+    parser.add_argument('--folder-path', default='',
+                        help="exr folder, defaults to the workspace images folder")
+    parser.add_argument('--comment', default='')
+    parser.add_argument('--pool', default='none')
+    parser.add_argument('--priority', type=int, default=50)
+    parser.add_argument('--chunksize', type=int, default=10)
+    parser.add_argument('--start-frame', type=int, default=None)
+    parser.add_argument('--end-frame', type=int, default=None)
+    parser.add_argument('--publish-mov', action='store_true')
+    parser.add_argument('--draft-segment-size', type=int, default=0)
+    parser.add_argument('--encode-profile', default='dnxhd_1080')
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        return run_worker(args.worker)
+
+    scenes = list(args.scenes)
+    if args.scene_list:
+        with open(args.scene_list, "r") as read_file:
+            scenes += [line.strip() for line in read_file if line.strip()]
+    if not scenes:
+        parser.error("no scene given")
+    if args.hud_preset and not os.path.isfile(args.hud_preset):
+        parser.error("HUD preset %s not found" %args.hud_preset)
+
+    job = {
+        'cameras': args.cameras,
+        'hud_preset': os.path.abspath(args.hud_preset) if args.hud_preset else '',
+        'no_submit': args.no_submit,
+        'job_name': args.job_name,
+        'file_name': args.file_name,
+        'folder_path': args.folder_path,
+        'comment': args.comment,
+        'pool': args.pool,
+        'priority': args.priority,
+        'chunksize': args.chunksize,
+        'start_frame': args.start_frame,
+        'end_frame': args.end_frame,
+        'publish_mov': args.publish_mov,
+        'draft_segment_size': args.draft_segment_size,
+        'encode_profile': args.encode_profile
+    }
+    results = run_scenes([os.path.abspath(scene) for scene in scenes],
+                         job,
+                         workers=args.workers,
+                         mayapy=args.mayapy)
+    print(json.dumps(results, indent=4))
+    return 0 if all(result['status'] != 'failed' for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
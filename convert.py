@@ -1,12 +1,419 @@
 # Creating the Draft job for deadline. 
 # Takes the exr renders as inputs. loop through each exrs
 # aply the gamma, encode to the mov and make movie
+#
+# Three modes selected through the 'mode' script argument
+#   full    - (default) encode the whole frame range into the mov
+#   segment - encode only the frames of the current deadline task
+#             (taskStartFrame - taskEndFrame) into a segment mov.
+#             The tasks of the job run in parallel on the farm
+#   concat  - stitch all the segment movs into the delivered mov. 
+#             The packets are copied by the ffmpeg concat demuxer, 
+#             nothing is decoded or encoded again. The ffmpeg script 
+#             argument is the ffmpeg executable (default ffmpeg on the
+#             PATH of the worker)
+#
+# The exrs read ahead on background threads while the encoder consumes
+# the current frame. Optional script arguments
+#   prefetch_depth     - maximum frames read ahead (default 4)
+#   prefetch_threads   - reader threads (default 2)
+#   prefetch_memory_mb - memory cap of the read ahead frames (default 2048)
+#
+# The encode profile resolved by the submission passed as the width, 
+# height, codec and kbit_rate script arguments. Frames of a different
+# size, likewise the half resolution proxy, are resized right after 
+# the read on the reader threads
+#
+# Encodes are incremental and resumable
+#   - Every finished mov gets a <mov>.encode.json manifest of the frame
+#     range and the encoder settings. A mov matching the manifest and
+#     newer than every source exr is not encoded again
+#   - With the checkpoint_size script argument the full mode encodes
+#     checkpoint segments and concatenates them. A requeued task skips
+#     the segments already completed and resumes from the first 
+#     missing one. The segments stitched like the concat mode, without
+#     re-encoding, and deleted once the mov is written. checkpoint_size 
+#     0 (default), or a range of a single checkpoint, encodes the mov 
+#     in one go and needs no ffmpeg
+#   - Movs written under a .partial name and moved in place once 
+#     finalized, so an interrupted encode never looks complete
+#
+# Burn in HUD. With the burn_in_file script argument the HUD lines of
+# the json file drawn at the top left of every frame and the frame 
+# counter at the top right, right after the read on the reader threads.
+# The HUD is part of the manifest, a changed HUD text re-encodes the 
+# mov without any re-render
 
+import json
+import os
+import shutil
+import subprocess
 import sys
+import threading
+import time
 import Draft
 from DraftParamParser import (ReplaceFilenameHashesWithNumber,
                               ParseCommandLine)
 
+# Replaced by the script arguments, defaults are the dnxhd_1080 profile
+ENCODER_SETTINGS = dict(width = 1920,
+                        height = 1080,
+                        codec='DNXHD',
+                        kbitRate= 36000)
+
+# Replaced by the ffmpeg script argument
+FFMPEG_EXECUTABLE = 'ffmpeg'
+
+# Loaded from the burn_in_file script argument
+BURN_IN = dict(lines=[], frame_counter=False)
+burn_in_annotations = {}
+burn_in_lock = threading.Lock()
+
+
+def get_segments(start_frame, end_frame, segment_size):
+
+    """ Split the encoded frame range into (first, last) segments. 
+    The submission sets the deadline task chunks to the same size so
+    every task encodes exactly one segment"""
+
+    segments = []
+    for first_frame in range(start_frame, end_frame, segment_size):
+        last_frame = min(first_frame + segment_size, end_frame) - 1
+        segments.append((first_frame, last_frame))
+    return segments
+
+
+def create_annotation(text, frame_height):
+
+    """ Returns white text annotation scaled to the frame height"""
+
+    annotation_info = Draft.AnnotationInfo()
+    annotation_info.PointSize = max(8, int(frame_height * 0.022))
+    annotation_info.Color = Draft.ColorRGBA( 1.0, 1.0, 1.0, 1.0 )
+    return Draft.Image.CreateAnnotation( text, annotation_info )
+
+
+def burn_in_frame(frame, currFrame):
+
+    """ Draw the HUD lines at the top left and the frame counter at 
+    the top right of the frame. The annotations of the static lines 
+    created once and shared by all the frames"""
+
+    if not BURN_IN['lines'] and not BURN_IN['frame_counter']:
+        return
+    with burn_in_lock:
+        annotations = burn_in_annotations.get(frame.height)
+        if annotations is None:
+            annotations = [create_annotation(line, frame.height) 
+                           for line in BURN_IN['lines']]
+            burn_in_annotations[frame.height] = annotations
+
+    for index, annotation in enumerate(annotations):
+        frame.CompositeWithPositionAndGravity( 
+                    annotation, 0.02, 0.97 - index * 0.035,
+                    Draft.PositionalGravity.NorthWestGravity,
+                    Draft.CompositeOperator.OverCompositeOp )
+    if BURN_IN['frame_counter']:
+        counter = create_annotation("Frame No: %s" %currFrame, frame.height)
+        frame.CompositeWithPositionAndGravity( 
+                    counter, 0.98, 0.97,
+                    Draft.PositionalGravity.NorthEastGravity,
+                    Draft.CompositeOperator.OverCompositeOp )
+
+
+def get_segment_path(mov, first_frame, last_frame):
+
+    """ Returns segment mov path, likewise 
+    shot_v001_segments/shot_v001.1001-1100.mov"""
+
+    mov_root, extension = os.path.splitext(mov)
+    return os.path.join(mov_root + "_segments",
+                        "%s.%s-%s%s" %(os.path.basename(mov_root),
+                                       first_frame,
+                                       last_frame,
+                                       extension))
+
+
+def delete_segments(mov):
+
+    """ Delete the segment movs of the mov once it is written"""
+
+    mov_root, extension = os.path.splitext(mov)
+    shutil.rmtree(mov_root + "_segments", ignore_errors=True)
+
+
+class FramePrefetcher:
+
+    """ Bounded read ahead of the exr frames
+
+    Reader threads load and gamma correct the upcoming frames while the
+    encoder consumes the current one. At most 'depth' frames are read 
+    ahead and not yet encoded. The depth is lowered further so the read
+    ahead frames stay below the memory cap, the frame size taken from 
+    the first frame read.
+
+    Iterating yields the Draft images in frame order"""
+
+    def __init__(self, exr, frames, depth=4, threads=2, memory_cap_mb=2048):
+
+        self.exr = exr
+        self.frames = list(frames)
+        self.depth = max(1, depth)
+        self.threads = max(1, threads)
+        self.memory_cap_mb = memory_cap_mb
+        self.read_seconds = 0.0
+
+        self.results = {}
+        self.next_index = 0
+        self.stopped = False
+        self.condition = threading.Condition()
+
+    def read_frame(self, currFrame):
+
+        """ Read and gamma correct a single frame"""
+
+        currFile = ReplaceFilenameHashesWithNumber( self.exr, currFrame )
+        frame = Draft.Image.ReadFromFile( currFile )
+        if frame.width != ENCODER_SETTINGS['width'] or \
+                    frame.height != ENCODER_SETTINGS['height']:
+            frame.Resize( ENCODER_SETTINGS['width'], 
+                          ENCODER_SETTINGS['height'] )
+        lut = Draft.LUT.CreateGamma( 1.0 )
+        lut.Apply( frame )
+        burn_in_frame( frame, currFrame )
+        return frame
+
+    def __reader(self):
+
+        while True:
+            self.slots.acquire()
+            with self.condition:
+                index = self.next_index
+                self.next_index += 1
+            if self.stopped or index >= len(self.frames):
+                self.slots.release()
+                return
+            start = time.time()
+            try:
+                result = self.read_frame(self.frames[index])
+            except Exception as err:
+                result = err
+            with self.condition:
+                self.read_seconds += time.time() - start
+                self.results[index] = result
+                self.condition.notify_all()
+
+    def __set_depth(self, frame):
+
+        """ Lower the depth to fit the memory cap. Draft images hold 
+        4 float channels per pixel"""
+
+        frame_mb = frame.width * frame.height * 4 * 4 / (1024.0 * 1024.0)
+        memory_depth = int(self.memory_cap_mb // max(frame_mb, 1))
+        self.depth = max(1, min(self.depth, memory_depth))
+        print("Prefetch depth %s frames (%.1f MB per frame)" %(self.depth, frame_mb))
+
+    def __iter__(self):
+
+        if not self.frames:
+            return
+
+        # First frame read in the caller thread to know the frame size
+        start = time.time()
+        frame = self.read_frame(self.frames[0])
+        self.read_seconds += time.time() - start
+        self.__set_depth(frame)
+
+        self.next_index = 1
+        self.slots = threading.Semaphore(self.depth)
+        readers = []
+        for thread_index in range(min(self.threads, len(self.frames) - 1)):
+            reader = threading.Thread(target=self.__reader)
+            reader.daemon = True
+            reader.start()
+            readers.append(reader)
+
+        try:
+            yield frame
+            for index in range(1, len(self.frames)):
+                with self.condition:
+                    while index not in self.results:
+                        self.condition.wait()
+                    frame = self.results.pop(index)
+                if isinstance(frame, Exception):
+                    raise frame
+                yield frame
+                # Encoded, the slot free for the next read ahead frame
+                self.slots.release()
+        finally:
+            # Wake up the readers waiting for a slot so they can exit
+            self.stopped = True
+            for reader in readers:
+                self.slots.release()
+
+
+def create_directory(folder_path):
+
+    """ Create folders if not exist"""
+
+    try:
+        os.makedirs(folder_path)
+    except OSError:
+        # Created by a task of the same job running in parallel
+        if not os.path.isdir(folder_path):
+            raise
+
+
+def get_partial_path(mov):
+
+    """ Returns the path the mov written to until finalized"""
+
+    mov_root, extension = os.path.splitext(mov)
+    return mov_root + ".partial" + extension
+
+
+def replace_file(source, destination):
+
+    if os.path.exists(destination):
+        os.remove(destination)
+    os.rename(source, destination)
+
+
+def get_encode_manifest(exr, frames):
+
+    """ Returns the manifest describing an encode of the frames"""
+
+    return {
+        'exr': exr,
+        'first_frame': frames[0] if frames else None,
+        'last_frame': frames[-1] if frames else None,
+        'frame_count': len(frames),
+        'encoder': ENCODER_SETTINGS,
+        'burn_in': BURN_IN
+    }
+
+
+def write_encode_manifest(mov, exr, frames):
+
+    with open(mov + ".encode.json", "w") as write_file:
+        json.dump(get_encode_manifest(exr, frames), write_file, indent=4)
+
+
+def is_up_to_date(mov, exr, frames):
+
+    """ Returns true if the mov was encoded from the same frame range 
+    with the same settings and is newer than every source exr"""
+
+    if not os.path.exists(mov):
+        return False
+    try:
+        with open(mov + ".encode.json", "r") as read_file:
+            manifest = json.load(read_file)
+    except (IOError, OSError, ValueError):
+        return False
+    if manifest != get_encode_manifest(exr, frames):
+        return False
+
+    mov_mtime = os.path.getmtime(mov)
+    for currFrame in frames:
+        currFile = ReplaceFilenameHashesWithNumber( exr, currFrame )
+        if not os.path.exists(currFile) or \
+                    os.path.getmtime(currFile) > mov_mtime:
+            return False
+    return True
+
+
+def encode_mov(mov, exr, frames, **prefetch):
+
+    """ Encode the frames into the mov unless it is up to date. 
+    Written under the partial name and moved in place when done"""
+
+    frames = list(frames)
+    if not frames:
+        raise RuntimeError("No frames to encode into %s" %mov)
+    if is_up_to_date(mov, exr, frames):
+        print("%s is up to date, skipping the encode" %mov)
+        return
+    partial_mov = get_partial_path(mov)
+    encode_frames(partial_mov, exr, frames, **prefetch)
+    replace_file(partial_mov, mov)
+    write_encode_manifest(mov, exr, frames)
+
+
+def encode_frames(mov, exr, frames, 
+                  prefetch_depth=4, 
+                  prefetch_threads=2, 
+                  prefetch_memory_mb=2048):
+
+    """ Read, gamma correct and encode the exr frames into the mov. 
+    The read stage and the encode stage timings printed into the 
+    deadline task log"""
+
+    frames = list(frames)
+    prefetcher = FramePrefetcher(exr, frames, 
+                                 depth=prefetch_depth,
+                                 threads=prefetch_threads,
+                                 memory_cap_mb=prefetch_memory_mb)
+    encode_seconds = 0.0
+    wall_start = time.time()
+    encoder = Draft.VideoEncoder( mov, **ENCODER_SETTINGS )   # Initialize the video encoder.
+    for frame in prefetcher:
+        start = time.time()
+        encoder.EncodeNextFrame( frame )    # Add each frame to the video.
+        encode_seconds += time.time() - start
+
+    start = time.time()
+    encoder.FinalizeEncoding()    # Finalize and save the resulting video.
+    encode_seconds += time.time() - start
+    wall_seconds = time.time() - wall_start
+
+    frame_count = len(frames)
+    print("Read stage: %s frames, %.2f sec, %.2f fps per reader thread" %(
+        frame_count, prefetcher.read_seconds, 
+        frame_count / max(prefetcher.read_seconds, 1e-6)))
+    print("Encode stage: %s frames, %.2f sec, %.2f fps" %(
+        frame_count, encode_seconds, 
+        frame_count / max(encode_seconds, 1e-6)))
+    print("Total: %s frames, %.2f sec, %.2f fps" %(
+        frame_count, wall_seconds, 
+        frame_count / max(wall_seconds, 1e-6)))
+
+
+def concat_segments(mov, segment_movs):
+
+    """ Stitch the segment movs into the mov without re-encoding. 
+    
+    The segments share the encoder settings, the ffmpeg concat demuxer
+    copies their packets one after the other into the mov"""
+
+    missing = [segment for segment in segment_movs if not os.path.exists(segment)]
+    if missing:
+        raise RuntimeError("Missing encoded segments:\n%s" %"\n".join(missing))
+
+    partial_mov = get_partial_path(mov)
+    list_file = partial_mov + ".concat.txt"
+    with open(list_file, "w") as write_file:
+        for segment_mov in segment_movs:
+            # Quotes of the path escaped the concat demuxer way
+            write_file.write("file '%s'\n" %os.path.abspath(segment_mov).replace(
+                                                    "\\", "/").replace("'", "'\\''"))
+    command = [FFMPEG_EXECUTABLE, '-y', '-hide_banner', '-loglevel', 'error',
+               '-f', 'concat', '-safe', '0', '-i', list_file,
+               '-map', '0', '-c', 'copy', partial_mov]
+    print("Concat: %s" %" ".join(command))
+    try:
+        return_code = subprocess.call(command)
+    except OSError as err:
+        raise RuntimeError("ffmpeg %s could not be started, set the ffmpeg "
+                           "script argument\n%s" %(FFMPEG_EXECUTABLE, err))
+    finally:
+        os.remove(list_file)
+    if return_code:
+        raise RuntimeError("ffmpeg concat of %s segments failed with exit code %s" 
+                           %(len(segment_movs), return_code))
+    replace_file(partial_mov, mov)
+
+
 expectedTypes = dict()
 params = ParseCommandLine( expectedTypes, sys.argv )
 mov = params['mov'] 
@@ -14,17 +421,65 @@ exr = params['exr'].split("$F4")
 exr = exr[0] + '####.exr'
 start_frame = int(params['start_frame'])
 end_frame = int(params['end_frame'])
+mode = params.get('mode', 'full')
+ENCODER_SETTINGS.update(
+    width=int(params.get('width', ENCODER_SETTINGS['width'])),
+    height=int(params.get('height', ENCODER_SETTINGS['height'])),
+    codec=params.get('codec', ENCODER_SETTINGS['codec']),
+    kbitRate=int(params.get('kbit_rate', ENCODER_SETTINGS['kbitRate']))
+)
+prefetch = dict(
+    prefetch_depth=int(params.get('prefetch_depth', 4)),
+    prefetch_threads=int(params.get('prefetch_threads', 2)),
+    prefetch_memory_mb=int(params.get('prefetch_memory_mb', 2048))
+)
+checkpoint_size = int(params.get('checkpoint_size', 0))
+FFMPEG_EXECUTABLE = params.get('ffmpeg', FFMPEG_EXECUTABLE)
+if params.get('burn_in_file'):
+    with open(params['burn_in_file'], "r") as read_file:
+        BURN_IN.update(json.load(read_file))
+frames = list(range( start_frame, end_frame ))
+if not frames:
+    raise RuntimeError("Empty frame range %s-%s" %(start_frame, end_frame))
+
+if mode == 'segment':
+    # Deadline passes the frames of the current task 
+    task_start_frame = max(int(params['taskStartFrame']), start_frame)
+    task_end_frame = min(int(params['taskEndFrame']), end_frame - 1)
+    segment_mov = get_segment_path(mov, task_start_frame, task_end_frame)
+    create_directory(os.path.dirname(segment_mov))
+    encode_mov(segment_mov, exr, range( task_start_frame, task_end_frame + 1 ), 
+               **prefetch)
+
+elif mode == 'concat':
+    if is_up_to_date(mov, exr, frames):
+        print("%s is up to date, skipping the concat" %mov)
+    else:
+        segment_size = int(params['segment_size'])
+        segment_movs = [get_segment_path(mov, first_frame, last_frame) 
+                        for first_frame, last_frame in get_segments(start_frame, 
+                                                                    end_frame, 
+                                                                    segment_size)]
+        concat_segments(mov, segment_movs)
+        write_encode_manifest(mov, exr, frames)
+        delete_segments(mov)
+
+elif checkpoint_size and len(frames) > checkpoint_size and \
+            not is_up_to_date(mov, exr, frames):
+    # Every completed checkpoint segment is kept, a requeued task 
+    # encodes only the segments not finished yet
+    segment_movs = []
+    for first_frame, last_frame in get_segments(start_frame, 
+                                                end_frame, 
+                                                checkpoint_size):
+        segment_mov = get_segment_path(mov, first_frame, last_frame)
+        create_directory(os.path.dirname(segment_mov))
+        encode_mov(segment_mov, exr, range( first_frame, last_frame + 1 ),
+                   **prefetch)
+        segment_movs.append(segment_mov)
+    concat_segments(mov, segment_movs)
+    write_encode_manifest(mov, exr, frames)
+    delete_segments(mov)
 
-encoder = Draft.VideoEncoder( mov,
-                                width = 1920,
-                                height = 1080,
-                                codec='DNXHD',
-                                kbitRate= 36000)   # Initialize the video encoder.
-for currFrame in range( start_frame, end_frame ):
-    currFile = ReplaceFilenameHashesWithNumber( exr, currFrame )
-    frame = Draft.Image.ReadFromFile( currFile )
-    lut = Draft.LUT.CreateGamma( 1.0 )
-    lut.Apply( frame )
-    encoder.EncodeNextFrame( frame )    # Add each frame to the video.
-
-encoder.FinalizeEncoding()    # Finalize and save the resulting video.
+else:
+    encode_mov(mov, exr, frames, **prefetch)
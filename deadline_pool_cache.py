@@ -0,0 +1,95 @@
+import json
+import os
+import time
+
+
+class DeadlinePoolCache:
+
+    """Per user on-disk cache of the deadline pool names
+
+    Querying the pools spawns deadlinecommand and can take several
+    seconds when the repository is busy. The cache keeps the last known
+    pool list in a json file inside the user temp directory so the GUI
+    can populate the pool dropdown instantly. The list is considered
+    stale after ttl seconds and should then be refreshed in the
+    background through refresh().
+
+    Cache file layout
+        {"pools": ["none", "anim"], "updated": 1697600000.0,
+         "refresh_seconds": 2.31}
+    """
+
+    def __init__(self, cache_dir='', ttl=3600):
+
+        self.ttl = ttl
+        if not cache_dir:
+            cache_dir = "Y:/pipeline/studio/temp/" + \
+                        os.environ.get('USERNAME', '') + "/" + \
+                        "maya_" + os.environ.get('maya_version', '') + "/"
+        self.cache_file = os.path.join(cache_dir, "deadline_pools.json")
+
+    def read(self):
+
+        """ Read the cache file
+
+        Returns:
+            cache dictionary, empty if there is no readable cache"""
+
+        try:
+            with open(self.cache_file, "r") as read_file:
+                return json.load(read_file)
+        except (IOError, OSError, ValueError):
+            return {}
+
+    def write(self, pools, refresh_seconds):
+
+        """ Write the pools into the cache file. The file written
+        into a temp file first and moved, so a GUI reading the cache
+        never sees a half written file"""
+
+        cache_dir = os.path.dirname(self.cache_file)
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        data = {
+            "pools": pools,
+            "updated": time.time(),
+            "refresh_seconds": refresh_seconds
+        }
+        tmp_file = "%s.%s.tmp" %(self.cache_file, os.getpid())
+        with open(tmp_file, "w") as write_file:
+            json.dump(data, write_file, indent=4)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+        os.rename(tmp_file, self.cache_file)
+
+    def get_pools(self):
+
+        """ Returns the last known pool list, stale or not"""
+
+        return self.read().get("pools", [])
+
+    @property
+    def is_stale(self):
+
+        """ Returns true if cache is missing or older than ttl"""
+
+        updated = self.read().get("updated", 0)
+        return (time.time() - updated) > self.ttl
+
+    def refresh(self, query_pools):
+
+        """ Query the pools and update the cache
+
+        Args:
+            query_pools: callable returns the list of deadline pools.
+                         It is executed in the caller thread
+
+        Returns:
+            tuple of pool list and the seconds took by the query"""
+
+        start = time.time()
+        pools = [pool for pool in query_pools() if pool]
+        refresh_seconds = time.time() - start
+        if pools:
+            self.write(pools, refresh_seconds)
+        return pools, refresh_seconds
@@ -0,0 +1,279 @@
+# Local stand-in of the Deadline Web Service.
+#
+# A small HTTP server answering the requests DeadlineWebServiceTransport
+# sends, so the transport can be checked without a deadline repository
+#   GET  /api/pools             pool names
+#   GET  /api/jobs?JobID=<id>   the job with its "Stat"
+#   POST /api/jobs              submit, answers {"_id": ...}
+# The submitted jobs are kept in memory and the accepted connections
+# counted. drop_next_post makes the server read the next POST and close
+# the connection without an answer, likewise a web service dying after
+# it accepted the job. close_connections closes the idle keep-alive
+# connections from the server side.
+#
+# Running the module checks the transport against the stand-in
+#   python deadline_stand_in.py
+# submit, dependency chain, pools, status, the keep-alive connection
+# shared by all of them, a submission after the server closed the idle
+# connection, the fallback of an unreachable web service and the lost
+# POST answer that must never fall back.
+#
+from __future__ import print_function
+import json
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urlparse import urlparse, parse_qs
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import deadline_transport
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, data, status=200):
+
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        if url.path == '/api/pools':
+            self.send_json(self.server.pools)
+        elif url.path == '/api/jobs':
+            job_id = parse_qs(url.query).get('JobID', [''])[0]
+            job = self.server.jobs.get(job_id)
+            self.send_json([job] if job else [])
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length).decode('utf-8'))
+        if urlparse(self.path).path != '/api/jobs':
+            self.send_json({'error': 'not found'}, status=404)
+            return
+        with self.server.lock:
+            job_id = "%024x" %(len(self.server.jobs) + 1)
+            self.server.jobs[job_id] = {'_id': job_id,
+                                        'Stat': self.server.job_stat,
+                                        'Props': body['JobInfo'],
+                                        'PluginInfo': body['PluginInfo']}
+            drop = self.server.drop_next_post
+            self.server.drop_next_post = False
+        if drop:
+            # Accepted but the answer is lost
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+        self.send_json({'_id': job_id})
+
+
+class StandInDeadlineServer(ThreadingMixIn, HTTPServer):
+
+    """ Stand-in web service served from a background thread. Every
+    connection gets its own thread, the transport keeps its idle
+    keep-alive connections open
+
+    Args:
+        pools: pool names answered by /api/pools
+        job_stat: deadline "Stat" of the submitted jobs, 3 Completed"""
+
+    def __init__(self, pools=('none', 'anim'), job_stat=3):
+
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StandInHandler)
+        self.daemon_threads = True
+        self.pools = list(pools)
+        self.job_stat = job_stat
+        self.jobs = {}
+        self.drop_next_post = False
+        self.accepted = 0
+        self.sockets = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def get_request(self):
+
+        request, client_address = HTTPServer.get_request(self)
+        with self.lock:
+            self.accepted += 1
+            self.sockets.append(request)
+        return request, client_address
+
+    def close_connections(self):
+
+        """ Close every accepted connection from the server side"""
+
+        with self.lock:
+            sockets, self.sockets = self.sockets, []
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+    @property
+    def url(self):
+
+        return "http://127.0.0.1:%s" %self.server_address[1]
+
+    def start(self):
+
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+
+        self.shutdown()
+        self.server_close()
+
+
+class RecordingTransport:
+
+    """ Fallback transport recording the calls instead of spawning
+    deadlinecommand"""
+
+    name = 'recording'
+
+    def __init__(self):
+
+        self.calls = []
+
+    def submit(self, job_files):
+        self.calls.append('submit')
+        return 'fallback_job'
+
+    def submit_multiple(self, jobs):
+        self.calls.append('submit_multiple')
+        return ['fallback_job'] * len(jobs)
+
+    def get_pools(self):
+        self.calls.append('get_pools')
+        return ['fallback_pool']
+
+    def get_job_status(self, job_id):
+        self.calls.append('get_job_status')
+        return 'Unknown'
+
+
+def write_job_files(directory, name):
+
+    job_files = [os.path.join(directory, name + "_job_info.job"),
+                 os.path.join(directory, name + "_plugin_info.job")]
+    for job_file, data in zip(job_files, ({'Name': name, 'Plugin': 'MayaBatch'},
+                                          {'Version': '2020'})):
+        with open(job_file, "w") as write_file:
+            for key, value in data.items():
+                write_file.write(key + "=" + value + "\n")
+    return job_files
+
+
+def get_free_port():
+
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def main():
+
+    failures = []
+
+    def check(name, condition):
+        print("%s %s" %("ok  " if condition else "FAIL", name))
+        if not condition:
+            failures.append(name)
+
+    job_dir = tempfile.mkdtemp(prefix='deadline_stand_in_')
+    server = StandInDeadlineServer().start()
+    web_service = deadline_transport.DeadlineWebServiceTransport(server.url)
+    try:
+        fallback = RecordingTransport()
+        transport = deadline_transport.FallbackTransport(web_service, fallback)
+        maya_job = write_job_files(job_dir, 'maya')
+        draft_job = write_job_files(job_dir, 'draft')
+
+        job_id = transport.submit(maya_job)
+        check("submit returns the job id", job_id in server.jobs)
+        check("submitted job info", server.jobs[job_id]['Props'].get('Name') == 'maya')
+
+        job_ids = transport.submit_multiple([maya_job, draft_job])
+        check("submit_multiple submits every job", len(job_ids) == 2 and
+              all(chain_id in server.jobs for chain_id in job_ids))
+        check("chained job depends on the previous one",
+              server.jobs[job_ids[1]]['Props'].get('JobDependencies') == job_ids[0])
+
+        check("pools", transport.get_pools() == ['none', 'anim'])
+        check("job status", transport.get_job_status(job_id) == 'Completed')
+        check("unknown job status", transport.get_job_status('missing') == 'Unknown')
+        check("no fallback while reachable", not fallback.calls)
+        check("one keep-alive connection for all the requests", server.accepted == 1)
+
+        job_count = len(server.jobs)
+        server.close_connections()
+        job_id = transport.submit(maya_job)
+        check("submit after the server closed the idle connection",
+              job_id in server.jobs and len(server.jobs) == job_count + 1 and
+              server.accepted == 2 and not fallback.calls)
+
+        job_count = len(server.jobs)
+        server.drop_next_post = True
+        try:
+            transport.submit(maya_job)
+            lost_answer_raised = False
+        except deadline_transport.TransportUnavailable:
+            lost_answer_raised = False
+        except RuntimeError:
+            lost_answer_raised = True
+        check("lost POST answer raises without fallback",
+              lost_answer_raised and 'submit' not in fallback.calls)
+        check("lost POST not sent twice", len(server.jobs) == job_count + 1)
+
+        unreachable = deadline_transport.FallbackTransport(
+                    deadline_transport.DeadlineWebServiceTransport(
+                                "http://127.0.0.1:%s" %get_free_port()),
+                    fallback
+        )
+        check("unreachable submit falls back",
+              unreachable.submit(maya_job) == 'fallback_job' and
+              'submit' in fallback.calls)
+        check("unreachable pools fall back",
+              unreachable.get_pools() == ['fallback_pool'])
+    finally:
+        # Idle keep-alive connections closed before the server, the
+        # handler threads would wait on them
+        web_service.pool.close()
+        server.stop()
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+    print("%s checks failed" %len(failures) if failures else "All checks passed")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
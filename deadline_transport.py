@@ -0,0 +1,404 @@
+# Transports used to talk to the deadline repository.
+#
+# Two transports share the same interface:
+#   1. DeadlineCommandTransport - spawns deadlinecommand for every call
+#   2. DeadlineWebServiceTransport - talks to the Deadline Web Service
+#      REST API through a pool of persistent keep-alive connections
+#
+# The transport selected through the environment
+#   PLAYBLAST_DEADLINE_TRANSPORT = command | webservice   (default command)
+#   DEADLINE_WEBSERVICE_URL      = http://deadline-ws:8082
+#
+# The module do not import maya so it can also be used from the
+# farm side scripts. deadline_stand_in.py checks the web service
+# transport against a local stand-in server.
+#
+import json
+import os
+import select
+import socket
+import subprocess
+import threading
+try:
+    import httplib
+    from urlparse import urlparse
+    from urllib import quote
+    import Queue as queue
+except ImportError:
+    import http.client as httplib
+    from urllib.parse import urlparse, quote
+    import queue
+
+# Deadline job "Stat" values returned by the web service
+JOB_STATUS = {
+    0: 'Unknown',
+    1: 'Active',
+    2: 'Suspended',
+    3: 'Completed',
+    4: 'Failed',
+    5: 'Deleted',
+    6: 'Pending'
+}
+
+
+class TransportUnavailable(Exception):
+
+    """ Raised when the transport could not reach the repository
+    before anything was submitted, it is safe to fall back"""
+
+
+def get_deadline_command():
+
+    """ Returns the quoted deadlinecommand executable path"""
+
+    dl_path = os.environ['DEADLINE_PATH']
+    dl_path = dl_path.replace(r"/", "//") + "//deadlinecommand.exe"
+    return '"%s"' %dl_path
+
+
+def read_job_file(job_file):
+
+    """ Read a key=value deadline .job file into a dictionary"""
+
+    data = {}
+    with open(job_file, "r") as read_file:
+        for line in read_file:
+            line = line.rstrip("\n")
+            if "=" in line:
+                key, value = line.split("=", 1)
+                data[key] = value
+    return data
+
+
+class DeadlineCommandTransport:
+
+    """ Transport executing deadlinecommand for every request"""
+
+    name = 'command'
+
+    @staticmethod
+    def __execute(arguments):
+
+        """ Run deadlinecommand with the arguments and return stdout"""
+
+        result = subprocess.Popen('%s %s' %(get_deadline_command(), arguments),
+                                stdout=subprocess.PIPE,
+                                shell=True)
+        output = result.communicate()[0]
+        if not isinstance(output, str):
+            output = output.decode('utf-8')
+        return output
+
+    def submit(self, job_files):
+
+        """ Submit a single job
+
+        Args:
+            job_files: job info, plugin info and auxiliary files
+
+        Returns:
+            job id"""
+
+        output = self.__execute(" ".join(job_files))
+        job_ids = [id for id in output.split() if 'JobID' in id]
+        if not job_ids:
+            raise RuntimeError("Deadline job submission failed\n%s" %output)
+        return job_ids[0].split("=")[-1]
+
+    def submit_multiple(self, jobs):
+
+        """ Submit several jobs in one deadlinecommand invocation
+
+        Uses the deadline multiple job submission. The -dependent flag
+        makes every job depend on the job submitted before it
+
+        Args:
+            jobs: list of job file lists
+
+        Returns:
+            list of job ids in the submission order"""
+
+        arguments = '-SubmitMultipleJobs -dependent'
+        for job_files in jobs:
+            arguments += ' -job %s' %" ".join(job_files)
+        output = self.__execute(arguments)
+        job_ids = [id.split("=")[-1] for id in output.split() if 'JobID' in id]
+        if len(job_ids) != len(jobs):
+            raise RuntimeError("Deadline multiple job submission failed\n%s" %output)
+        return job_ids
+
+    def get_pools(self):
+
+        """ Returns list of pool names"""
+
+        output = self.__execute('-Pools')
+        return [pool.strip() for pool in output.splitlines() if pool.strip()]
+
+    def get_job_status(self, job_id):
+
+        """ Returns the status name of the job, likewise 'Completed'"""
+
+        output = self.__execute('-GetJob %s false' %job_id)
+        for line in output.splitlines():
+            if line.startswith('Status='):
+                return line.split("=", 1)[-1].strip()
+        return 'Unknown'
+
+
+class HTTPConnectionPool:
+
+    """ Thread safe pool of persistent HTTP connections to a single host
+
+    A connection is handed out with acquire() and given back with
+    release() once the response is fully read, so the underlying socket
+    is kept alive and reused by the next request. An idle connection
+    the server closed meanwhile is dropped instead of handed out"""
+
+    def __init__(self, host, port, maxsize=4, timeout=30):
+
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connections = queue.LifoQueue(maxsize)
+
+    @staticmethod
+    def is_dropped(connection):
+
+        """ Returns true if the idle connection is closed. An idle
+        keep-alive socket turns readable only when the server closed it"""
+
+        if connection.sock is None:
+            return True
+        try:
+            return bool(select.select([connection.sock], [], [], 0)[0])
+        except (select.error, socket.error, ValueError):
+            return True
+
+    def acquire(self):
+
+        """ Returns a tuple of connection and whether it was reused, an
+        idle keep-alive connection if any, otherwise a fresh one"""
+
+        while True:
+            try:
+                connection = self.connections.get_nowait()
+            except queue.Empty:
+                break
+            if not self.is_dropped(connection):
+                return connection, True
+            connection.close()
+        return httplib.HTTPConnection(self.host,
+                                      self.port,
+                                      timeout=self.timeout), False
+
+    def release(self, connection):
+
+        try:
+            self.connections.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self):
+
+        while True:
+            try:
+                self.connections.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+class DeadlineWebServiceTransport:
+
+    """ Transport talking to the Deadline Web Service REST API
+
+    Args:
+        url: web service url likewise http://deadline-ws:8082
+        maxsize: maximum idle keep-alive connections kept in the pool"""
+
+    name = 'webservice'
+
+    # One pool per web service, shared by all the transports of the session
+    __pools = {}
+    __pools_lock = threading.Lock()
+
+    def __init__(self, url, maxsize=4):
+
+        parsed_url = urlparse(url)
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port or 8082
+        with self.__pools_lock:
+            key = (self.host, self.port)
+            if key not in self.__pools:
+                self.__pools[key] = HTTPConnectionPool(self.host,
+                                                       self.port,
+                                                       maxsize=maxsize)
+            self.pool = self.__pools[key]
+
+    def request(self, method, path, body=None):
+
+        """ Execute the request over a pooled connection
+
+        A reused keep-alive connection may have been closed by the
+        server in the meantime. A request that could not be sent over
+        it is retried once over a fresh connection, a GET also when the
+        response is missing. Any other request is never sent twice, a
+        failure after it was sent is not a TransportUnavailable, the 
+        server may have accepted the job already and a fallback would 
+        submit it again.
+
+        Returns:
+            decoded json response"""
+
+        headers = {'Connection': 'keep-alive'}
+        if body is not None:
+            body = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        idempotent = method == 'GET'
+        for attempt in range(2):
+            connection, reused = self.pool.acquire()
+            sent = False
+            try:
+                connection.request(method, path, body, headers)
+                sent = True
+                response = connection.getresponse()
+                data = response.read()
+            except (socket.error, httplib.HTTPException) as err:
+                connection.close()
+                if reused and attempt == 0 and (idempotent or not sent):
+                    continue
+                if sent and not idempotent:
+                    raise RuntimeError(
+                        "Deadline Web Service %s %s sent but no response, it may have "
+                        "been accepted, not submitted again: %s" %(method, path, err)
+                    )
+                raise TransportUnavailable(
+                    "Deadline Web Service %s:%s not reachable: %s" %(self.host,
+                                                                     self.port,
+                                                                     err)
+                )
+            if response.getheader('Connection', '').lower() == 'close':
+                connection.close()
+            else:
+                self.pool.release(connection)
+            break
+
+        if not isinstance(data, str):
+            data = data.decode('utf-8')
+        if response.status >= 400:
+            raise RuntimeError("Deadline Web Service %s %s failed (%s)\n%s" %(method,
+                                                                             path,
+                                                                             response.status,
+                                                                             data))
+        try:
+            return json.loads(data)
+        except ValueError:
+            return data
+
+    def submit(self, job_files, dependencies=None):
+
+        """ Submit a single job
+
+        Args:
+            job_files: job info, plugin info and auxiliary files
+            dependencies: optional list of job ids the job depends on
+
+        Returns:
+            job id"""
+
+        job_info = read_job_file(job_files[0])
+        plugin_info = read_job_file(job_files[1])
+        if dependencies:
+            job_info['JobDependencies'] = ",".join(dependencies)
+        result = self.request('POST', '/api/jobs', {
+            'JobInfo': job_info,
+            'PluginInfo': plugin_info,
+            'AuxFiles': list(job_files[2:]),
+            'IdOnly': True
+        })
+        return result['_id']
+
+    def submit_multiple(self, jobs):
+
+        """ Submit the jobs as a dependency chain over the pooled
+        connection. Every job depends on the job submitted before it
+
+        Returns:
+            list of job ids in the submission order"""
+
+        job_ids = []
+        for job_files in jobs:
+            try:
+                job_id = self.submit(job_files,
+                                     dependencies=job_ids[-1:])
+            except TransportUnavailable:
+                # Do not let the caller fall back and submit the
+                # already submitted jobs for a second time
+                if job_ids:
+                    raise RuntimeError("Deadline Web Service lost after submitting %s"
+                                       %", ".join(job_ids))
+                raise
+            job_ids.append(job_id)
+        return job_ids
+
+    def get_pools(self):
+
+        """ Returns list of pool names"""
+
+        return self.request('GET', '/api/pools')
+
+    def get_job_status(self, job_id):
+
+        """ Returns the status name of the job, likewise 'Completed'"""
+
+        jobs = self.request('GET', '/api/jobs?JobID=%s' %quote(job_id))
+        if not jobs:
+            return 'Unknown'
+        return JOB_STATUS.get(jobs[0].get('Stat'), 'Unknown')
+
+
+class FallbackTransport:
+
+    """ Try the primary transport and fall back to the secondary one
+    when the primary could not reach the repository"""
+
+    def __init__(self, primary, fallback):
+
+        self.primary = primary
+        self.fallback = fallback
+        self.name = primary.name
+
+    def __call(self, method, *args):
+
+        try:
+            return getattr(self.primary, method)(*args)
+        except TransportUnavailable as err:
+            print("%s, falling back to %s" %(err, self.fallback.name))
+            return getattr(self.fallback, method)(*args)
+
+    def submit(self, job_files):
+        return self.__call('submit', job_files)
+
+    def submit_multiple(self, jobs):
+        return self.__call('submit_multiple', jobs)
+
+    def get_pools(self):
+        return self.__call('get_pools')
+
+    def get_job_status(self, job_id):
+        return self.__call('get_job_status', job_id)
+
+
+def get_transport(name=''):
+
+    """ Returns the transport selected by the name or the environment
+
+    The web service transport is always backed by deadlinecommand as
+    the fallback"""
+
+    name = name or os.environ.get('PLAYBLAST_DEADLINE_TRANSPORT', 'command')
+    url = os.environ.get('DEADLINE_WEBSERVICE_URL', '')
+    if name == 'webservice' and url:
+        return FallbackTransport(DeadlineWebServiceTransport(url),
+                                 DeadlineCommandTransport())
+    return DeadlineCommandTransport()
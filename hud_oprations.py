@@ -22,14 +22,28 @@ from __future__ import print_function
 import os 
 from PySide2.QtUiTools import QUiLoader
 from PySide2 import QtWidgets
-from PySide2.QtCore import QFile
+from PySide2.QtCore import (QFile,
+                            QFileSystemWatcher,
+                            QObject,
+                            QThread,
+                            QTimer,
+                            Qt,
+                            Signal)
 from PySide2.QtGui import (QStandardItemModel,
                            QStandardItem)
 import maya.cmds as cmds
 import maya.mel as mel
-import sgtk
 import subprocess
 import re
+import time
+from . import deadline_pool_cache
+from . import submit_to_deadline
+from . import sequence_index
+from . import scene_query
+from . import hud_rig
+from . import local_render
+from . import render_queue
+from . import render_snapshot
 
 # GUI ui file path 
 __UI_FILE__ = os.path.join(
@@ -98,6 +112,9 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         # whether all the mandotary informations entered or not 
         self.all_hud_lineedit_widgets =[]
 
+        # Cameras and HUD rigs queried once per GUI operation
+        self.scene_snapshot = None
+
         # The GUI make sure nill selected any objects in outliner
         # while opening
         cmds.select( clear=True )
@@ -161,6 +178,30 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         self.scene_cameras = self.window.findChild(
             QtWidgets.QComboBox, 'load_cameras'
         )
+        self.hud_mode_widget = self.window.findChild(
+            QtWidgets.QComboBox, 'hud_mode'
+        )
+        self.hud_mode_widget.addItems(hud_rig.HUD_MODES)
+        self.hud_mode_widget.currentIndexChanged.connect(self.set_hud_mode)
+
+        # json HUD presets, the color and the transform of a loaded 
+        # preset applied by the next create or update
+        self.hud_preset = None
+        self.load_hud_preset_btn = self.window.findChild(
+            QtWidgets.QPushButton, 'load_hud_preset_btn'
+        )
+        self.load_hud_preset_btn.clicked.connect(self.load_hud_preset)
+        self.save_hud_preset_btn = self.window.findChild(
+            QtWidgets.QPushButton, 'save_hud_preset_btn'
+        )
+        self.save_hud_preset_btn.clicked.connect(self.save_hud_preset)
+        self.batch_cameras_list = self.window.findChild(
+            QtWidgets.QListWidget, 'batch_cameras_list'
+        )
+        self.batch_hud_cameras_btn = self.window.findChild(
+            QtWidgets.QPushButton, 'batch_hud_cameras_btn'
+        )
+        self.batch_hud_cameras_btn.clicked.connect(self.select_hud_cameras)
         # Method call to obtain cameras and load in the combobox
         self.load_maya_scene_camera_dropdown_widget()
         
@@ -255,9 +296,20 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             QtWidgets.QComboBox, 'hud_deadline_pool'
         ) 
 
-        # Execute mel deadline command to get the pool list and update in combo box
-        self.deadline_pools = mel.eval('CallDeadlineCommand("-Pools", false);').split('\n')
+        # Populate the pools instantly from the last known pool list. 
+        # If the cache is stale the deadline command executed in a 
+        # background thread and the combo box updated once it returns
+        self.deadline_pool_cache = deadline_pool_cache.DeadlinePoolCache()
+        self.deadline_pools = self.deadline_pool_cache.get_pools()
         self.load_deadline_available_pools()
+        if not self.deadline_pools or self.deadline_pool_cache.is_stale:
+            self.pool_refresh_thread = DeadlinePoolRefreshThread(
+                        self.deadline_pool_cache
+            )
+            self.pool_refresh_thread.pools_refreshed.connect(
+                        self.update_deadline_pools
+            )
+            self.pool_refresh_thread.start()
         
         self.hud_local_hw_toggle = self.window.findChild(
                     QtWidgets.QCheckBox, 
@@ -269,6 +321,28 @@ class PlayBlastManager(QtWidgets.QMainWindow):
                     QtWidgets.QCheckBox, 
                     'hud_publish_mov_toggle'
         )
+        self.hud_draft_segment_qbx = self.window.findChild(
+                    QtWidgets.QSpinBox, 
+                    'hud_draft_segment_qbx'
+        )
+        self.hud_encode_profile = self.window.findChild(
+                    QtWidgets.QComboBox, 
+                    'hud_encode_profile'
+        )
+        self.hud_encode_profile.addItems(
+                    sorted(submit_to_deadline.ENCODE_PROFILES)
+        )
+        self.hud_encode_profile.setCurrentText(
+                    submit_to_deadline.DEFAULT_ENCODE_PROFILE
+        )
+        self.hud_local_processes_qbx = self.window.findChild(
+                    QtWidgets.QSpinBox, 
+                    'hud_local_processes_qbx'
+        )
+        self.hud_queue_render_toggle = self.window.findChild(
+                    QtWidgets.QCheckBox, 
+                    'hud_queue_render_toggle'
+        )
         
         self.submit_to_deadline_btn = self.window.findChild(
                     QtWidgets.QPushButton, 
@@ -276,6 +350,21 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         )
         self.submit_to_deadline_btn.setEnabled(False)
         self.submit_to_deadline_btn.clicked.connect(self.submit_to_deadline)
+
+        self.submission_progress = self.window.findChild(
+                    QtWidgets.QProgressBar, 
+                    'submission_progress'
+        )
+        self.submission_status_lbl = self.window.findChild(
+                    QtWidgets.QLabel, 
+                    'submission_status_lbl'
+        )
+        self.cancel_render_btn = self.window.findChild(
+                    QtWidgets.QPushButton, 
+                    'cancel_render_btn'
+        )
+        self.cancel_render_btn.setEnabled(False)
+        self.cancel_render_btn.clicked.connect(self.cancel_local_render)
       
         # Load the widgets as it is in the state of while creating process.
         # Based on the HUD created , during the loading time the GUI made 
@@ -292,9 +381,26 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         self.rv_exr_folder_names_listview_widget = self.window.findChild(
             QtWidgets.QListView, 'rv_exr_folder_names'
         )
+        self.sequence_index = sequence_index.SequenceIndex()
         self.rv_exrs_folders_model = QStandardItemModel()
         self.rv_exr_folder_names_listview_widget.setModel(self.rv_exrs_folders_model)
-        self.rv_folder_path_txt_widget.textChanged.connect(self.set_playblast_folder_names)
+
+        # Typing in the folder path restarts the timer, the folders 
+        # scanned in a worker thread once the user stopped typing 
+        self.folder_scan_workers = []
+        self.folder_scan_worker = None
+        self.rv_folder_items = {}
+        self.folder_scan_timer = QTimer(self)
+        self.folder_scan_timer.setSingleShot(True)
+        self.folder_scan_timer.setInterval(400)
+        self.folder_scan_timer.timeout.connect(self.set_playblast_folder_names)
+        self.rv_folder_path_txt_widget.textChanged.connect(self.folder_scan_timer.start)
+
+        # Once scanned the folder tree is watched and only the 
+        # changed folders are updated in the list view
+        self.folder_watcher = FolderWatcher(self.sequence_index, parent=self)
+        self.folder_watcher.folder_changed.connect(self.update_playblast_folder)
+        self.folder_watcher.folder_removed.connect(self.remove_playblast_folder)
         
         self.rv_folderpath_browse_btn_widget = self.window.findChild(
             QtWidgets.QPushButton, 'rv_folderpath_browse_btn'
@@ -403,55 +509,95 @@ class PlayBlastManager(QtWidgets.QMainWindow):
       
         return self.scene_cameras.currentText()
     
-    def get_scene_cameras(self):
+    def get_scene_snapshot(self, refresh=False):
 
-        """ Return Scence cameras"""
-      
-        return [camera for camera in cmds.ls(cameras=True) \
-            if not cmds.camera(camera, q=True, startupCamera=True)
-        ]
+        """ Returns the scene snapshot of the cameras and HUD rigs.
+        Every GUI operation refreshes it once at its start, the camera 
+        and HUD lookups of the operation share it"""
+
+        if refresh or self.scene_snapshot is None:
+            self.scene_snapshot = scene_query.SceneSnapshot()
+        return self.scene_snapshot
     
     def set_playblast_folder_names(self):
 
-        """ Update List view with the items of folder names od exrs"""
+        """ Update List view with the items of folder names od exrs.
+
+        The typed folder path scanned through the sequence index in a 
+        worker thread and the folders streamed into the list view as 
+        they are found. A scan still running is cancelled"""
       
+        if self.folder_scan_worker is not None:
+            self.folder_scan_worker.cancel()
+            self.folder_scan_worker = None
+        self.folder_watcher.clear()
         self.rv_exrs_folders_model.clear()
-        folders = set()
-        for root, dirs, files in os.walk(self.images):
-                for file in files:
-                    if file.endswith(".exr"):
-                        folder_name = os.path.basename(
-                            os.path.dirname(
-                                os.path.join(root,file)
-                            )
-                        )
-                        folders.add(folder_name)
-        for folder in folders:
-            self.rv_exrs_folders_model.appendRow(
-                        QStandardItem(folder)
-            )
-        
-    @staticmethod
-    def create_custom_addtribute(maya_node,
-                                attr_name,
-                                attr_type,
-                                value):
+        self.rv_folder_items = {}
 
-        """ Create custom attributes for the given node based upon the type passed
+        folder_path = self.rv_folder_path_txt_widget.text()
+        if not folder_path or not os.path.isdir(folder_path):
+            return
+        worker = FolderScanWorker(self.sequence_index, folder_path)
+        worker.folder_found.connect(self.add_playblast_folder)
+        worker.finished.connect(self.remove_finished_scan_workers)
+        self.folder_scan_workers.append(worker)
+        self.folder_scan_worker = worker
+        worker.start()
 
-        Args:
-            maya_node: maya node object
-            attr_name: name of the attribute string
-            attr_type: name of the attribute type string
-            value: attribute value 
-        """
-                                  
-        if attr_type == 'string':
-             cmds.addAttr( maya_node, longName=attr_name, dataType= attr_type )
-             cmds.setAttr( '%s.%s' %(maya_node, attr_name), value, type="string", lock=True )
-        else:
-            cmds.addAttr( maya_node, longName=attr_name, attributeType= attr_type )
-            cmds.setAttr( '%s.%s' %(maya_node, attr_name), value, lock=True )
+    def add_playblast_folder(self, directory, sequences):
+
+        """ Slot adds a folder found by the current scan worker"""
+
+        if self.sender() is not self.folder_scan_worker:
+            return
+        self.update_playblast_folder(directory, sequences)
+
+    def update_playblast_folder(self, directory, sequences):
+
+        """ Add or update the list view item of the folder. The folder 
+        full path kept in the item data, the label shows the frame count 
+        so the renders landing in the folder can be followed"""
+
+        if not sequences:
+            self.remove_playblast_folder(directory)
+            return
+        root = self.rv_folder_path_txt_widget.text()
+        folder = os.path.relpath(directory, root)
+        if folder == os.curdir:
+            folder = os.path.basename(os.path.normpath(root))
+        frame_count = sum(sequence['frame_count'] for sequence in sequences)
+        label = "%s  (%s frames)" %(folder, frame_count)
+
+        item = self.rv_folder_items.get(directory)
+        if item is None:
+            item = QStandardItem(label)
+            item.setData(directory, Qt.UserRole)
+            self.rv_folder_items[directory] = item
+            self.rv_exrs_folders_model.appendRow(item)
+        elif item.text() != label:
+            item.setText(label)
+
+    def remove_playblast_folder(self, directory):
+
+        """ Remove the list view item of the deleted folder"""
+
+        item = self.rv_folder_items.pop(directory, None)
+        if item is not None:
+            self.rv_exrs_folders_model.removeRow(item.row())
+
+    def remove_finished_scan_workers(self):
+
+        """ Drop the references of the finished scan workers. The tree
+        of a completed scan starts to be watched"""
+
+        finished_worker = self.sender()
+        if (finished_worker is self.folder_scan_worker and 
+                not finished_worker.cancelled):
+            self.folder_watcher.watch(finished_worker.root)
+        self.folder_scan_workers = [
+            worker for worker in self.folder_scan_workers 
+            if worker.isRunning()
+        ]
         
     def show_messagebox(self, message):
 
@@ -463,175 +609,61 @@ class PlayBlastManager(QtWidgets.QMainWindow):
 
         """ Get all the cameras"""
       
-        cameras = []
-        scene_cameras = self.get_scene_cameras()
-        for scene_camera in scene_cameras:
-            parent_camera = cmds.listRelatives(scene_camera, 
-                                               parent=True, 
-                                               fullPath=True)
-            if not cmds.attributeQuery('playblast_camera', node=parent_camera[0],
-                                       ex=True ):
-                cameras.append(parent_camera[0])
-        return cameras
+        return list(self.get_scene_snapshot().cameras)
         
     def load_maya_scene_camera_dropdown_widget(self):
 
         """ Add the collected camera nodes into the camera dropdown widget"""
       
+        self.get_scene_snapshot(refresh=True)
         for cameras in self.get_camera_transform_nodes():
             self.scene_cameras.addItem(cameras)
-                   
-    def load_deadline_available_pools(self):
+            self.batch_cameras_list.addItem(cameras)
 
-       """ Load deadline pool to the combobox drpdown"""
-      
-        for pools in self.deadline_pools:
-            self.hud_deadline_pool.addItem(pools)
-            
-    def duplicate_camera(self):
+    def get_batch_cameras(self):
 
-        """ Create duplicate camera and set the custom atttributes
-        Returns the cameras 
-        """
-      
-        self.user_selected_camera = self.get_user_selected_camera()
-        hud_camera = cmds.duplicate( self.user_selected_camera, 
-                                    name='hud_%s' %self.user_selected_camera)
-        min_frame = cmds.playbackOptions(q=True, min=True)
-        max_frame = cmds.playbackOptions(q=True, max=True)
-        attributes= [ 'translateX',
-                    'translateY',
-                    'translateZ',
-                    'rotateX',
-                    'rotateY',
-                    'rotateZ',
-                    'scaleX',
-                    'scaleY',
-                    'scaleZ',
-                    'visibility']
-        
-        # Delete all locks, animation and tranform to zero
-        for attr in attributes:
-            cmds.setAttr(hud_camera[0]+'.'+attr, lock=0)
-            cmds.cutKey(hud_camera[0], time=(min_frame,max_frame), attribute=attr, option="keys" )
-            if not attr.startswith('scale'):
-                cmds.setAttr(hud_camera[0]+'.'+attr, 0)
-
-        self.create_custom_addtribute(hud_camera[0], 'playblast_camera', 'bool', 1)
-        return hud_camera        
-    
-    @property         
-    def get_current_maya_file_name(self):
+        """ Returns the cameras selected in the batch camera list"""
 
-        """ Extract the filename for the file path and return 
-        widget name """
-      
-        if self.scene_toggle.isChecked():
-            
-            filepath = cmds.file(q=True, sn=True)
-            filename = os.path.basename(filepath)
-            raw_name, extension = os.path.splitext(filename)
-            return raw_name, 'scene_toggle'
-        else:
-            return
-        
-    @property
-    def get_username(self):
+        return [item.text() for item in self.batch_cameras_list.selectedItems()]
 
-        """ Returns the user name """
-      
-        if self.artist_toggle.isChecked():
-            return os.environ.get( "USERNAME"), 'artist_toggle'
-        else:
-            return
-    
-    @property
-    def get_scene_fps(self):
+    def select_hud_cameras(self):
 
-        """ Returns the fps of the scene"""
-      
-        if self.fps_toggle.isChecked():
-        
-            label = 'Fps: '
-            currentUnit = cmds.currentUnit(query=True, time=True)
-            if currentUnit == 'film':
-                return label + str(24), 'fps_toggle'
-            if currentUnit == 'show':
-                return label +str(48), 'fps_toggle'
-            if currentUnit == 'pal':
-                return label +str(25), 'fps_toggle'
-            if currentUnit == 'ntsc':
-                return label +str(30), 'fps_toggle'
-            if currentUnit == 'palf':
-                return label +str(50), 'fps_toggle'
-            if currentUnit == 'ntscf':
-                return label +str(60), 'fps_toggle'
-            if 'fps' in currentUnit:
-                return label + str(currentUnit.substitute('fps','')), 'fps_toggle'
-        else:
-            return
-    
-    @property
-    def get_current_frame_no(self):
+        """ Select all the cameras having HUD in the batch camera list"""
 
-        """ Returns the Frame No string"""
-      
-        if self.frameno_toggle.isChecked():
-            return "Frame No", 'frameno_toggle'
-        else:
-            return
-            
-            
-    @property
-    def get_camera_focal_length(self):
-
-        """ Returns camera focal length"""
-      
-        if self.focal_length.isChecked():
-            return "{} {}".format('Focal Length: ',
-                                cmds.getAttr(self.user_selected_camera +".focalLength")
-            ), 'focal_length'
-        else:
-            return               
-    
-    @property
-    def get_scene_resolution(self):
+        self.get_scene_snapshot(refresh=True)
+        hud_cameras = self.get_cameras_with_hud()
+        for row in range(self.batch_cameras_list.count()):
+            item = self.batch_cameras_list.item(row)
+            item.setSelected(item.text() in hud_cameras)
+                   
+    def load_deadline_available_pools(self):
 
-        """ Return width and hight of the resolution"""
+        """ Load deadline pool to the combobox drpdown. The current
+        selected pool is preserved if it still exist"""
       
-        if self.resolution_toggle.isChecked():
-        
-            resx = cmds.getAttr("defaultResolution.width")
-            resy = cmds.getAttr("defaultResolution.height")
-            return "{} {},{}".format("Resolution: ", resx, resy), 'resolution_toggle'
-        else:
-            return
-        
-    @property
-    def get_camera_sensor_size(self):
+        current_pool = self.hud_deadline_pool.currentText()
+        self.hud_deadline_pool.clear()
+        for pools in self.deadline_pools:
+            self.hud_deadline_pool.addItem(pools)
+        if current_pool in self.deadline_pools:
+            self.hud_deadline_pool.setCurrentText(current_pool)
 
-        """ Returns camera sensor size"""
-      
-        if self.sensor_size.isChecked():
-            sensorsize_x = cmds.getAttr(self.user_selected_camera +".horizontalFilmAperture") * 25.4
-            sensorsize_y = cmds.getAttr(self.user_selected_camera +".verticalFilmAperture") * 25.4
-            return "{} {},{}".format("Sensor Size: ", sensorsize_x,sensorsize_y), 'sensor_size'
-        else:
-            return
+        refresh_seconds = self.deadline_pool_cache.read().get("refresh_seconds")
+        if refresh_seconds is not None:
+            self.hud_deadline_pool.setToolTip(
+                "Deadline pools refreshed in %.2f sec" %refresh_seconds
+            )
     
-    @property
-    def get_scene_pixel_aspect_ratio(self):
+    def update_deadline_pools(self, pools, refresh_seconds):
 
-        """ Retuns Pixel aspect ratio"""
-      
-        if self.pa_ratio_toggle.isChecked():
-        
-            return "{} {}".format("Pixel Aspect Ratio: ",
-                                cmds.getAttr("defaultResolution.pixelAspect")
-            ), 'pa_ratio_toggle'
-        else:
-            return
-    
+        """ Slot receives the freshly queried pools from the 
+        background refresh thread"""
+
+        print("Deadline pool refresh took %.2f sec" %refresh_seconds)
+        if pools:
+            self.deadline_pools = pools
+            self.load_deadline_available_pools()
+            
     @property
     def get_user_custom_hud_text(self):
 
@@ -708,47 +740,35 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             self.hud_priority_fpt_qbx_widget.value()
         )
         
-    def get_transform_nodes(self):
-
-        """ Returns all the transformation nodes in the maya scene.
-        As so easily filter the groups"""
-      
-        # Get all the transform Nodes
-        transform_set = set(cmds.listRelatives(cmds.ls(transforms=True), ap=True, ni=True))   
-        # Get all the mesh nodes
-        mesh_set = set(cmds.listRelatives(cmds.ls(typ='mesh'), parent=True))
-        # Do the set different operations to get only groups
-        groups = list(transform_set.difference(mesh_set))
-        return groups
-            
-            
     def delete_all_hud_in_scene(self):
         
         """Delete all the Hud related camera, groups and 
         Materials created behalf of the HUD creation Process"""
         
-        try:
-            
-            # Iterate all the groups if the playplst_camera 
-            # attribute found then delete it 
-            hud_groups = []
-            for hud_group in self.get_transform_nodes():
-                if cmds.attributeQuery("playblast_camera", node=hud_group, exists=True):
-                    hud_groups.append(hud_group)
-            
-            for hud_grp in hud_groups:
-                cmds.delete(hud_grp)
-            
-            # Any Shader assigned with part of the HUD creation deleted
-            for mat in cmds.ls(mat=True):
-                if cmds.attributeQuery("playblast_camera", node=mat, exists=True):
-                    cmds.delete(mat)
-                    
-            self.window.close()
-            
-        except TypeError:
+        # All the groups and shaders having the playplst_camera 
+        # attribute deleted
+        snapshot = self.get_scene_snapshot(refresh=True)
+        if not snapshot.hud_nodes and not snapshot.hud_materials and \
+                    not snapshot.hud_textures:
             self.show_messagebox("No HUD Text to Delete")
+            return
+        
+        if snapshot.hud_nodes:
+            cmds.delete(snapshot.hud_nodes)
+        
+        # Any Shader assigned with part of the HUD creation deleted
+        hud_materials = cmds.ls(snapshot.hud_materials + snapshot.hud_textures)
+        if hud_materials:
+            cmds.delete(hud_materials)
+        self.window.close()
             
+    def get_cameras_with_hud(self):
+
+        """ Returns full path of the cameras having a HUD. The cameras
+        are found through the HUD point constraints targets"""
+
+        return list(self.get_scene_snapshot().cameras_with_hud)
+
     def load_hud(self):
 
         """ Load the already existed HUD text for the given camera
@@ -766,11 +786,10 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         get_user_camera = self.get_user_selected_camera()
 
         # Get the maya nodes that has a HUD related attributes
-        transformation_nodes =[]
-        for hud_group in sorted(self.get_transform_nodes()):
-            if cmds.attributeQuery("playblast_camera", node=hud_group, exists=True):
-                self.submit_to_deadline_btn.setEnabled(True)
-                transformation_nodes.append(hud_group)
+        snapshot = self.get_scene_snapshot(refresh=True)
+        transformation_nodes = snapshot.hud_nodes
+        if transformation_nodes:
+            self.submit_to_deadline_btn.setEnabled(True)
         #  [u'camera1', u'camera2']
         point_constrained_master_camera = []
       
@@ -795,22 +814,14 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         # custom_hud_grp
         # Result: [u'hud__group1_camera1_Text_HUD', u'hud__group1_camera2_Text_HUD'] # 
         for transformation_node in transformation_nodes:
-            if  cmds.pointConstraint(transformation_node, q=True, tl=True):
+            if transformation_node in snapshot.point_targets:
                 point_constrained_master_camera.append(
-                    cmds.pointConstraint(transformation_node, q=True, tl=True)[0]
-                )
-            if cmds.parentConstraint(transformation_node, q=True):
-                parentconstrained_hud_cameragrp.append(
-                    cmds.listAttr(transformation_node, userDefined=True, scalar=True)
+                    snapshot.point_targets[transformation_node]
                 )
-                str_huds =(
-                    set(
-                        cmds.listAttr(transformation_node, userDefined=True)
-                    )-set(
-                        cmds.listAttr(transformation_node, userDefined=True, scalar=True)
-                    )
-                )
-                custom_string_huds_cameragrp.append(list(str_huds))
+            if transformation_node in snapshot.parent_constrained:
+                scalar_huds, str_huds = snapshot.get_hud_attributes(transformation_node)
+                parentconstrained_hud_cameragrp.append(scalar_huds)
+                custom_string_huds_cameragrp.append(str_huds)
                 custom_hud_grp.append(transformation_node)
 
         custom_hud_txts = {}
@@ -850,6 +861,16 @@ class PlayBlastManager(QtWidgets.QMainWindow):
                 parentconstrained_hud_cameragrp)
         )
 
+        # HUD mode the camera HUD was built with
+        self.hud_mode_widget.setCurrentIndex(hud_rig.HUD_PER_LINE)
+        for camera, hud_groups in custom_hud_txts.items():
+            if camera in get_user_camera:
+                for hud_group in hud_groups:
+                    if cmds.attributeQuery('hud_mode', node=hud_group, exists=True):
+                        self.hud_mode_widget.setCurrentIndex(
+                                    cmds.getAttr(hud_group + '.hud_mode')
+                        )
+
         # All the mathching widgets from the collected attributes setted to '
         # checked state 
         for cam, attributes in camera_scalar_attributes.items():
@@ -878,150 +899,134 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             else:              
                 self.hud_custom_toggle_widget.setChecked(False)  
                         
+    def get_hud_config(self):
+
+        """ Returns the HUD config of the widgets. The color and the user
+        transform come from the last loaded preset, None keeps the ones
+        of an existing HUD"""
+
+        hud_preset = self.hud_preset or {}
+        return hud_rig.get_config(
+                    toggles=[widget.objectName() 
+                             for widget in self.all_hud_combobox_widgets
+                             if widget.isChecked()],
+                    custom=self.get_user_custom_hud_text,
+                    mode=self.hud_mode_widget.currentIndex(),
+                    color=hud_preset.get('color'),
+                    transform=hud_preset.get('transform')
+        )
+
+    def get_burn_in_hud(self, camera):
+
+        """ Collect the HUD fields of the camera for the burn in mode
+
+        Returns:
+            tuple of the HUD lines and whether the frame counter drawn"""
+
+        return hud_rig.get_burn_in_lines(self.get_hud_config(), camera)
+
+    def get_hud_preset_dir(self):
+
+        """ Returns the user HUD preset directory"""
+
+        preset_dir = "Y:/pipeline/studio/temp/" + \
+                     os.environ.get('USERNAME', '') + "/" + \
+                     "maya_" + os.environ.get('maya_version', '') + "/" + \
+                     "hud_presets"
+        if not os.path.exists(preset_dir):
+            try:
+                os.makedirs(preset_dir)
+            except OSError:
+                return ''
+        return preset_dir
+
+    def save_hud_preset(self):
+
+        """ Export the HUD config of the widgets as a json preset. The 
+        color and the user transform taken from the HUD of the selected
+        camera if it has one"""
+
+        preset_file = QtWidgets.QFileDialog.getSaveFileName(
+                    self, 
+                    "Save HUD Preset", 
+                    self.get_hud_preset_dir(), 
+                    "HUD Preset (*.json)"
+        )[0]
+        if not preset_file:
+            return
+        config = self.get_hud_config()
+        hud_group = hud_rig.find_hud_group(self.get_user_selected_camera())
+        if hud_group:
+            color, transform = hud_rig.read_hud_state(hud_group)
+            config['color'] = config['color'] or color
+            config['transform'] = config['transform'] or transform
+        hud_rig.save_preset(config, preset_file)
+
+    def load_hud_preset(self):
+
+        """ Load a json preset into the widgets. Its color and user 
+        transform applied by the next create or update"""
+
+        preset_file = QtWidgets.QFileDialog.getOpenFileName(
+                    self, 
+                    "Load HUD Preset", 
+                    self.get_hud_preset_dir(), 
+                    "HUD Preset (*.json)"
+        )[0]
+        if not preset_file:
+            return
+        try:
+            config = hud_rig.load_preset(preset_file)
+        except (IOError, OSError, ValueError) as err:
+            self.show_messagebox("Not a valid HUD preset\n%s" %err)
+            return
+
+        for widget in self.all_hud_combobox_widgets:
+            widget.setChecked(widget.objectName() in config['toggles'])
+        self.hud_custom_text_treeview.model().removeRows(
+                    0, 
+                    self.hud_custom_text_treeview.model().rowCount() 
+        )
+        for attr_name, attr_value in config['custom']:
+            self.hud_custom_text_treeview.model().appendRow(
+                [QStandardItem(attr_name),
+                 QStandardItem(attr_value)
+                ]
+            )
+        self.hud_custom_toggle_widget.setChecked(bool(config['custom']))
+        self.hud_mode_widget.setCurrentIndex(hud_rig.get_mode_index(config))
+        self.hud_preset = config
+
+    def set_hud_mode(self, hud_mode):
+
+        """ Burn in HUD needs no HUD in the scene to be submitted"""
+
+        if hud_mode == hud_rig.HUD_BURN_IN:
+            self.submit_to_deadline_btn.setEnabled(True)
+
+    def create_hud(self):
+
+        """ Create the HUD text Network of the selected camera"""
+
+        hud_rig.apply_hud(self.get_user_selected_camera(), self.get_hud_config())
+        cmds.select( clear=True )
+        self.window.close()
+
     def create_update_hud(self):   
 
         """ Create and also responsible to update the HUD text"""
       
-        def create_hud():
-
-            """ Create the HUD text Network with necessary constraints"""
-          
-            self.hud_camera = self.duplicate_camera()
-            self.camera_properties = [
-                self.get_current_frame_no,
-                self.get_current_maya_file_name,
-                self.get_username,
-                self.get_scene_fps,
-                self.get_camera_focal_length,
-                self.get_scene_resolution,
-                self.get_camera_sensor_size,
-                self.get_scene_pixel_aspect_ratio
-            ]
-
-            # Create two groups for the user selected camera one is primary 
-            # handler holds the constraints and made connection between production
-            # camera and dummy duplicate camera. second one group handle is to 
-            # provide transform control to the artist
-            text_hud_name = self.hud_camera[0]+ "_Text_HUD"
-            text_hud_transform_grp = self.hud_camera[0]+ "_user_transform"
-            cmds.group( empty=True, name=text_hud_name )
-            cmds.group( empty=True, name=text_hud_transform_grp, parent=text_hud_name )
-            
-            
-            self.create_custom_addtribute(text_hud_name, 'playblast_camera', 'bool', 1)
-            self.create_custom_addtribute(text_hud_name, 'created', 'bool', 1)
-            # cmds.parent(text_hud_transform_grp, text_hud_name )
-            
-            def create_text(cam_properties, y_pos):
-
-                """ Create and position the MAYA 3d text""" 
-              
-                generate_hud_txt = GenerateHudText(cam_properties)
-                font_obj = generate_hud_txt.generate_text(y_pos)
-                cmds.parent(font_obj, text_hud_transform_grp )
-                if ':' in  cam_properties:
-                    new_name = cam_properties.split(':')[0]
-                else:
-                    new_name = cam_properties
-                cmds.rename(font_obj, new_name)
-                
-            y_pos = 0   
-            # Create text for all the inbuilt property
-            for cam_properties in self.camera_properties:
-                if cam_properties:
-                    create_text(cam_properties[0], y_pos)
-                    self.create_custom_addtribute(text_hud_name, cam_properties[-1], 'bool', 1)
-                    y_pos = y_pos +-0.006
-                    
-            # Create HUD for all the custom text         
-            if self.get_user_custom_hud_text:     
-                for custom_hud in self.get_user_custom_hud_text:
-                    custom_hud_txt = ":".join(custom_hud)  
-                    create_text(custom_hud_txt, y_pos)
-                    y_pos = y_pos +-0.006
-                    self.create_custom_addtribute(text_hud_name, custom_hud[0], 'string', custom_hud[-1])
-            
-            cmds.xform(text_hud_name, centerPivots = True)
-            cmds.xform(text_hud_transform_grp, centerPivots = True)
-            
-            # Reapply the xform again back to the group object
-            if hasattr(self, 'hud_trans'):
-                cmds.xform(text_hud_transform_grp, 
-                           translation=self.hud_trans[0])
-            if hasattr(self, 'hud_rotate'):
-                cmds.xform(text_hud_transform_grp, 
-                           rotation=self.hud_rotate[0])
-            if hasattr(self, 'hud_scale'):
-                cmds.xform(text_hud_transform_grp, 
-                           scale=self.hud_scale[0])
-            
-            # Screen calculation to place the text
-            device_aspect_ratio = round(
-                                            float(cmds.getAttr("defaultResolution.deviceAspectRatio")), 2
-            )
-
-            # Temprory positioning based on aspect ratio
-            if device_aspect_ratio == 1.33:
-                screen_left_x = -0.2
-                screen_left_y = 0.145
-                cmds.move(screen_left_x, screen_left_y, 0, text_hud_name)
-            elif device_aspect_ratio == 1:
+        if self.hud_mode_widget.currentIndex() == hud_rig.HUD_BURN_IN:
+            msg = "Burn In HUD is drawn while encoding the mov.\n"
+            msg += "Nothing is created in the scene, submit with Publish Mov on"
+            self.show_messagebox(msg)
+            return
 
-                screen_left_x =-0.152
-                screen_left_y = 0.145
-                cmds.move(screen_left_x, screen_left_y, 0, text_hud_name)
-            else:
-                screen_left_x = -0.268
-                screen_left_y = 0.142
-                cmds.move(screen_left_x, screen_left_y, 0, text_hud_name)
-            
-            # Constraint the Hud camera with the group and maintain 
-            # transform offset for the text to move withe camera
-            grp_to_camera_constraint = cmds.parentConstraint( 
-                                                                self.hud_camera[0], 
-                                                                text_hud_name, 
-                                                                maintainOffset=True 
-                                                            )
-            self.create_custom_addtribute(grp_to_camera_constraint[0], 'constraint', 'bool', 1)
-            
-            hud_camera_to_mastercam_orientconstraint = cmds.orientConstraint(
-                            self.user_selected_camera, 
-                            self.hud_camera[0] 
-            )
-            self.create_custom_addtribute(hud_camera_to_mastercam_orientconstraint[0], 
-                                            'constraint', 'bool', 1)
-            hud_camera_to_mastercam_pontconstraint = cmds.pointConstraint(
-                        self.user_selected_camera, 
-                        self.hud_camera[0]
-            )
-            self.create_custom_addtribute(hud_camera_to_mastercam_pontconstraint[0], 
-                                            'constraint', 'bool', 1)
-            
-            # Create surface shader anc connected it into the group aka all the meshes
-            shd = cmds.shadingNode("surfaceShader", name="%s_shaders" %text_hud_name, asShader=True)
-            self.create_custom_addtribute(shd, 'playblast_camera', 'bool', 1) 
-            shdSG = cmds.sets(name='%sSG' % shd, empty=True, renderable=True, noSurfaceShader=True)
-            
-            # While Recreating the shader we check if any color was changed the we reaply it
-            if hasattr(self,'shader_color'):
-                cmds.setAttr('%s.outColor' %shd, 
-                             self.shader_color[0],
-                             self.shader_color[1],
-                             self.shader_color[2], 
-                             type="double3"
-                )
-            else:
-                cmds.setAttr('%s.outColor' %shd, 1, 1, 1, type="double3"),
-            cmds.connectAttr('%s.outColor' % shd, '%s.surfaceShader' % shdSG)
-            cmds.sets(text_hud_name, e=True, forceElement=shdSG)
-            cmds.select( clear=True )
-            self.window.close()
-        
         # Check if user selected hud__group1_camera_Text_HUD group object
         # if selected then update mode will activated. 
-        # It apply the preserved transform to recreated hud text objects 
-        # Delete all the Hud based objects and recreated with the preserved 
-        # settings 
+        # Only the changed lines updated when possible. Otherwise all 
+        # the Hud based objects deleted and recreated with the preserved
+        # transform and color
         
         get_user_selected = cmds.ls(sl=True)
         if get_user_selected:
@@ -1033,37 +1038,14 @@ class PlayBlastManager(QtWidgets.QMainWindow):
                 msg += "Hud Example Name in Scene \n\n"
                 msg += "\'hud__group1_camera1_Text_HUD\'"
                 self.show_messagebox(msg)
-            else:
-                
-                # Get the surface shader from the selected group
-                # It list all the nodes inside the hud__group1_camera1_Text_HUD
-                # likely [u'Frame_NoShape', u'Focal_LengthShape', u'ResolutionShape']
-                theNodes = cmds.ls(get_user_selected, dag = True, s = True)
-                
-                # Get the shading engine and the material of the respective 
-                shadeEng = cmds.listConnections(theNodes , type = 'shadingEngine')
-                self.surface_shader = list(set(cmds.ls(cmds.listConnections(shadeEng ), materials = True)))
-                self.shader_color = cmds.getAttr(self.surface_shader[0] +".outColor")[0]
-                
-                if cmds.attributeQuery("created", 
-                                        node=get_user_selected[0], 
-                                        exists=True):
-                    
-                    for children in cmds.listRelatives(get_user_selected[0],  
-                                                    children=True):
-                        if children.endswith("_user_transform"):
-                            self.hud_trans = cmds.getAttr(children +".translate")
-                            self.hud_rotate = cmds.getAttr(children +".rotate")
-                            self.hud_scale = cmds.getAttr(children +".scale")
-                            
-                    self.parent_camera = cmds.parentConstraint( get_user_selected[0],
-                                                                q=True, 
-                                                                targetList=True
-                                                                )
-                    cmds.delete(self.parent_camera)
-                    cmds.delete(get_user_selected[0])
-                    cmds.delete(self.surface_shader[0])
-                    create_hud()             
+            elif cmds.attributeQuery("created", 
+                                     node=get_user_selected[0], 
+                                     exists=True):
+                hud_rig.apply_hud(self.get_user_selected_camera(),
+                                  self.get_hud_config(),
+                                  hud_group=get_user_selected[0])
+                cmds.select( clear=True )
+                self.window.close()
         else:
             
             #  if nothing is selected in the outliner then the 
@@ -1071,43 +1053,24 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             # if any hud related constraint have a relationship with
             # a parent camera, user trying to create a a fresh hud
             # for same camera then it omitted with poping up a GUI 
-            camera_with_constraints = [] 
-            constraint_camera_name = ''
             scene_constraints = cmds.ls( type='constraint')
             if scene_constraints:
-                for scene_constraint in scene_constraints:
-                    if cmds.attributeQuery("constraint", node=scene_constraint, exists=True):
-                        if cmds.objectType(scene_constraint) == 'pointConstraint':
-                            constraint_camera_name =  cmds.pointConstraint(scene_constraint, query=True,targetList=True)
-                            constraint_camera_shape_path = cmds.listRelatives(
-                                            constraint_camera_name, 
-                                            shapes=True,
-                            )
-                            constraint_camera_fullpath = cmds.listRelatives(
-                                        constraint_camera_shape_path, 
-                                        parent=True,
-                                        fullPath=True,
-                            )
-                            if constraint_camera_fullpath[0] not in camera_with_constraints:  
-                                camera_with_constraints.append(constraint_camera_fullpath[0])
-                                 
-                if any (camera_with_constraint==camera_transform_node and 
-                        camera_with_constraint==self.get_user_selected_camera() 
-                        for camera_with_constraint in camera_with_constraints 
-                        for camera_transform_node in self.get_camera_transform_nodes()
-                    ):
+                self.get_scene_snapshot(refresh=True)
+                user_camera = self.get_user_selected_camera()
+                if user_camera in self.get_cameras_with_hud() and \
+                        user_camera in self.get_camera_transform_nodes():
                     msg = "A text HUD is already Created from selected Camera!!\n"
                     msg += "Please Select Hud Group to update\n"
                     msg += "Hud Example Name in Scene \n\n"
                     msg += "\'hud__group1_camera1_Text_HUD\'"
                     self.show_messagebox(msg)
                 else:
-                    create_hud()          
+                    self.create_hud()          
             # If all case fails user not selected anything, For given
             # camera no constraints exist then a fresh HUD text created       
             else:
                 if self.is_checked:
-                    create_hud()
+                    self.create_hud()
                 else:
                     msg  = 'No HUD check box were selected'
                     self.show_messagebox(msg)
@@ -1139,6 +1102,11 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         if int(self.hud_start_frame_txt.text()) > int(self.hud_end_frame_txt.text()):
             msg = "Please Check the Frame range. Start frame have higher value than end frame"
             msgs.append(msg)
+
+        if self.hud_mode_widget.currentIndex() == hud_rig.HUD_BURN_IN and \
+                    not self.hud_publish_mov_toggle.isChecked():
+            msg = "Burn In HUD is drawn into the published mov, check Publish Mov"
+            msgs.append(msg)
             
         if msgs:
             self.show_messagebox('\n'.join(msgs))
@@ -1163,32 +1131,168 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             pool = self.hud_deadline_pool.currentText()
             priority = self.hud_deadline_priority_widget.value()
             chunksize = self.hud_deadline_framepertask_widget.value()
-            batch_name = cmds.file(query=True, sceneName=True, shortName=True)
             steps = 1
             scene_file_full_path = cmds.file(query=True, sceneName=True)
             publish_mov = True if self.hud_publish_mov_toggle.isChecked() else False
             submit_farm = False if self.hud_local_hw_toggle.isChecked() else True
-                
-            submit_hardware_render = HardwareRenderOperations(batch_name,
-                                                              job_name,
-                                                              comments,
-                                                              pool,
-                                                              priority,
-                                                              chunksize,
-                                                              steps,
-                                                              self.get_user_selected_camera(),
-                                                              start_frame,
-                                                              end_frame,
-                                                              scene_file_full_path,
-                                                              folder_path=folder_path,
-                                                              file_name=file_name,
-                                                              publish_mov=publish_mov,
-                                                              submit_farm=submit_farm
-                                                              )
-            submit_hardware_render.do_render()
-            self.window.close()
-        
-        pass
+            draft_segment_size = self.hud_draft_segment_qbx.value()
+            encode_profile = self.hud_encode_profile.currentText()
+            local_processes = self.hud_local_processes_qbx.value()
+            queue_render = not submit_farm and \
+                           self.hud_queue_render_toggle.isChecked()
+
+            # Cameras selected in the batch list submitted together as 
+            # one deadline batch. Each camera gets its own job and 
+            # output folder named after the camera
+            batch_cameras = self.get_batch_cameras()
+            if len(batch_cameras) > 1 and not submit_farm and not queue_render:
+                msg = "Multiple cameras render locally only through the queue.\n"
+                msg += "Check Queue or uncheck Local Hardware Render 2.0"
+                self.show_messagebox(msg)
+                return
+            cameras = batch_cameras if batch_cameras else [self.get_user_selected_camera()]
+
+            submissions = []
+            burn_in = self.hud_mode_widget.currentIndex() == hud_rig.HUD_BURN_IN
+            for camera in cameras:
+                burn_in_lines, burn_in_frame_counter = \
+                            self.get_burn_in_hud(camera) if burn_in else ([], False)
+                camera_job_name = job_name
+                camera_file_name = file_name
+                if len(cameras) > 1:
+                    camera_short_name = camera.split('|')[-1].replace(':', '_')
+                    camera_job_name = "%s_%s" %(job_name, camera_short_name)
+                    camera_file_name = "%s_%s" %(file_name, camera_short_name)
+                submit_hardware_render = HardwareRenderOperations(job_name,
+                                                                  camera_job_name,
+                                                                  comments,
+                                                                  pool,
+                                                                  priority,
+                                                                  chunksize,
+                                                                  steps,
+                                                                  camera,
+                                                                  start_frame,
+                                                                  end_frame,
+                                                                  scene_file_full_path,
+                                                                  folder_path=folder_path,
+                                                                  file_name=camera_file_name,
+                                                                  publish_mov=publish_mov,
+                                                                  submit_farm=submit_farm,
+                                                                  draft_segment_size=draft_segment_size,
+                                                                  encode_profile=encode_profile,
+                                                                  burn_in_lines=burn_in_lines,
+                                                                  burn_in_frame_counter=burn_in_frame_counter,
+                                                                  local_processes=local_processes
+                                                                  )
+                # Every camera renders its own snapshot scene
+                if queue_render:
+                    submissions.append(submit_hardware_render.queue_render())
+                else:
+                    submissions.append(submit_hardware_render.do_render())
+
+            if queue_render:
+                self.submission_status_lbl.setText(
+                    "Queued %s local renders, rendered in the background\n"
+                    "Render queue %s" %(len(submissions), 
+                                        render_queue.RenderQueue().queue_dir)
+                )
+            elif not submit_farm:
+                self.start_local_render_worker(submissions[0])
+            elif len(submissions) == 1:
+                self.start_submission_worker(submissions[0])
+            else:
+                self.start_submission_worker(
+                    submit_to_deadline.SubmitBatchToDeadline(submissions, 
+                                                             batch_name=job_name)
+                )
+        
+    def start_submission_worker(self, submission):
+
+        """ Execute the deadline submission in a worker thread. 
+        The progress and the resulting job ids shown in the window"""
+
+        self.submit_to_deadline_btn.setEnabled(False)
+        self.submission_progress.setValue(0)
+        self.submission_status_lbl.setText("Submitting...")
+        self.submission_worker = SubmissionWorker(submission)
+        self.submission_worker.progress.connect(self.set_submission_progress)
+        self.submission_worker.submitted.connect(self.set_submission_result)
+        self.submission_worker.failed.connect(self.set_submission_result)
+        self.submission_worker.start()
+
+    def set_submission_progress(self, percent, stage):
+
+        """ Slot updates the progress bar and the current stage"""
+
+        self.submission_progress.setValue(percent)
+        self.submission_status_lbl.setText(stage)
+
+    def set_submission_result(self, message):
+
+        """ Slot shows the submission job ids or the error message"""
+
+        self.submission_status_lbl.setText(message)
+        self.submit_to_deadline_btn.setEnabled(True)
+
+    def start_local_render_worker(self, render):
+
+        """ Execute the local render in a worker thread. The frames 
+        done, fps and ETA shown in the window, the deadline submission 
+        of the mov started once the render succeeded"""
+
+        self.submit_to_deadline_btn.setEnabled(False)
+        self.cancel_render_btn.setEnabled(True)
+        self.submission_progress.setValue(0)
+        self.submission_status_lbl.setText(
+                    "Rendering %s frames in %s processes..." %(render.total_frames,
+                                                               len(render.frame_ranges))
+        )
+        self.local_render_worker = LocalRenderWorker(render)
+        self.local_render_worker.progress.connect(self.set_local_render_progress)
+        self.local_render_worker.rendered.connect(self.set_local_render_result)
+        self.local_render_worker.failed.connect(self.set_local_render_result)
+        self.local_render_worker.start()
+
+    def cancel_local_render(self):
+
+        """ Stop the running local render"""
+
+        self.cancel_render_btn.setEnabled(False)
+        self.submission_status_lbl.setText("Cancelling the render...")
+        self.local_render_worker.render.cancel()
+
+    def set_local_render_progress(self, frames_done, total_frames, fps, eta):
+
+        """ Slot updates the progress bar with the rendered frames"""
+
+        render = self.local_render_worker.render
+        slowest_frame, slowest_frame_time = render.get_slowest_frame()
+        self.submission_progress.setValue(
+                    int(100.0 * frames_done / max(1, total_frames))
+        )
+        self.submission_status_lbl.setText(
+                    "Rendered %s/%s frames, %.2f fps, %s left\n"
+                    "Slowest frame %s, %.1f seconds" %(frames_done,
+                                                      total_frames,
+                                                      fps,
+                                                      time.strftime('%H:%M:%S', 
+                                                                    time.gmtime(eta)),
+                                                      slowest_frame,
+                                                      slowest_frame_time)
+        )
+
+    def set_local_render_result(self, message):
+
+        """ Slot shows the render result. The submission of the mov 
+        started after a successful render"""
+
+        self.cancel_render_btn.setEnabled(False)
+        render = self.local_render_worker.render
+        if render.succeeded and render.submission is not None:
+            self.start_submission_worker(render.submission)
+            return
+        self.submission_status_lbl.setText(message)
+        self.submit_to_deadline_btn.setEnabled(True)
     
     def play_in_rv(self):
 
@@ -1213,14 +1317,14 @@ class PlayBlastManager(QtWidgets.QMainWindow):
             else:
                 for index in self.rv_exr_folder_names_listview_widget.selectedIndexes():
                     item = self.rv_exr_folder_names_listview_widget.model().itemFromIndex(index)
-                    folder_fullpath= os.path.join(folderpath, item.text() )
+                    folder_fullpath= item.data(Qt.UserRole)
                     selected_items.add(folder_fullpath)
                     
                 if not selected_items:  
                     model = self.rv_exr_folder_names_listview_widget.model()
                     for index in range(model.rowCount()):
                         item = model.item(index)
-                        folder_fullpath= os.path.join(folderpath, item.text() )
+                        folder_fullpath= item.data(Qt.UserRole)
                         all_items.add(folder_fullpath)
             
             if selected_items:
@@ -1233,71 +1337,396 @@ class PlayBlastManager(QtWidgets.QMainWindow):
         
 
 
-class GenerateHudText:
+class FolderScanWorker(QThread):
 
-    """ Base Class to create 3d text of maya """ 
-  
-    def __init__(self, text):
+    """ Walk the folder tree through the sequence index outside of 
+    the maya main thread. Every directory holding sequences emitted as
+    soon as it is found"""
 
-        """Convert text to ord characters
-        
-        Maya 3D text could not recogize the direct string text. 
-        It should needed to converted into the ord in order to 
-        recognize by the maya 3D text"""
-      
-        self.text = text    
-        final = list()
-        for char in str(self.text):
-            final.append(format(ord(char), "x"))
-        self.ord_text =  ' '.join(final)
-    
-    def generate_text(self, y_pos=0):
+    folder_found = Signal(str, object)
 
-        """ Generate the polygon text, remove default shaders
-        remover extrude polygons and make it as 2D text"""
-      
-        cmds.CreatePolygonType()
-        
-        #Delete all the default materials created during the type
-        #node creation
-        for type_materials in cmds.ls(mat=True):
-            if type_materials.startswith('type'):
-                cmds.delete(type_materials)
-                
-        self.font_object_name = cmds.ls(sl=True)[0]
-        self.font_type_node = cmds.listConnections("%s.message" %self.font_object_name)[0]
-
-        for type_node in  cmds.listConnections(self.font_type_node):
-            if 'Extrude' in type_node:
-                type_extrude = type_node
-        cmds.setAttr('%s.fontSize' %self.font_type_node, 0.008)
-        cmds.setAttr('%s.enableExtrusion'  %type_extrude, 0)
-
-        # A frame no is the frame counter it is automatically comes with
-        # 3d maya text so omiting it
-      
-        if not self.text.startswith('Frame No'):
-            cmds.setAttr('%s.textInput'  %self.font_type_node, self.ord_text, type='string')
-            cmds.move(0, y_pos, -0.45, self.font_object_name)
+    def __init__(self, index, root, parent=None):
+
+        super(FolderScanWorker, self).__init__(parent)
+        self.index = index
+        self.root = root
+        self.cancelled = False
+
+    def cancel(self):
+
+        self.cancelled = True
+
+    def run(self):
+
+        try:
+            for directory, sequences in self.index.walk(
+                        self.root, 
+                        is_cancelled=lambda: self.cancelled):
+                self.folder_found.emit(directory, sequences)
+            self.index.save()
+        except (OSError, IOError) as err:
+            print("Folder scan of %s failed: %s" %(self.root, err))
+
+
+class FolderWatchWorker(QThread):
+
+    """ List the changed directories of the FolderWatcher again and walk
+    the new directory trees outside of the maya main thread
+
+    Args:
+        index: SequenceIndex
+        changed: list of (key, directory) of the changed directories
+        roots: directory trees to walk, all their directories are new
+        watched: keys of the directories already watched"""
+
+    scanned = Signal(object, object)
+
+    def __init__(self, index, changed, roots, watched, parent=None):
+
+        super(FolderWatchWorker, self).__init__(parent)
+        self.index = index
+        self.changed = changed
+        self.roots = roots
+        self.watched = watched
+        self.cancelled = False
+
+    def cancel(self):
+
+        self.cancelled = True
 
+    def run(self):
+
+        entries = []
+        added = []
+        roots = list(self.roots)
+        try:
+            for key, directory in self.changed:
+                if self.cancelled:
+                    return
+                entry = self.index.scan_directory(directory, force=True)
+                entries.append((key, directory, entry))
+                if entry is None:
+                    continue
+                # Created sub directories
+                for subdir in entry['subdirs']:
+                    sub_directory = os.path.join(directory, subdir)
+                    if os.path.normcase(os.path.normpath(sub_directory)) not in self.watched:
+                        roots.append(sub_directory)
+
+            for root in roots:
+                for directory, sequences in self.index.walk(
+                            root,
+                            is_cancelled=lambda: self.cancelled,
+                            all_directories=True):
+                    added.append((directory, self.index.get_mtime(directory), sequences))
+            self.index.save()
+        except (OSError, IOError) as err:
+            print("Folder watch scan failed: %s" %err)
+            return
+        if not self.cancelled:
+            self.scanned.emit(entries, added)
+
+
+class FolderWatcher(QObject):
+
+    """ Watch a scanned folder tree for the created, changed and deleted
+    sequence directories
+
+    Uses QFileSystemWatcher and falls back to polling the directory 
+    mtimes when the watcher refuses the paths, likewise on the network
+    shares or over the inotify limit. Polling also forced through the 
+    environment PLAYBLAST_RV_WATCHER=poll. The change notifications 
+    collected for a moment so a render writing hundreds of frames 
+    lists the directory once, not once per frame. The directories 
+    listed and the new trees walked by a FolderWatchWorker, one at a
+    time, the changes collected meanwhile go to the next one.
+
+    Args:
+        index: SequenceIndex the tree scanned through
+        poll_interval: milliseconds between the polls"""
+
+    folder_changed = Signal(str, object)
+    folder_removed = Signal(str)
+
+    def __init__(self, index, poll_interval=5000, parent=None):
+
+        super(FolderWatcher, self).__init__(parent)
+        self.index = index
+        self.root = ''
+        # Normalized path to [directory, mtime]
+        self.directories = {}
+        self.pending = set()
+        self.worker = None
+        self.workers = []
+
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.queue_directory)
+        self.pending_timer = QTimer(self)
+        self.pending_timer.setSingleShot(True)
+        self.pending_timer.setInterval(500)
+        self.pending_timer.timeout.connect(self.process_pending)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(poll_interval)
+        self.poll_timer.timeout.connect(self.poll)
+        self.polling = os.environ.get('PLAYBLAST_RV_WATCHER', '') == 'poll'
+
+    @staticmethod
+    def __key(path):
+
+        return os.path.normcase(os.path.normpath(path))
+
+    def clear(self):
+
+        """ Stop watching"""
+
+        if self.worker is not None:
+            self.worker.cancel()
+            self.worker = None
+        self.poll_timer.stop()
+        self.pending_timer.stop()
+        self.pending = set()
+        watched = self.watcher.directories()
+        if watched:
+            self.watcher.removePaths(watched)
+        self.directories = {}
+        self.root = ''
+
+    def watch(self, root):
+
+        """ Watch every directory of the tree under the root. The tree is 
+        already in the index, so no directory listed again by the walk"""
+
+        self.clear()
+        self.root = root
+        self.__start_worker([], [root])
+
+    def __start_worker(self, changed, roots):
+
+        worker = FolderWatchWorker(self.index, changed, roots, set(self.directories))
+        worker.scanned.connect(self.apply_scan)
+        worker.finished.connect(self.remove_finished_workers)
+        self.workers.append(worker)
+        self.worker = worker
+        worker.start()
+
+    def remove_finished_workers(self):
+
+        """ Drop the references of the finished workers"""
+
+        if self.sender() is self.worker:
+            self.worker = None
+            # Changes collected while the worker was running
+            if self.pending and not self.pending_timer.isActive():
+                self.pending_timer.start()
+        self.workers = [worker for worker in self.workers if worker.isRunning()]
+
+    def __add_directories(self, added):
+
+        """ Start watching the new directories walked by the worker
+
+        Args:
+            added: list of (directory, mtime, sequences)
+
+        Returns:
+            list of (directory, sequences) of the directories not 
+            watched yet"""
+
+        new = []
+        for directory, mtime, sequences in added:
+            key = self.__key(directory)
+            if key in self.directories:
+                continue
+            self.directories[key] = [directory, mtime]
+            new.append((directory, sequences))
+
+        paths = [directory for directory, sequences in new]
+        if not self.polling and paths:
+            failed = self.watcher.addPaths(paths)
+            if failed:
+                print("Unable to watch %s folders, polling for the changes" %len(failed))
+                self.polling = True
+        if self.polling and not self.poll_timer.isActive():
+            self.poll_timer.start()
+        return new
+
+    def __remove_directory(self, key):
+
+        """ Stop watching the directory and its sub directories"""
+
+        for sub_key in list(self.directories):
+            if sub_key == key or sub_key.startswith(key.rstrip(os.sep) + os.sep):
+                directory = self.directories.pop(sub_key)[0]
+                self.watcher.removePath(directory)
+                self.folder_removed.emit(directory)
+
+    def queue_directory(self, directory):
+
+        """ Slot collects the changed directory reported by the watcher.
+        The timer is not restarted by every change, a directory written
+        continuously is still listed every 500 ms"""
+
+        self.pending.add(self.__key(directory))
+        if not self.pending_timer.isActive():
+            self.pending_timer.start()
+
+    def poll(self):
+
+        """ Queue the directories their mtime differs from the index"""
+
+        for key, (directory, mtime) in list(self.directories.items()):
+            try:
+                current_mtime = os.path.getmtime(directory)
+            except OSError:
+                current_mtime = None
+            if current_mtime != mtime:
+                self.pending.add(key)
+        if self.pending:
+            self.process_pending()
+
+    def process_pending(self):
+
+        """ Hand the changed directories to a worker. While a worker is 
+        running they stay pending until it finished"""
+
+        if self.worker is not None:
+            return
+        pending, self.pending = self.pending, set()
+        changed = [(key, self.directories[key][0]) 
+                   for key in sorted(pending) if key in self.directories]
+        if changed:
+            self.__start_worker(changed, [])
+
+    def apply_scan(self, entries, added):
+
+        """ Slot emits the changes listed by the current worker"""
+
+        worker = self.sender()
+        if worker is not self.worker:
+            return
+
+        for key, directory, entry in entries:
+            if key not in self.directories:
+                continue
+            if entry is None:
+                self.__remove_directory(key)
+                continue
+            self.directories[key][1] = entry['mtime']
+            self.folder_changed.emit(directory, entry['sequences'])
+
+            # Deleted sub directories
+            subdirs = set(self.__key(os.path.join(directory, subdir))
+                          for subdir in entry['subdirs'])
+            for sub_key in list(self.directories):
+                if os.path.dirname(sub_key) == key and sub_key not in subdirs:
+                    self.__remove_directory(sub_key)
+
+        new = self.__add_directories(added)
+        if worker.roots:
+            # The scan worker already listed the tree, catch anything
+            # changed while it was scanned
+            self.poll()
         else:
-            cmds.setAttr('%s.generator' %self.font_type_node, 1)
-            cmds.move(0.35, y_pos, -0.45, self.font_object_name)
-         
-       
-        return self.font_object_name
- 
- 
-     
+            for directory, sequences in new:
+                if sequences:
+                    self.folder_changed.emit(directory, sequences)
+
+
+class DeadlinePoolRefreshThread(QThread):
+
+    """ Query the deadline pools outside of the maya main thread 
+    and update the pool cache. Emits the pools and the seconds took
+    by the repository to answer"""
+
+    pools_refreshed = Signal(list, float)
+
+    def __init__(self, pool_cache, parent=None):
+
+        super(DeadlinePoolRefreshThread, self).__init__(parent)
+        self.pool_cache = pool_cache
+
+    def run(self):
+
+        from . import deadline_transport
+        try:
+            pools, refresh_seconds = self.pool_cache.refresh(
+                        deadline_transport.get_transport().get_pools
+            )
+        except (KeyError, OSError, IOError, RuntimeError) as err:
+            print("Deadline pool refresh failed: %s" %err)
+            return
+        self.pools_refreshed.emit(pools, refresh_seconds)
+
+
+class SubmissionWorker(QThread):
+
+    """ Execute SubmitToDeadline.submit() outside of the maya main 
+    thread. Job file writing, publish script generation and the 
+    transport calls do not touch maya so it is safe to run here"""
+
+    progress = Signal(int, str)
+    submitted = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, submission, parent=None):
+
+        super(SubmissionWorker, self).__init__(parent)
+        self.submission = submission
+
+    def run(self):
+
+        try:
+            msgs = self.submission.submit(
+                        progress_callback=self.progress.emit
+            )
+        except Exception as err:
+            self.failed.emit("Deadline submission failed\n%s" %err)
+            return
+        self.submitted.emit(msgs)
+
+
+class LocalRenderWorker(QThread):
+
+    """ Execute LocalRender.render() outside of the maya main thread.
+    Only the Render.exe processes are watched here, no maya call"""
+
+    progress = Signal(int, int, float, float)
+    rendered = Signal(str)
+    failed = Signal(str)
+
+    def __init__(self, render, parent=None):
+
+        super(LocalRenderWorker, self).__init__(parent)
+        self.render = render
+
+    def run(self):
+
+        try:
+            succeeded = self.render.render(progress_callback=self.progress.emit)
+        except Exception as err:
+            self.failed.emit("Local render failed\n%s" %err)
+            return
+        if succeeded:
+            self.rendered.emit("Rendered %s frames" %self.render.total_frames)
+        elif self.render.cancelled:
+            self.failed.emit("Local render cancelled, nothing submitted")
+        else:
+            self.failed.emit(
+                "Local render failed for frames %s, nothing submitted\n"
+                "Render logs in %s" %(", ".join("%s-%s" %frame_range for frame_range
+                                                in self.render.failed_ranges),
+                                      self.render.log_dir)
+            )
+
+
 class HardwareRenderOperations:
 
     """ Do Job of Maya Harware render 2.0 
 
     class register several render global settings fo HW2.0 
     Class do two jobs
-    if "local Hardware 2.0" is selected in gui then it register a MEL 
-    post command in the maya rendersettings, open a new terminal and
-    execute the hardware rendering job
+    if "local Hardware 2.0" is selected in gui then it prepare the 
+    hardware rendering job split across several Render.exe processes. 
+    The mov submitted once all of them are done
     
     if "local Hardware 2.0" no selected then it submit the HW2.0 to the 
     farm"""
@@ -1317,7 +1746,12 @@ class HardwareRenderOperations:
                 folder_path = '',
                 file_name = '',
                 publish_mov=False,
-                submit_farm=False):
+                submit_farm=False,
+                draft_segment_size=0,
+                encode_profile=submit_to_deadline.DEFAULT_ENCODE_PROFILE,
+                burn_in_lines=None,
+                burn_in_frame_counter=False,
+                local_processes=1):
         
         self.batch_name = batch_name
         self.job_name=job_name
@@ -1334,6 +1768,13 @@ class HardwareRenderOperations:
         self.file_name = file_name
         self.publish_mov = publish_mov
         self.submit_farm = submit_farm
+        self.draft_segment_size = draft_segment_size
+        self.encode_profile = encode_profile
+        self.burn_in_lines = list(burn_in_lines or [])
+        self.burn_in_frame_counter = burn_in_frame_counter
+        self.local_processes = local_processes
+        self.resolution = (cmds.getAttr("defaultResolution.width"),
+                           cmds.getAttr("defaultResolution.height"))
         self.__set_hardware_settings()
         
         
@@ -1345,6 +1786,9 @@ class HardwareRenderOperations:
         cmds.setAttr('defaultRenderGlobals.ren', 'mayaHardware2', type='string')
         cmds.setAttr('defaultRenderGlobals.imageFormat', 40)
         cmds.setAttr('defaultRenderGlobals.deadlineStrictErrorChecking', 1)
+        # Older scenes carry the post render submission mel, the tool 
+        # submits by itself
+        cmds.setAttr('defaultRenderGlobals.postMel', ' ', type='string')
         
         # cmds.setAttr('defaultRenderGlobals.outFormatControl', 0)
         cmds.setAttr('defaultRenderGlobals.animation', 1)
@@ -1363,9 +1807,11 @@ class HardwareRenderOperations:
                             object_filter_enable_array,
                             type='Int32Array'
         )
-        if cmds.window("unifiedRenderGlobalsWindow", exists=True):
-            cmds.deleteUI("unifiedRenderGlobalsWindow")
-        mel.eval('unifiedRenderGlobalsWindow;')
+        # Refresh the render settings window, there is none in mayapy
+        if not cmds.about(batch=True):
+            if cmds.window("unifiedRenderGlobalsWindow", exists=True):
+                cmds.deleteUI("unifiedRenderGlobalsWindow")
+            mel.eval('unifiedRenderGlobalsWindow;')
         
         
     def __create_output_directory(self):
@@ -1378,103 +1824,153 @@ class HardwareRenderOperations:
             os.makedirs(self.output_folder)
         return self.output_folder
       
-    def do_render(self):
+    def write_render_snapshot(self):
+
+        """ Export the render snapshot scene of the camera, rendered 
+        instead of the working scene. The working scene is not saved"""
+
+        self.scene_file_full_path = render_snapshot.write_render_snapshot(
+                    self.camera_name,
+                    self.scene_file_full_path
+        )
+        return self.scene_file_full_path
+
+    def do_render(self, snapshot_scene=True):
 
         """ A swith util method determines which protocol 
-        needed to be executed. local or farm render"""
+        needed to be executed. local or farm render
+
+        Args:
+            snapshot_scene: render the snapshot scene of the camera. 
+                            Otherwise the saved scene file rendered as 
+                            it is
+
+        Returns:
+            The prepared SubmitToDeadline object for the farm render,
+            the prepared LocalRender for the local render. The caller
+            executes its submit() or render() in a worker thread"""
       
-        cmds.file(save=True)
+        if snapshot_scene:
+            self.write_render_snapshot()
         if not self.submit_farm: 
-            self.do_batch_render() 
+            return self.do_batch_render() 
         else:
-            self.__submit_to_deadline()
+            return self.__submit_to_deadline()
     
     def do_batch_render(self):
 
-        """ Register mel post job command and trigger the 
-        local hardware rendering 2.0 from the new command prompt"""
+        """ Prepare the local hardware rendering 2.0. The frame range 
+        split across local_processes Render.exe processes
+
+        Returns:
+            local_render.LocalRender, the caller runs its render() 
+            in a worker thread and executes its submission once the 
+            render succeeded. Without the mov publish there is nothing
+            to submit and the submission is None"""
       
-        args = 'batch_name=\'%s\',' %self.batch_name
-        args += 'job_name=\'%s\',' %self.job_name
-        args += 'comment=\'%s\',' %self.comments
-        args += 'pool=\'%s\',' %self.pool
-        args += 'priority=%s,' %self.priority
-        args += 'chunksize=%s,' %self.chunksize
-        args += 'steps=%s,' %self.steps
-        args += 'camera_name=\'%s\',' %self.camera_name
-        args += 'start_frame=%s,'%self.start_frame
-        args += 'end_frame=%s,' %self.end_frame
-        args += 'scene_file_full_path=\'%s\',' %self.scene_file_full_path
-        args += 'folder_path=\'%s\',' %self.folder_path
-        args += 'file_name=\'%s\',' %self.file_name
-        args += 'renderer=\'mayaHardware2\','
-        args += 'maya_version=\'2020\','
-        args += 'publish_mov=%s,' %self.publish_mov
-        args += 'farm_hardware_render=%s,' %self.submit_farm
-        
-        # Add shot grid entities if publish mov is on
+        log_dir = "Y:/pipeline/studio/temp/" + \
+                  os.environ.get('USERNAME', '') + "/" + \
+                  "maya_" + os.environ.get('maya_version', '') + "/" + \
+                  "local_render/" + "%s_%s" %(self.file_name, 
+                                              time.strftime('%Y%m%d_%H%M%S'))
+        return local_render.LocalRender(self.scene_file_full_path,
+                                         cmds.ls(self.camera_name)[0],
+                                         self.start_frame,
+                                         self.end_frame,
+                                         step=self.steps,
+                                         output_dir=os.path.join(self.folder_path, 
+                                                                 self.file_name),
+                                         processes=self.local_processes,
+                                         log_dir=log_dir,
+                                         submission=self.__submit_to_deadline() 
+                                                    if self.publish_mov else None)
+
+    def get_submission_arguments(self):
+
+        """ Returns the SubmitToDeadline keyword arguments of the 
+        render"""
+
+        return {
+            'batch_name': self.batch_name,
+            'job_name': self.job_name,
+            'comment': self.comments,
+            'pool': self.pool,
+            'priority': self.priority,
+            'chunksize': self.chunksize,
+            'steps': self.steps,
+            'camera_name': self.camera_name,
+            'start_frame': self.start_frame,
+            'end_frame': self.end_frame,
+            'scene_file_full_path': self.scene_file_full_path,
+            'folder_path': self.folder_path,
+            'file_name': self.file_name,
+            'renderer': 'mayaHardware2',
+            'maya_version': "2020",
+            'publish_mov': self.publish_mov,
+            'farm_hardware_render': self.submit_farm,
+            'draft_segment_size': self.draft_segment_size,
+            'encode_profile': self.encode_profile,
+            'resolution': self.resolution,
+            'burn_in_lines': self.burn_in_lines,
+            'burn_in_frame_counter': self.burn_in_frame_counter
+        }
+
+    def queue_render(self, snapshot_scene=True):
+
+        """ Add the local render to the render queue of the 
+        workstation. Returns right away, the queue runner renders it 
+        in the background and submits its mov
+
+        Args:
+            snapshot_scene: render the snapshot scene of the camera. 
+                            Otherwise the saved scene file rendered as 
+                            it is, later changes of the scene included
+
+        Returns:
+            job id of the render queue"""
+
+        if snapshot_scene:
+            self.write_render_snapshot()
+        # The shotgrid entities resolved here, the runner has no 
+        # toolkit engine
+        submission_arguments = None
         if self.publish_mov:
-            engine = sgtk.platform.current_engine()
-            shot = engine.context.entity
-            shot_id = shot['id']
-            seq = engine.shotgun.find("Shot", 
-                                    [['id', 'is', shot_id ]],
-                                    ['sg_sequence'])[0]['sg_sequence']['name']
-            task = engine.context.task
-            project = engine.context.project
-            user = engine.context.user
-            args += 'project=%s,' %project
-            args += 'seq=\'%s\',' %seq
-            args += 'shot=%s,' %shot
-            args += 'task=%s,' %task
-            args += 'user=%s,' %user
-                    
-        cmds.setAttr('defaultRenderGlobals.postMel', 
-                     'python("from playblast_manager import submit_to_deadline as sd;reload(sd);sub=sd.SubmitToDeadline(%s);sub.submit()")' %args,
-                                type='string')
-        cmds.file(save=True)
-        
-        cmd = r'"C:\Program Files\Autodesk\Maya2020\bin\Render.exe"'
-        cmd += " -r hw2"
-        cmd += " -s %s" %self.start_frame
-        cmd += " -e %s" %self.end_frame
-        cmd += " -b %s" %self.steps
-        cmd += " -cam %s" %cmds.ls(self.camera_name)[0]
-        cmd += " -pad 4"
-        cmd += " -of exr"
-        cmd += " -rd '%s'" %os.path.join(self.folder_path, self.file_name)
-        cmd += " %s" %self.scene_file_full_path
-        os.system("start /wait cmd /k %s" %cmd)
+            submission = self.__submit_to_deadline()
+            submission_arguments = self.get_submission_arguments()
+            for entity in ('project', 'seq', 'shot', 'task', 'user'):
+                submission_arguments[entity] = getattr(submission, entity)
+        return render_queue.RenderQueue().add_job(
+                    {
+                        'scene': self.scene_file_full_path,
+                        'camera': cmds.ls(self.camera_name)[0],
+                        'start_frame': self.start_frame,
+                        'end_frame': self.end_frame,
+                        'step': self.steps,
+                        'output_dir': os.path.join(self.folder_path, 
+                                                   self.file_name),
+                        'processes': self.local_processes
+                    },
+                    submission_arguments
+        )
 
     def __submit_to_deadline(self):
 
-        """ Submit the HW2.0 to deadline"""
+        """ Prepare the HW2.0 deadline submission. 
+        Every maya and toolkit query done here in the main thread, 
+        the submission itself is left to the caller"""
       
-        cmds.setAttr('defaultRenderGlobals.postMel', ' ', type='string')
         from . import submit_to_deadline
         reload(submit_to_deadline)
         submit_to_deadline = submit_to_deadline.SubmitToDeadline(
-                    batch_name=self.batch_name,
-                    job_name=self.job_name,
-                    comment=self.comments,
-                    pool=self.pool,
-                    priority=self.priority,
-                    chunksize=self.chunksize,
-                    steps=self.steps,
-                    camera_name=self.camera_name,
-                    start_frame=self.start_frame,
-                    end_frame=self.end_frame,
-                    scene_file_full_path=self.scene_file_full_path,
-                    folder_path=self.folder_path,
-                    file_name=self.file_name,
-                    renderer='mayaHardware2',
-                    maya_version="2020",
-                    publish_mov=self.publish_mov,
-                    farm_hardware_render=self.submit_farm,
+                    **self.get_submission_arguments()
         )
-        submit_to_deadline.submit()
-        pass
+        if self.publish_mov:
+            submit_to_deadline.resolve_shotgrid_context()
+        return submit_to_deadline
 
 
-playblast_manager = PlayBlastManager()
-playblast_manager.window.show()
+# The window only in an interactive session, batch_submit imports the 
+# module from mayapy
+if not cmds.about(batch=True):
+    playblast_manager = PlayBlastManager()
+    playblast_manager.window.show()
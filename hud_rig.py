@@ -0,0 +1,1148 @@
+# HUD rig of a camera, built without any GUI.
+#
+# The HUD described by a config dictionary, which is also the layout
+# of the json HUD preset files
+#
+#   {
+#       "version": 1,
+#       "mode": "Per Line",
+#       "toggles": ["frameno_toggle", "focal_length"],
+#       "custom": [["Textures", "Approved"], ["UV", "Review"]],
+#       "color": [1.0, 1.0, 1.0],
+#       "transform": {"translate": [0, 0, 0],
+#                     "rotate": [0, 0, 0],
+#                     "scale": [1, 1, 1]}
+#   }
+#
+#   mode      - HUD layout, one of HUD_MODES
+#   toggles   - check box names of the HUD fields, HUD_FIELDS
+#   custom    - custom HUD text rows of label and text
+#   color     - text color. null keeps the color of an existing HUD
+#   transform - user transform group values. null keeps the transform
+#               of an existing HUD
+#
+# PlayBlastManager builds the config out of its widgets and exports it
+# as a preset. The same config applied through apply_hud, apply_preset
+# or apply_preset_to_scenes to any list of cameras or scene files from
+# mayapy, no Qt needed. Only the Texture Card mode draws its image
+# with QtGui, a QGuiApplication created for it when there is none.
+#
+import hashlib
+import json
+import os
+import maya.cmds as cmds
+from . import scene_query
+
+# HUD build modes. The mode index stored on the HUD group as the long
+# attribute hud_mode, a string attribute would be read back as a
+# custom HUD text row
+#   Per Line    - one type node per HUD line
+#   Single Mesh - all the static lines in one multi line type node
+#                 producing one mesh. Only the frame counter stays a
+#                 separate live type node
+#   Texture Card - the static lines baked into an image shown on a
+#                  single two triangle card. The frame counter stays a
+#                  live type node
+#   Burn In     - nothing created in the scene. The HUD fields passed
+#                 to the Draft job and drawn on the frames while the
+#                 mov is encoded
+HUD_MODES = ['Per Line', 'Single Mesh', 'Texture Card', 'Burn In']
+HUD_PER_LINE = 0
+HUD_SINGLE_MESH = 1
+HUD_TEXTURE_CARD = 2
+HUD_BURN_IN = 3
+
+# Every text node and texture card of a HUD tagged with the string
+# attributes hud_key, hud_text and the double attribute hud_y, the
+# line it shows and the line position. The update compares them with
+# the requested lines and only touches the changed ones. The joined
+# static lines of the single mesh and the texture card modes are
+# tagged with the key below
+HUD_STATIC_KEY = 'static_lines'
+HUD_LINE_STEP = -0.006
+
+# Check box names of the HUD fields in the order the lines are drawn
+HUD_FIELDS = ['frameno_toggle',
+              'scene_toggle',
+              'artist_toggle',
+              'fps_toggle',
+              'focal_length',
+              'resolution_toggle',
+              'sensor_size',
+              'pa_ratio_toggle']
+
+# Attributes of the HUD group which are not HUD lines
+HUD_GROUP_ATTRIBUTES = ('playblast_camera', 'created', 'hud_mode')
+
+PRESET_VERSION = 1
+
+# maya time units and their fps
+TIME_UNIT_FPS = {
+    'film': 24,
+    'show': 48,
+    'pal': 25,
+    'ntsc': 30,
+    'palf': 50,
+    'ntscf': 60
+}
+
+
+def create_custom_attribute(maya_node, attr_name, attr_type, value):
+
+    """ Create locked custom attributes for the given node based upon
+    the type passed
+
+    Args:
+        maya_node: maya node object
+        attr_name: name of the attribute string
+        attr_type: name of the attribute type string
+        value: attribute value"""
+
+    if attr_type == 'string':
+        cmds.addAttr(maya_node, longName=attr_name, dataType=attr_type)
+        cmds.setAttr('%s.%s' %(maya_node, attr_name), value, type="string", lock=True)
+    else:
+        cmds.addAttr(maya_node, longName=attr_name, attributeType=attr_type)
+        cmds.setAttr('%s.%s' %(maya_node, attr_name), value, lock=True)
+
+
+def set_custom_attribute(maya_node, attr_name, attr_type, value):
+
+    """ Set a locked custom attribute"""
+
+    cmds.setAttr('%s.%s' %(maya_node, attr_name), lock=False)
+    if attr_type == 'string':
+        cmds.setAttr('%s.%s' %(maya_node, attr_name), value, type="string", lock=True)
+    else:
+        cmds.setAttr('%s.%s' %(maya_node, attr_name), value, lock=True)
+
+
+def delete_custom_attribute(maya_node, attr_name):
+
+    cmds.setAttr('%s.%s' %(maya_node, attr_name), lock=False)
+    cmds.deleteAttr(maya_node, attribute=attr_name)
+
+
+def get_config(toggles=None, custom=None, mode=HUD_PER_LINE, color=None, transform=None):
+
+    """ Returns a HUD config
+
+    Args:
+        toggles: check box names of the HUD fields
+        custom: list of the label and the text of the custom rows
+        mode: HUD mode name or index
+        color: text color, None keeps the color of an existing HUD
+        transform: dictionary of the translate, rotate and scale of
+                   the user transform group. None keeps the transform
+                   of an existing HUD"""
+
+    if not isinstance(mode, int):
+        mode = HUD_MODES.index(mode)
+    return {
+        'version': PRESET_VERSION,
+        'mode': HUD_MODES[mode],
+        'toggles': [field for field in HUD_FIELDS if field in (toggles or [])],
+        'custom': [list(custom_hud) for custom_hud in custom or []],
+        'color': list(color) if color else None,
+        'transform': transform
+    }
+
+
+def load_preset(preset):
+
+    """ Returns the HUD config of a preset
+
+    Args:
+        preset: json preset file path or a config dictionary
+
+    Raises:
+        ValueError: the preset is not a valid HUD preset"""
+
+    if isinstance(preset, dict):
+        data = preset
+    else:
+        with open(preset, "r") as read_file:
+            data = json.load(read_file)
+    if data.get('mode', HUD_MODES[HUD_PER_LINE]) not in HUD_MODES:
+        raise ValueError("Unknown HUD mode %s" %data['mode'])
+    unknown_fields = [field for field in data.get('toggles', [])
+                      if field not in HUD_FIELDS]
+    if unknown_fields:
+        raise ValueError("Unknown HUD fields %s" %", ".join(unknown_fields))
+    return get_config(toggles=data.get('toggles'),
+                      custom=data.get('custom'),
+                      mode=data.get('mode', HUD_MODES[HUD_PER_LINE]),
+                      color=data.get('color'),
+                      transform=data.get('transform'))
+
+
+def save_preset(config, preset_file):
+
+    """ Write the HUD config as a json preset"""
+
+    preset_dir = os.path.dirname(preset_file)
+    if preset_dir and not os.path.exists(preset_dir):
+        os.makedirs(preset_dir)
+    with open(preset_file, "w") as write_file:
+        json.dump(load_preset(config), write_file, indent=4)
+
+
+def get_mode_index(config):
+
+    return HUD_MODES.index(config.get('mode', HUD_MODES[HUD_PER_LINE]))
+
+
+def get_field_text(field, camera):
+
+    """ Returns the HUD text of a field for the camera"""
+
+    if field == 'frameno_toggle':
+        return "Frame No"
+    if field == 'scene_toggle':
+        filename = os.path.basename(cmds.file(q=True, sn=True))
+        return os.path.splitext(filename)[0]
+    if field == 'artist_toggle':
+        return os.environ.get("USERNAME", '')
+    if field == 'fps_toggle':
+        current_unit = cmds.currentUnit(query=True, time=True)
+        fps = TIME_UNIT_FPS.get(current_unit, current_unit.replace('fps', ''))
+        return 'Fps: ' + str(fps)
+    if field == 'focal_length':
+        return "{} {}".format('Focal Length: ',
+                              cmds.getAttr(camera + ".focalLength"))
+    if field == 'resolution_toggle':
+        return "{} {},{}".format("Resolution: ",
+                                 cmds.getAttr("defaultResolution.width"),
+                                 cmds.getAttr("defaultResolution.height"))
+    if field == 'sensor_size':
+        return "{} {},{}".format("Sensor Size: ",
+                                 cmds.getAttr(camera + ".horizontalFilmAperture") * 25.4,
+                                 cmds.getAttr(camera + ".verticalFilmAperture") * 25.4)
+    if field == 'pa_ratio_toggle':
+        return "{} {}".format("Pixel Aspect Ratio: ",
+                              cmds.getAttr("defaultResolution.pixelAspect"))
+    raise ValueError("Unknown HUD field %s" %field)
+
+
+def get_hud_lines(config, camera):
+
+    """ Returns the HUD lines of the camera in the display order. Each
+    line is a tuple of the key, the HUD text, the type and the value
+    of the group attribute storing the line. The key is the check box
+    name or the custom text label"""
+
+    hud_lines = []
+    for field in HUD_FIELDS:
+        if field in config['toggles']:
+            hud_lines.append((field, get_field_text(field, camera), 'bool', 1))
+    for custom_hud in config['custom']:
+        hud_lines.append((custom_hud[0], ":".join(custom_hud), 'string', custom_hud[-1]))
+    return hud_lines
+
+
+def get_burn_in_lines(config, camera):
+
+    """ Collect the HUD lines of the camera for the burn in mode
+
+    Returns:
+        tuple of the HUD lines and whether the frame counter drawn"""
+
+    lines = []
+    frame_counter = False
+    for key, hud_text, attr_type, attr_value in get_hud_lines(config, camera):
+        if key == 'frameno_toggle':
+            frame_counter = True
+        else:
+            lines.append(hud_text)
+    return lines, frame_counter
+
+
+def get_hud_nodes(hud_lines, hud_mode):
+
+    """ Returns the nodes drawing the HUD lines as list of the key,
+    the text and the y position of the node
+
+    In single mesh and texture card modes the static lines joined
+    into one node at the position of the first static line. The frame
+    counter is a live type node and stays separate"""
+
+    hud_nodes = []
+    static_lines = []
+    y_pos = 0
+    for key, hud_text, attr_type, attr_value in hud_lines:
+        if hud_mode != HUD_PER_LINE and not hud_text.startswith('Frame No'):
+            static_lines.append((hud_text, y_pos))
+        else:
+            hud_nodes.append((key, hud_text, y_pos))
+        y_pos = y_pos + HUD_LINE_STEP
+    if static_lines:
+        hud_nodes.append((HUD_STATIC_KEY,
+                          "\n".join(hud_text for hud_text, y_pos in static_lines),
+                          static_lines[0][1]))
+    return hud_nodes
+
+
+def duplicate_camera(camera):
+
+    """ Create duplicate camera and set the custom atttributes
+    Returns the cameras"""
+
+    hud_camera = cmds.duplicate(camera, name='hud_%s' %camera)
+    min_frame = cmds.playbackOptions(q=True, min=True)
+    max_frame = cmds.playbackOptions(q=True, max=True)
+    attributes= ['translateX',
+                 'translateY',
+                 'translateZ',
+                 'rotateX',
+                 'rotateY',
+                 'rotateZ',
+                 'scaleX',
+                 'scaleY',
+                 'scaleZ',
+                 'visibility']
+
+    # Delete all locks, animation and tranform to zero
+    for attr in attributes:
+        cmds.setAttr(hud_camera[0]+'.'+attr, lock=0)
+        cmds.cutKey(hud_camera[0], time=(min_frame,max_frame), attribute=attr, option="keys")
+        if not attr.startswith('scale'):
+            cmds.setAttr(hud_camera[0]+'.'+attr, 0)
+
+    create_custom_attribute(hud_camera[0], 'playblast_camera', 'bool', 1)
+    return hud_camera
+
+
+def create_hud_nodes(hud_nodes, parent, hud_mode, color=(1, 1, 1)):
+
+    """ Create the type nodes and the texture card of the HUD nodes
+    under the parent and tag them with the line they show. All the
+    type nodes built in one batch
+
+    Args:
+        hud_nodes: list of the key, the text and the y position of
+                   the nodes, as returned by get_hud_nodes
+        parent: the HUD user transform group
+        hud_mode: HUD mode index
+        color: text color of the texture card
+
+    Returns:
+        list of the node and the shading group of the texture card,
+        empty for the type nodes"""
+
+    def is_card(key):
+        return key == HUD_STATIC_KEY and hud_mode == HUD_TEXTURE_CARD
+
+    text_nodes = iter(HudTextBuilder().build(
+                [(hud_text, y_pos) for key, hud_text, y_pos in hud_nodes
+                 if not is_card(key)]
+    ))
+    created_nodes = []
+    for key, hud_text, y_pos in hud_nodes:
+        shading_group = ''
+        new_name = ''
+        if is_card(key):
+            hud_card = HudTextureCard(hud_text.split("\n"))
+            hud_node, shading_group = hud_card.generate_card(y_pos, color)
+        else:
+            hud_node = next(text_nodes)
+            if key == HUD_STATIC_KEY:
+                new_name = 'HUD_Text'
+            else:
+                new_name = hud_text.split(':')[0]
+
+        # Relative parenting keeps the position of the line under an
+        # already moved group while updating. The node renamed under the
+        # group, so the names do not clash with the other HUDs. Tracked
+        # by its uuid as the new name can be ambiguous
+        node_uuid = cmds.ls(hud_node, uuid=True)[0]
+        cmds.parent(hud_node, parent, relative=True)
+        if new_name:
+            cmds.rename(cmds.ls(node_uuid, long=True)[0], new_name)
+        hud_node = cmds.ls(node_uuid, long=True)[0]
+        create_custom_attribute(hud_node, 'hud_key', 'string', key)
+        create_custom_attribute(hud_node, 'hud_text', 'string', hud_text)
+        create_custom_attribute(hud_node, 'hud_y', 'double', y_pos)
+        created_nodes.append((hud_node, shading_group))
+    return created_nodes
+
+
+def get_card_shaders(materials):
+
+    """ Returns the texture card shaders of the materials"""
+
+    return [material for material in materials
+            if cmds.attributeQuery("hud_card", node=material, exists=True)]
+
+
+def delete_card_shaders(card_shaders):
+
+    """ Delete the texture card shaders with their shading group,
+    image and placement nodes"""
+
+    for card_shader in card_shaders:
+        card_textures = cmds.listConnections(card_shader, type='file') or []
+        if card_textures:
+            card_textures += cmds.listConnections(card_textures,
+                                type='place2dTexture') or []
+        card_shading_groups = [
+            shading_group for shading_group in 
+            cmds.listConnections(card_shader + '.outColor', type='shadingEngine') or []
+            if cmds.attributeQuery("hud_card", node=shading_group, exists=True)
+        ]
+        cmds.delete([card_shader] + card_textures + card_shading_groups)
+
+
+def get_materials(nodes):
+
+    """ Returns the materials assigned to the meshes under the nodes"""
+
+    shapes = cmds.ls(nodes, dag=True, shapes=True, long=True) or []
+    shading_groups = cmds.listConnections(shapes, type='shadingEngine') if shapes else []
+    if not shading_groups:
+        return []
+    return list(set(cmds.ls(cmds.listConnections(shading_groups) or [],
+                            materials=True) or []))
+
+
+def get_hud_shaders(hud_group):
+
+    """ Returns tuple of the text shaders and the texture card shaders
+    of the HUD. A card only HUD has no text mesh left to find the text
+    shader through, it is found by its name"""
+
+    materials = get_materials(hud_group)
+    card_shaders = get_card_shaders(materials)
+    surface_shaders = [material for material in materials
+                       if material not in card_shaders] or \
+                      cmds.ls("%s_shaders*" %hud_group, materials=True) or []
+    return surface_shaders, card_shaders
+
+
+def delete_hud_node(hud_node):
+
+    """ Delete a text node or a texture card along with its shader"""
+
+    card_shaders = get_card_shaders(get_materials(hud_node))
+    cmds.delete(hud_node)
+    delete_card_shaders(card_shaders)
+
+
+def get_user_transform(hud_group):
+
+    """ Returns the user transform group of the HUD group, the parent
+    of the HUD text nodes"""
+
+    for children in cmds.listRelatives(hud_group, children=True, fullPath=True) or []:
+        if children.endswith("_user_transform"):
+            return children
+    return ''
+
+
+def get_master_camera(hud_group):
+
+    """ Returns the long name of the camera the HUD group follows"""
+
+    hud_cameras = cmds.parentConstraint(hud_group, q=True, targetList=True)
+    if not hud_cameras:
+        return ''
+    master_cameras = cmds.pointConstraint(hud_cameras[0], q=True, targetList=True)
+    if not master_cameras:
+        return ''
+    return cmds.ls(master_cameras[0], long=True)[0]
+
+
+def find_hud_group(camera):
+
+    """ Returns the HUD group of the camera, empty if the camera has
+    no HUD"""
+
+    camera = cmds.ls(camera, long=True)
+    snapshot = scene_query.SceneSnapshot()
+    for hud_group in snapshot.parent_constrained:
+        if camera and get_master_camera(hud_group) == camera[0]:
+            return hud_group
+    return ''
+
+
+def read_hud_state(hud_group):
+
+    """ Returns tuple of the text color and the user transform of the
+    HUD, None for the ones not found"""
+
+    color = None
+    transform = None
+    surface_shaders, card_shaders = get_hud_shaders(hud_group)
+    if surface_shaders:
+        color = list(cmds.getAttr(surface_shaders[0] + ".outColor")[0])
+    user_transform = get_user_transform(hud_group)
+    if user_transform:
+        transform = dict(
+            (attribute, list(cmds.getAttr(user_transform + "." + attribute)[0]))
+            for attribute in ('translate', 'rotate', 'scale')
+        )
+    return color, transform
+
+
+def export_hud_config(hud_group):
+
+    """ Returns the config of an existing HUD"""
+
+    scalar_attributes, string_attributes = scene_query.get_hud_attributes(hud_group)
+    custom = [[attribute, cmds.getAttr(hud_group + '.' + attribute)]
+              for attribute in string_attributes]
+    mode = HUD_PER_LINE
+    if 'hud_mode' in scalar_attributes:
+        mode = cmds.getAttr(hud_group + '.hud_mode')
+    color, transform = read_hud_state(hud_group)
+    return get_config(toggles=scalar_attributes,
+                      custom=custom,
+                      mode=mode,
+                      color=color,
+                      transform=transform)
+
+
+def set_hud_state(hud_group, color=None, transform=None):
+
+    """ Apply the text color and the user transform to a HUD"""
+
+    if color:
+        surface_shaders, card_shaders = get_hud_shaders(hud_group)
+        for surface_shader in surface_shaders:
+            cmds.setAttr('%s.outColor' %surface_shader,
+                         color[0], color[1], color[2], type="double3")
+        for card_shader in card_shaders:
+            for texture in cmds.listConnections(card_shader, type='file') or []:
+                cmds.setAttr('%s.colorGain' %texture,
+                             color[0], color[1], color[2], type="double3")
+    user_transform = get_user_transform(hud_group)
+    if transform and user_transform:
+        cmds.xform(user_transform, translation=transform['translate'])
+        cmds.xform(user_transform, rotation=transform['rotate'])
+        cmds.xform(user_transform, scale=transform['scale'])
+
+
+def update_hud_attributes(hud_group, hud_lines):
+
+    """ Add, remove and set the group attributes of the HUD lines"""
+
+    scalar_attributes, string_attributes = scene_query.get_hud_attributes(hud_group)
+    toggles = [key for key, hud_text, attr_type, attr_value in hud_lines
+               if attr_type == 'bool']
+    custom_texts = [(key, attr_value) for key, hud_text, attr_type, attr_value
+                    in hud_lines if attr_type == 'string']
+
+    for attribute in scalar_attributes:
+        if attribute not in HUD_GROUP_ATTRIBUTES and attribute not in toggles:
+            delete_custom_attribute(hud_group, attribute)
+    for key in toggles:
+        if key not in scalar_attributes:
+            create_custom_attribute(hud_group, key, 'bool', 1)
+
+    # load_hud lists the custom text back in the attribute order,
+    # the attributes recreated when a label was added, removed or
+    # moved
+    if string_attributes != [key for key, attr_value in custom_texts]:
+        for attribute in string_attributes:
+            delete_custom_attribute(hud_group, attribute)
+        for key, attr_value in custom_texts:
+            create_custom_attribute(hud_group, key, 'string', attr_value)
+    else:
+        for key, attr_value in custom_texts:
+            if cmds.getAttr('%s.%s' %(hud_group, key)) != attr_value:
+                set_custom_attribute(hud_group, key, 'string', attr_value)
+
+
+def create_hud(camera, config):
+
+    """ Create the HUD text Network with necessary constraints
+
+    Args:
+        camera: camera transform
+        config: HUD config
+
+    Returns:
+        the primary HUD group"""
+
+    hud_camera = duplicate_camera(camera)
+    color = config.get('color') or (1, 1, 1)
+
+    # Create two groups for the user selected camera one is primary
+    # handler holds the constraints and made connection between production
+    # camera and dummy duplicate camera. second one group handle is to
+    # provide transform control to the artist
+    text_hud_name = cmds.group(empty=True, name=hud_camera[0] + "_Text_HUD")
+    text_hud_transform_grp = cmds.group(empty=True,
+                                        name=hud_camera[0] + "_user_transform",
+                                        parent=text_hud_name)
+
+    create_custom_attribute(text_hud_name, 'playblast_camera', 'bool', 1)
+    create_custom_attribute(text_hud_name, 'created', 'bool', 1)
+
+    # Check box fields stored as bool attributes and the custom
+    # text as string attributes of the group
+    hud_lines = get_hud_lines(config, camera)
+    for key, hud_text, attr_type, attr_value in hud_lines:
+        create_custom_attribute(text_hud_name, key, attr_type, attr_value)
+    hud_mode = get_mode_index(config)
+    create_custom_attribute(text_hud_name, 'hud_mode', 'long', hud_mode)
+
+    card = ''
+    card_shading_group = ''
+    for hud_node, shading_group in create_hud_nodes(get_hud_nodes(hud_lines, hud_mode),
+                                                    text_hud_transform_grp,
+                                                    hud_mode,
+                                                    color):
+        if shading_group:
+            card, card_shading_group = hud_node, shading_group
+
+    cmds.xform(text_hud_name, centerPivots=True)
+    cmds.xform(text_hud_transform_grp, centerPivots=True)
+
+    # Reapply the xform again back to the group object
+    transform = config.get('transform')
+    if transform:
+        cmds.xform(text_hud_transform_grp, translation=transform['translate'])
+        cmds.xform(text_hud_transform_grp, rotation=transform['rotate'])
+        cmds.xform(text_hud_transform_grp, scale=transform['scale'])
+
+    # Screen calculation to place the text
+    device_aspect_ratio = round(
+                float(cmds.getAttr("defaultResolution.deviceAspectRatio")), 2
+    )
+
+    # Temprory positioning based on aspect ratio
+    if device_aspect_ratio == 1.33:
+        cmds.move(-0.2, 0.145, 0, text_hud_name)
+    elif device_aspect_ratio == 1:
+        cmds.move(-0.152, 0.145, 0, text_hud_name)
+    else:
+        cmds.move(-0.268, 0.142, 0, text_hud_name)
+
+    # Constraint the Hud camera with the group and maintain
+    # transform offset for the text to move withe camera
+    grp_to_camera_constraint = cmds.parentConstraint(hud_camera[0],
+                                                     text_hud_name,
+                                                     maintainOffset=True)
+    create_custom_attribute(grp_to_camera_constraint[0], 'constraint', 'bool', 1)
+    hud_camera_to_mastercam_orientconstraint = cmds.orientConstraint(camera,
+                                                                     hud_camera[0])
+    create_custom_attribute(hud_camera_to_mastercam_orientconstraint[0],
+                            'constraint', 'bool', 1)
+    hud_camera_to_mastercam_pontconstraint = cmds.pointConstraint(camera,
+                                                                  hud_camera[0])
+    create_custom_attribute(hud_camera_to_mastercam_pontconstraint[0],
+                            'constraint', 'bool', 1)
+
+    # Create surface shader anc connected it into the group aka all the meshes
+    shd = cmds.shadingNode("surfaceShader", name="%s_shaders" %text_hud_name, asShader=True)
+    create_custom_attribute(shd, 'playblast_camera', 'bool', 1)
+    shdSG = cmds.sets(name='%sSG' % shd, empty=True, renderable=True, noSurfaceShader=True)
+    cmds.setAttr('%s.outColor' %shd, color[0], color[1], color[2], type="double3")
+    cmds.connectAttr('%s.outColor' % shd, '%s.surfaceShader' % shdSG)
+    cmds.sets(text_hud_name, e=True, forceElement=shdSG)
+    # The card keeps its own textured shader
+    if card_shading_group:
+        cmds.sets(card, e=True, forceElement=card_shading_group)
+    return text_hud_name
+
+
+def update_hud(hud_group, camera, config):
+
+    """ Update the HUD in place
+
+    The tagged nodes of the HUD compared with the requested lines.
+    Only the removed lines deleted, the new lines created, the changed
+    lines get the new text and the shifted lines moved. The cameras,
+    constraints, shader and the untouched nodes stay in place.
+
+    Returns:
+        False when the HUD has to be rebuilt. Likewise the HUD mode or
+        the camera changed, or the HUD was created before the nodes
+        were tagged"""
+
+    hud_mode = get_mode_index(config)
+    if not cmds.attributeQuery('hud_mode', node=hud_group, exists=True) or \
+                cmds.getAttr(hud_group + '.hud_mode') != hud_mode:
+        return False
+
+    # The HUD has to belong to the camera
+    if get_master_camera(hud_group) not in cmds.ls(camera, long=True):
+        return False
+
+    hud_transform_grp = get_user_transform(hud_group)
+    if not hud_transform_grp:
+        return False
+    existing_nodes = {}
+    for hud_node in cmds.listRelatives(hud_transform_grp,
+                                       children=True,
+                                       fullPath=True) or []:
+        if not cmds.attributeQuery('hud_key', node=hud_node, exists=True):
+            return False
+        existing_nodes[cmds.getAttr(hud_node + '.hud_key')] = hud_node
+
+    surface_shaders, card_shaders = get_hud_shaders(hud_group)
+    text_shading_groups = []
+    color = config.get('color')
+    if surface_shaders:
+        text_shading_groups = cmds.listConnections(surface_shaders[0] + '.outColor',
+                                                   type='shadingEngine') or []
+        if not color:
+            color = cmds.getAttr(surface_shaders[0] + ".outColor")[0]
+
+    hud_lines = get_hud_lines(config, camera)
+    hud_nodes = get_hud_nodes(hud_lines, hud_mode)
+    requested_keys = [key for key, hud_text, y_pos in hud_nodes]
+
+    update_hud_attributes(hud_group, hud_lines)
+    for key, hud_node in existing_nodes.items():
+        if key not in requested_keys:
+            delete_hud_node(hud_node)
+
+    new_nodes = []
+    for key, hud_text, y_pos in hud_nodes:
+        hud_node = existing_nodes.get(key)
+        # The text of a texture card is baked, the card rebuilt
+        if hud_node and hud_mode == HUD_TEXTURE_CARD and \
+                    key == HUD_STATIC_KEY and \
+                    cmds.getAttr(hud_node + '.hud_text') != hud_text:
+            delete_hud_node(hud_node)
+            hud_node = None
+
+        if not hud_node:
+            new_nodes.append((key, hud_text, y_pos))
+            continue
+
+        if cmds.getAttr(hud_node + '.hud_text') != hud_text:
+            HudTextBuilder.set_text(hud_node, hud_text)
+            set_custom_attribute(hud_node, 'hud_text', 'string', hud_text)
+
+        # Move the line shifted by the added or removed lines above
+        current_y = cmds.getAttr(hud_node + '.hud_y')
+        if abs(current_y - y_pos) > 1e-6:
+            cmds.setAttr(hud_node + '.translateY',
+                         cmds.getAttr(hud_node + '.translateY') + y_pos - current_y)
+            set_custom_attribute(hud_node, 'hud_y', 'double', y_pos)
+
+    for hud_node, shading_group in create_hud_nodes(new_nodes,
+                                                    hud_transform_grp,
+                                                    hud_mode,
+                                                    color or (1, 1, 1)):
+        if shading_group:
+            cmds.sets(hud_node, e=True, forceElement=shading_group)
+        elif text_shading_groups:
+            cmds.sets(hud_node, e=True, forceElement=text_shading_groups[0])
+
+    set_hud_state(hud_group, config.get('color'), config.get('transform'))
+    return True
+
+
+def delete_hud(hud_group):
+
+    """ Delete the HUD group, its HUD camera and shaders"""
+
+    surface_shaders, card_shaders = get_hud_shaders(hud_group)
+    hud_cameras = cmds.parentConstraint(hud_group, q=True, targetList=True)
+    if hud_cameras:
+        cmds.delete(hud_cameras)
+    cmds.delete(hud_group)
+    if surface_shaders:
+        cmds.delete(surface_shaders[0])
+    delete_card_shaders(card_shaders)
+
+
+def apply_hud(camera, config, hud_group=''):
+
+    """ Create or update the HUD of the camera
+
+    An existing HUD updated in place when possible. Otherwise it is
+    rebuilt, keeping its color and user transform unless the config
+    sets them. All the changes made in a single undo chunk.
+
+    Args:
+        camera: camera transform
+        config: HUD config
+        hud_group: HUD group to update. Defaults to the HUD of the
+                   camera
+
+    Returns:
+        the primary HUD group"""
+
+    if not hud_group:
+        hud_group = find_hud_group(camera)
+
+    cmds.undoInfo(openChunk=True, chunkName='playblast_hud')
+    try:
+        if hud_group:
+            if update_hud(hud_group, camera, config):
+                return hud_group
+            color, transform = read_hud_state(hud_group)
+            config = dict(config)
+            config['color'] = config.get('color') or color
+            config['transform'] = config.get('transform') or transform
+            delete_hud(hud_group)
+        return create_hud(camera, config)
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+def apply_preset(preset, cameras=None):
+
+    """ Apply a HUD preset to the cameras of the open scene
+
+    Args:
+        preset: json preset file path or a config dictionary
+        cameras: camera names, defaults to all the production cameras.
+                 Cameras missing in the scene are skipped
+
+    Returns:
+        dictionary of the camera and its HUD group"""
+
+    config = load_preset(preset)
+    if get_mode_index(config) == HUD_BURN_IN:
+        raise ValueError("Burn In HUD is drawn while encoding, nothing to apply")
+    if cameras is None:
+        cameras = scene_query.SceneSnapshot().cameras
+    hud_groups = {}
+    for camera in cameras:
+        if cmds.ls(camera):
+            hud_groups[camera] = apply_hud(camera, config)
+    return hud_groups
+
+
+def apply_preset_to_scenes(preset, scene_files, cameras=None, save=True):
+
+    """ Open every scene, apply the preset to its cameras and save it
+
+    Args:
+        preset: json preset file path or a config dictionary
+        scene_files: maya scene files
+        cameras: camera names, defaults to all the production cameras
+                 of every scene
+        save: save the scenes
+
+    Returns:
+        dictionary of the scene file and the HUD groups of its cameras,
+        or the error message if the scene failed"""
+
+    config = load_preset(preset)
+    results = {}
+    for scene_file in scene_files:
+        try:
+            cmds.file(scene_file, open=True, force=True)
+            results[scene_file] = apply_preset(config, cameras)
+            if save:
+                cmds.file(save=True, force=True)
+        except (RuntimeError, ValueError) as err:
+            results[scene_file] = str(err)
+    return results
+
+
+class GenerateHudText:
+
+    """ Base Class to create 3d text of maya """
+
+    def __init__(self, text):
+
+        """Convert text to ord characters
+
+        Maya 3D text could not recogize the direct string text.
+        It should needed to converted into the ord in order to
+        recognize by the maya 3D text"""
+
+        self.text = text
+        final = list()
+        for char in str(self.text):
+            final.append(format(ord(char), "x"))
+        self.ord_text =  ' '.join(final)
+
+    def generate_text(self, y_pos=0):
+
+        """ Generate a single 2D polygon text. Batches of lines built
+        directly through HudTextBuilder"""
+
+        self.font_object_name = HudTextBuilder().build([(self.text, y_pos)])[0]
+        return self.font_object_name
+
+
+class HudTextBuilder:
+
+    """ Builds the 2D type nodes of a batch of HUD lines
+
+    CreatePolygonType runs once for the maya session and the resulting
+    type rig configured as the template, the font size set and the 
+    extrusion turned off. Every line is a duplicate of the template 
+    along with its upstream type network, only the text of the 
+    duplicate set. The default type materials removed in a single pass
+    once the batch is built.
+
+    The template is kept hidden and shared by the builds of the session.
+    It is deleted right before the scene is saved so it never ends up
+    in a scene file, and created again by the next build, likewise 
+    after a new scene is opened."""
+
+    FONT_SIZE = 0.008
+    TEXT_X = 0
+    FRAME_COUNTER_X = 0.35
+    TEXT_Z = -0.45
+
+    # Template shared by the builds of the session, tracked by its uuid
+    # so a node of the same name in another scene is never taken for it
+    template = ''
+    template_uuid = ''
+    template_type_node = ''
+    save_callback = None
+
+    @staticmethod
+    def get_type_node(text_node):
+
+        """ Returns the type node driving the text mesh"""
+
+        return cmds.ls(cmds.listHistory(text_node) or [], type='type')[0]
+
+    @staticmethod
+    def set_text(text_node, text):
+
+        """ Set the text of an existing type node"""
+
+        cmds.setAttr('%s.textInput' %HudTextBuilder.get_type_node(text_node),
+                     GenerateHudText(text).ord_text,
+                     type='string')
+
+    @classmethod
+    def has_template(cls):
+
+        """ Returns true if the template of the session still exists in
+        the open scene"""
+
+        return bool(cls.template_uuid) and \
+               cmds.ls(cls.template_uuid, long=True) == [cls.template] and \
+               cmds.objExists(cls.template_type_node)
+
+    @classmethod
+    def create_template(cls):
+
+        """ Create and configure the template type rig, unless the 
+        session already has one"""
+
+        if cls.has_template():
+            return
+        cmds.CreatePolygonType()
+        cls.template = cmds.ls(sl=True, long=True)[0]
+        cls.template_type_node = cmds.listConnections("%s.message" %cls.template)[0]
+        cmds.setAttr('%s.fontSize' %cls.template_type_node, cls.FONT_SIZE)
+        for type_node in cmds.listConnections(cls.template_type_node):
+            if 'Extrude' in type_node:
+                cmds.setAttr('%s.enableExtrusion' %type_node, 0)
+        cls.template_uuid = cmds.ls(cls.template, uuid=True)[0]
+        cls.template = cmds.ls(cmds.rename(cls.template, 'HUD_Text_template'),
+                               long=True)[0]
+        cmds.setAttr('%s.visibility' %cls.template, 0)
+        cmds.select(clear=True)
+
+        if cls.save_callback is None:
+            import maya.api.OpenMaya as om
+            cls.save_callback = om.MSceneMessage.addCallback(
+                        om.MSceneMessage.kBeforeSave,
+                        lambda client_data: cls.delete_template())
+
+    @classmethod
+    def delete_template(cls):
+
+        """ Delete the template"""
+
+        if cls.has_template():
+            cmds.delete(cls.template, cls.template_type_node)
+        cls.template = ''
+        cls.template_uuid = ''
+        cls.template_type_node = ''
+
+    @staticmethod
+    def delete_type_materials():
+
+        """ Delete the default type materials"""
+
+        type_materials = cmds.ls('type*', materials=True)
+        if type_materials:
+            cmds.delete(type_materials)
+
+    def build(self, lines):
+
+        """ Build the type nodes of the lines
+
+        Args:
+            lines: list of the text and the y position of every line.
+                   A frame no line is the frame counter, the live frame
+                   number generated by the type node itself
+
+        Returns:
+            list of the type transforms in the order of the lines"""
+
+        if not lines:
+            return []
+        text_nodes = []
+        self.create_template()
+        try:
+            for text, y_pos in lines:
+                duplicated = cmds.duplicate(self.template, upstreamNodes=True)
+                type_node = cmds.ls(duplicated, type='type')[0]
+                if not text.startswith('Frame No'):
+                    cmds.setAttr('%s.textInput' %type_node,
+                                 GenerateHudText(text).ord_text,
+                                 type='string')
+                    x_pos = self.TEXT_X
+                else:
+                    cmds.setAttr('%s.generator' %type_node, 1)
+                    x_pos = self.FRAME_COUNTER_X
+                # The template is hidden
+                cmds.setAttr('%s.visibility' %duplicated[0], 1)
+                cmds.move(x_pos, y_pos, self.TEXT_Z, duplicated[0])
+                text_nodes.append(duplicated[0])
+        finally:
+            self.delete_type_materials()
+        return text_nodes
+
+
+# Keeps the application created for the texture cards of a mayapy session
+_gui_application = None
+
+
+def get_gui_application():
+
+    """ Returns the running Qt application. Fonts and text drawing need
+    one, mayapy has none so a QGuiApplication created"""
+
+    global _gui_application
+    from PySide2.QtGui import QGuiApplication
+    application = QGuiApplication.instance()
+    if application is None:
+        _gui_application = application = QGuiApplication([])
+    return application
+
+
+class HudTextureCard:
+
+    """ Static HUD lines baked into an image shown on a single card
+
+    The image drawn once with QPainter and named after the hash of the
+    lines and the drawing settings, so it is rebuilt only when the text
+    changes. The card is a single face plane, two triangles, lined up
+    with the positions the type nodes of the lines would have.
+
+    Args:
+        lines: list of HUD text lines
+        cache_dir: directory of the baked images. Defaults to the user
+                   temp directory, which the farm can read"""
+
+    # Scene units between two HUD lines and the image pixels of a line
+    LINE_HEIGHT = 0.006
+    LINE_PIXELS = 64
+    FONT_FAMILY = 'Arial'
+
+    def __init__(self, lines, cache_dir=''):
+
+        from PySide2.QtGui import QFont, QFontMetrics
+        get_gui_application()
+        self.lines = list(lines)
+        if not cache_dir:
+            cache_dir = "Y:/pipeline/studio/temp/" + \
+                        os.environ.get('USERNAME', '') + "/" + \
+                        "maya_" + os.environ.get('maya_version', '') + "/" + \
+                        "hud_cards"
+        self.cache_dir = cache_dir
+        self.font = QFont(self.FONT_FAMILY)
+        # Cap height of the maya type font size 0.008 is about a line
+        self.font.setPixelSize(int(self.LINE_PIXELS * 4 / 3))
+        metrics = QFontMetrics(self.font)
+        self.descent = metrics.descent()
+        self.width = max([metrics.width(line) for line in self.lines] + [1])
+        self.width = (self.width + 3) // 4 * 4
+        self.height = self.LINE_PIXELS * len(self.lines) + self.descent
+
+    def get_image_path(self):
+
+        """ Returns the image path named after the hash of the lines"""
+
+        key = "\n".join(self.lines) + "|%s|%s" %(self.FONT_FAMILY,
+                                                  self.LINE_PIXELS)
+        digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, "hud_%s.png" %digest)
+
+    def bake(self):
+
+        """ Draw the lines in white on a transparent image, the color
+        applied by the shader. An existing image is reused
+
+        Returns:
+            image path"""
+
+        from PySide2.QtGui import QColor, QImage, QPainter
+        image_path = self.get_image_path()
+        if os.path.exists(image_path):
+            return image_path
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+
+        image = QImage(self.width, self.height, QImage.Format_ARGB32)
+        image.fill(QColor(0, 0, 0, 0))
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.TextAntialiasing)
+        painter.setFont(self.font)
+        painter.setPen(QColor(255, 255, 255))
+        for index, line in enumerate(self.lines):
+            painter.drawText(0, self.LINE_PIXELS * (index + 1), line)
+        painter.end()
+
+        # Written aside and moved, a render never reads a half written image
+        tmp_path = "%s.%s.png" %(os.path.splitext(image_path)[0], os.getpid())
+        image.save(tmp_path, "PNG")
+        if os.path.exists(image_path):
+            os.remove(tmp_path)
+        else:
+            os.rename(tmp_path, image_path)
+        return image_path
+
+    def generate_card(self, y_pos=0, color=(1, 1, 1)):
+
+        """ Create the card and its shader
+
+        Args:
+            y_pos: position of the first line
+            color: text color
+
+        Returns:
+            tuple of card transform and its shading group"""
+
+        image_path = self.bake()
+        scale = self.LINE_HEIGHT / float(self.LINE_PIXELS)
+        card_width = self.width * scale
+        card_height = self.height * scale
+        card = cmds.polyPlane(name='HUD_Card',
+                              width=card_width,
+                              height=card_height,
+                              subdivisionsX=1,
+                              subdivisionsY=1,
+                              axis=(0, 0, 1),
+                              constructionHistory=False)[0]
+        # Top of the card at the cap height of the first line
+        card_top = y_pos + self.LINE_HEIGHT
+        cmds.move(card_width / 2.0, card_top - card_height / 2.0, -0.45, card)
+
+        shader = cmds.shadingNode("surfaceShader", name="HUD_Card_shader", asShader=True)
+        create_custom_attribute(shader, 'playblast_camera', 'bool', 1)
+        create_custom_attribute(shader, 'hud_card', 'bool', 1)
+        texture = cmds.shadingNode("file", name="HUD_Card_image", asTexture=True)
+        placement = cmds.shadingNode("place2dTexture", name="HUD_Card_place", asUtility=True)
+        for node in (texture, placement):
+            create_custom_attribute(node, 'playblast_camera', 'bool', 1)
+        cmds.connectAttr('%s.outUV' %placement, '%s.uvCoord' %texture)
+        cmds.connectAttr('%s.outUvFilterSize' %placement, '%s.uvFilterSize' %texture)
+        cmds.setAttr('%s.fileTextureName' %texture, image_path, type="string")
+        cmds.setAttr('%s.colorGain' %texture, color[0], color[1], color[2], type="double3")
+        cmds.connectAttr('%s.outColor' %texture, '%s.outColor' %shader)
+        cmds.connectAttr('%s.outTransparency' %texture, '%s.outTransparency' %shader)
+        shading_group = cmds.sets(name='%sSG' %shader, empty=True,
+                                  renderable=True, noSurfaceShader=True)
+        create_custom_attribute(shading_group, 'playblast_camera', 'bool', 1)
+        create_custom_attribute(shading_group, 'hud_card', 'bool', 1)
+        cmds.connectAttr('%s.outColor' %shader, '%s.surfaceShader' %shading_group)
+        return card, shading_group
@@ -0,0 +1,354 @@
+# Local HW2.0 render split across several Render.exe processes.
+#
+# The frame range cut into as many sub ranges as processes allowed,
+# every sub range rendered by its own Render.exe and at most that many
+# of them running at once. The sub ranges follow the frame step, so
+# the rendered frames are the same as a single Render.exe over the
+# whole range.
+#
+# The Render.exe output streamed into a log per sub range and parsed
+# for the written exrs, giving the frames done, the frames per second,
+# the time left and the render time of every frame. The render can be
+# cancelled and the exit status of every process is collected.
+#
+# Once every sub range rendered successfully the Draft and publish
+# submission of the exrs executed a single time. A failed or cancelled
+# render keeps the submission back.
+#
+# The PlayBlastManager window runs LocalRender in a worker thread and
+# starts the submission itself. Without maya, a json job renders from
+# the command line
+#   mayapy -m playblast_manager.local_render --job render_job.json
+#
+# Job file
+#   {"render": {"scene": "...", "camera": "|shotCam", "start_frame": 1001,
+#               "end_frame": 1100, "step": 1, "output_dir": "...",
+#               "processes": 4, "executable": optional Render.exe path},
+#    "submission": {SubmitToDeadline keyword arguments} or null}
+#
+from __future__ import print_function
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.pool import ThreadPool
+
+MAYA_BIN_DIR = r'C:\Program Files\Autodesk\Maya2020\bin'
+RENDER_EXECUTABLE = os.path.join(MAYA_BIN_DIR, 'Render.exe')
+
+# No console window flashing up for every Render.exe on windows
+SUBPROCESS_FLAGS = {'creationflags': 0x08000000} if os.name == 'nt' else {}
+
+# Exr written by Render.exe, shot_v001.1001.exr
+FRAME_PATTERN = re.compile(r'[._](?P<frame>-?\d+)\.exr\b', re.IGNORECASE)
+
+
+def split_frame_range(start_frame, end_frame, step=1, parts=1):
+
+    """ Split the frame range into contiguous sub ranges
+
+    Every sub range starts on a frame of the step, so the frames
+    rendered are those of the whole range
+
+    Args:
+        start_frame: first frame
+        end_frame: last frame
+        step: frame step
+        parts: wanted number of sub ranges
+
+    Returns:
+        list of (start_frame, end_frame), never more than the frames"""
+
+    step = max(1, int(step))
+    frames = list(range(int(start_frame), int(end_frame) + 1, step))
+    if not frames:
+        return []
+    parts = max(1, min(int(parts), len(frames)))
+    size, remainder = divmod(len(frames), parts)
+    ranges = []
+    index = 0
+    for part in range(parts):
+        count = size + (1 if part < remainder else 0)
+        ranges.append((frames[index], frames[index + count - 1]))
+        index += count
+    return ranges
+
+
+class LocalRender:
+
+    """ Render of a frame range by parallel Render.exe processes
+
+    The output of every process streamed into its log and parsed for
+    the written exrs, so the frames done, the frames per second and the
+    time left are known while rendering. A process exiting
+    successfully counts all the frames of its sub range as done.
+
+    Args:
+        scene: saved maya scene
+        camera: camera rendered
+        start_frame, end_frame, step: frame range
+        output_dir: exr directory, Render.exe -rd
+        processes: Render.exe processes running at once
+        log_dir: directory of the per sub range render logs
+        executable: Render.exe path
+        submission: SubmitToDeadline of the mov, executed by the 
+                    caller once the render succeeded"""
+
+    def __init__(self,
+                 scene,
+                 camera,
+                 start_frame,
+                 end_frame,
+                 step=1,
+                 output_dir='',
+                 processes=1,
+                 log_dir='',
+                 executable='',
+                 submission=None):
+
+        self.scene = scene
+        self.camera = camera
+        self.start_frame = int(start_frame)
+        self.end_frame = int(end_frame)
+        self.step = max(1, int(step))
+        self.output_dir = output_dir
+        self.log_dir = log_dir or tempfile.gettempdir()
+        self.executable = executable or RENDER_EXECUTABLE
+        self.submission = submission
+        self.frame_ranges = split_frame_range(self.start_frame,
+                                              self.end_frame,
+                                              self.step,
+                                              processes)
+        self.total_frames = len(range(self.start_frame, self.end_frame + 1, self.step))
+        # Frame to its render seconds
+        self.frame_times = {}
+        self.results = []
+        self.cancelled = False
+        self.start_time = None
+        self.lock = threading.Lock()
+        self.running = []
+
+    def get_render_command(self, start_frame, end_frame):
+
+        """ Returns the Render.exe arguments of a sub range"""
+
+        return [self.executable,
+                '-r', 'hw2',
+                '-s', str(start_frame),
+                '-e', str(end_frame),
+                '-b', str(self.step),
+                '-cam', self.camera,
+                '-pad', '4',
+                '-of', 'exr',
+                '-rd', self.output_dir,
+                self.scene]
+
+    def get_progress(self):
+
+        """ Returns tuple of the frames done, the frames per second 
+        and the seconds left"""
+
+        with self.lock:
+            frames_done = len(self.frame_times)
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        fps = frames_done / elapsed if elapsed > 0 else 0.0
+        eta = (self.total_frames - frames_done) / fps if fps > 0 else 0.0
+        return frames_done, fps, eta
+
+    def get_slowest_frame(self):
+
+        """ Returns tuple of the frame taking the longest to render and
+        its seconds, (None, 0.0) before any frame is done"""
+
+        with self.lock:
+            if not self.frame_times:
+                return None, 0.0
+            frame = max(self.frame_times, key=self.frame_times.get)
+            return frame, self.frame_times[frame]
+
+    @property
+    def succeeded(self):
+
+        return bool(self.results) and not self.cancelled and \
+               all(return_code == 0 for start_frame, end_frame, return_code
+                   in self.results)
+
+    @property
+    def failed_ranges(self):
+
+        return [(start_frame, end_frame) for start_frame, end_frame, return_code
+                in self.results if return_code != 0]
+
+    def __frame_done(self, frame, seconds, progress_callback):
+
+        with self.lock:
+            if frame in self.frame_times:
+                return
+            self.frame_times[frame] = seconds
+        if progress_callback:
+            frames_done, fps, eta = self.get_progress()
+            progress_callback(frames_done, self.total_frames, fps, eta)
+
+    def __render_frame_range(self, frame_range, progress_callback):
+
+        start_frame, end_frame = frame_range
+        if self.cancelled:
+            return start_frame, end_frame, -1
+        frames = list(range(start_frame, end_frame + 1, self.step))
+        log_file = os.path.join(self.log_dir, 
+                                "render_%s_%s.log" %(start_frame, end_frame))
+        with open(log_file, "wb") as log:
+            try:
+                process = subprocess.Popen(
+                            self.get_render_command(start_frame, end_frame),
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            **SUBPROCESS_FLAGS
+                )
+            except OSError as err:
+                log.write(("%s\n" %err).encode('utf-8'))
+                return start_frame, end_frame, -1
+            with self.lock:
+                self.running.append(process)
+                # Cancelled while starting, cancel() did not see it
+                cancelled = self.cancelled
+            if cancelled:
+                self.__kill(process)
+            
+            last_frame_time = time.time()
+            for line in iter(process.stdout.readline, b''):
+                log.write(line)
+                match = FRAME_PATTERN.search(line.decode('utf-8', 'replace'))
+                if match and int(match.group('frame')) in frames:
+                    now = time.time()
+                    self.__frame_done(int(match.group('frame')),
+                                      now - last_frame_time,
+                                      progress_callback)
+                    last_frame_time = now
+            return_code = process.wait()
+            with self.lock:
+                self.running.remove(process)
+
+        if return_code == 0 and not self.cancelled:
+            # Frames the output did not name
+            for frame in frames:
+                self.__frame_done(frame, 0.0, progress_callback)
+        return start_frame, end_frame, return_code
+
+    def render(self, progress_callback=None):
+
+        """ Render every sub range, blocks until all the processes 
+        exited
+
+        Args:
+            progress_callback: optional callable of the frames done,
+                               the total frames, the frames per second
+                               and the seconds left
+
+        Returns:
+            True if every sub range rendered"""
+
+        if not os.path.exists(self.log_dir):
+            os.makedirs(self.log_dir)
+        self.start_time = time.time()
+        self.frame_times = {}
+        pool = ThreadPool(max(1, len(self.frame_ranges)))
+        try:
+            self.results = pool.map(
+                        lambda frame_range: self.__render_frame_range(frame_range,
+                                                                      progress_callback),
+                        self.frame_ranges
+            )
+        finally:
+            pool.close()
+            pool.join()
+        return self.succeeded
+
+    def cancel(self):
+
+        """ Stop the running Render.exe processes, the sub ranges not
+        started yet are skipped"""
+
+        with self.lock:
+            self.cancelled = True
+            running = list(self.running)
+        for process in running:
+            self.__kill(process)
+
+    @staticmethod
+    def __kill(process):
+
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == 'nt':
+                # Render.exe runs the render in a child process
+                subprocess.call(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                **SUBPROCESS_FLAGS)
+            else:
+                process.terminate()
+        except OSError:
+            pass
+
+
+def run_job(job_file):
+
+    """ Render the job and execute its submission after every sub
+    range succeeded
+
+    Returns:
+        0 if rendered and submitted, 1 otherwise"""
+
+    with open(job_file, "r") as read_file:
+        job = json.load(read_file)
+    render = job['render']
+    local_render = LocalRender(render['scene'],
+                               render['camera'],
+                               render['start_frame'],
+                               render['end_frame'],
+                               step=render['step'],
+                               output_dir=render['output_dir'],
+                               processes=render['processes'],
+                               log_dir=os.path.dirname(os.path.abspath(job_file)),
+                               executable=render.get('executable', ''))
+
+    def report(frames_done, total_frames, fps, eta):
+        print("Rendered %s/%s frames, %.2f fps, %d seconds left" %(frames_done,
+                                                                    total_frames,
+                                                                    fps,
+                                                                    eta))
+        sys.stdout.flush()
+
+    local_render.render(progress_callback=report)
+    frames_done, fps, eta = local_render.get_progress()
+    print("Rendered %s frames in %.1f seconds" %(frames_done,
+                                                 time.time() - local_render.start_time))
+    if not local_render.succeeded:
+        print("Failed frames %s, nothing submitted" %", ".join(
+                    "%s-%s" %frame_range for frame_range in local_render.failed_ranges))
+        return 1
+
+    if job.get('submission'):
+        from . import submit_to_deadline
+        submission = submit_to_deadline.SubmitToDeadline(**job['submission'])
+        submission.submit()
+    return 0
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local parallel HW2.0 render")
+    parser.add_argument('--job', required=True)
+    args = parser.parse_args()
+    return run_job(args.job)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,495 @@
+# Per workstation queue of the local HW2.0 renders.
+#
+# Every job is a json file in the queue directory, the directory it
+# sits in is its state
+#   queued/     waiting, rendered in the order they were added
+#   running/    rendering
+#   done/       rendered and its mov submitted
+#   failed/     a sub range failed or the submission raised
+#   cancelled/  cancelled while waiting or rendering
+# Moving a job between the states is a rename, so only one runner
+# ever claims a queued job. Adding a job writes one file and starts the
+# runner when none is alive, it returns in milliseconds.
+#
+# The runner is a detached mayapy process, it keeps going when maya is
+# closed. It renders up to concurrency jobs at once through LocalRender
+# and executes the Draft/publish submission of every job as soon as
+# that job rendered. The concurrency comes from the environment 
+# PLAYBLAST_RENDER_QUEUE_CONCURRENCY (default 1), every job runs its
+# own Render.exe processes on top. It is fixed when the runner starts,
+# the jobs added while a runner is alive are rendered with its one.
+# The shotgrid entities are resolved in maya while adding the job, the
+# runner needs no toolkit.
+#
+# runner.json is the claim of the runner taking new jobs, its token
+# and heartbeat. A heartbeat older than HEARTBEAT_TIMEOUT means the 
+# runner died and the next added job starts a new one. Every runner
+# also refreshes its own heartbeat in runners/<token>.json and writes
+# its token into the jobs it claimed. A runner finding the claim taken
+# over by another runner stops claiming new jobs, finishes its running
+# ones and exits. A starting runner puts back into the queue only the
+# jobs of running/ whose runner heartbeat expired, the jobs of a runner
+# still rendering are never rendered twice.
+#
+# Job file
+#   {"id": "1697600000000000_3f2a9c1b", "created": 1697600000.0,
+#    "render": {LocalRender keyword arguments},
+#    "submission": {SubmitToDeadline keyword arguments} or null,
+#    "runner": token of the runner rendering it,
+#    "result": {"message": "...", "started": ..., "finished": ...}}
+#
+from __future__ import print_function
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+from . import local_render
+
+MAYAPY_EXECUTABLE = os.path.join(local_render.MAYA_BIN_DIR, 'mayapy.exe')
+JOB_STATES = ('queued', 'running', 'done', 'failed', 'cancelled')
+HEARTBEAT_SECONDS = 5
+HEARTBEAT_TIMEOUT = 30
+# The runner exits after being idle that long
+IDLE_TIMEOUT = 60
+# Jobs rendered at once by a runner started from this workstation
+DEFAULT_CONCURRENCY = max(1, int(os.environ.get('PLAYBLAST_RENDER_QUEUE_CONCURRENCY', '') or 1))
+
+
+def replace_file(source, destination):
+
+    """ Move the file over the destination in a single step, there is
+    no moment the destination does not exist"""
+
+    if hasattr(os, 'replace'):
+        os.replace(source, destination)
+    elif os.name == 'nt':
+        # Python 2 on windows, os.rename does not replace.
+        # MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH
+        import ctypes
+        if not ctypes.windll.kernel32.MoveFileExW(unicode(source),
+                                                   unicode(destination),
+                                                   0x1 | 0x8):
+            raise ctypes.WinError()
+    else:
+        os.rename(source, destination)
+
+
+def write_json(path, data):
+
+    """ Write the json into a temp file and move it, a reader never
+    sees a half written or a missing file
+
+    Raises:
+        OSError: the file could not be replaced, likewise on windows
+                 while another process has it open"""
+
+    tmp_file = "%s.%s.%s.tmp" %(path, os.getpid(), threading.current_thread().ident)
+    with open(tmp_file, "w") as write_file:
+        json.dump(data, write_file, indent=4)
+    try:
+        replace_file(tmp_file, path)
+    except OSError:
+        os.remove(tmp_file)
+        raise
+
+
+def write_json_retried(path, data, attempts=5):
+
+    """ Write the json, retried while another process holds the file
+    open. For the runner, a failed write never stops its renders
+
+    Returns:
+        True if written"""
+
+    for attempt in range(attempts):
+        try:
+            write_json(path, data)
+            return True
+        except (IOError, OSError) as err:
+            error = err
+            time.sleep(0.2)
+    print("%s not written: %s" %(path, error))
+    sys.stdout.flush()
+    return False
+
+
+def read_json(path):
+
+    try:
+        with open(path, "r") as read_file:
+            return json.load(read_file)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+class RenderQueue:
+
+    """ On disk queue of the local renders of this workstation
+
+    Args:
+        queue_dir: queue directory. Defaults to the user temp directory
+        concurrency: jobs rendered at once by the runner started from
+                     this queue"""
+
+    def __init__(self, queue_dir='', concurrency=DEFAULT_CONCURRENCY):
+
+        if not queue_dir:
+            queue_dir = "Y:/pipeline/studio/temp/" + \
+                        os.environ.get('USERNAME', '') + "/" + \
+                        "maya_" + os.environ.get('maya_version', '') + "/" + \
+                        "render_queue"
+        self.queue_dir = queue_dir
+        self.concurrency = concurrency
+        self.runner_file = os.path.join(queue_dir, "runner.json")
+        for state in JOB_STATES + ('logs', 'runners'):
+            state_dir = os.path.join(queue_dir, state)
+            if not os.path.exists(state_dir):
+                try:
+                    os.makedirs(state_dir)
+                except OSError:
+                    # Created by the runner in the meantime
+                    pass
+
+    def get_job_file(self, state, job_id):
+
+        return os.path.join(self.queue_dir, state, job_id + ".json")
+
+    def get_log_dir(self, job_id):
+
+        return os.path.join(self.queue_dir, 'logs', job_id)
+
+    def move_job(self, job_id, from_state, to_state):
+
+        """ Move the job to another state
+
+        Returns:
+            True if moved, False if the job is not in from_state
+            anymore"""
+
+        try:
+            os.rename(self.get_job_file(from_state, job_id),
+                      self.get_job_file(to_state, job_id))
+        except OSError:
+            return False
+        return True
+
+    def add_job(self, render, submission=None):
+
+        """ Add a job and make sure a runner renders it
+
+        Args:
+            render: LocalRender keyword arguments
+            submission: SubmitToDeadline keyword arguments, executed
+                        after the job rendered
+
+        Returns:
+            job id"""
+
+        job_id = "%016d_%s" %(int(time.time() * 1000000), uuid.uuid4().hex[:8])
+        render = dict(render)
+        render['log_dir'] = self.get_log_dir(job_id)
+        write_json(self.get_job_file('queued', job_id), {
+            'id': job_id,
+            'created': time.time(),
+            'render': render,
+            'submission': submission,
+            'result': {}
+        })
+        self.start_runner()
+        return job_id
+
+    def cancel_job(self, job_id):
+
+        """ Cancel a queued job right away. A running job gets a cancel
+        marker the runner picks up within HEARTBEAT_SECONDS
+
+        Returns:
+            True if the job was still queued or running"""
+
+        if self.move_job(job_id, 'queued', 'cancelled'):
+            return True
+        if os.path.exists(self.get_job_file('running', job_id)):
+            with open(os.path.join(self.queue_dir, 'running', job_id + ".cancel"), "w"):
+                pass
+            return True
+        return False
+
+    def get_jobs(self, states=JOB_STATES):
+
+        """ Returns list of the job dictionaries in their order, the
+        state of each job added as 'state'"""
+
+        jobs = []
+        for state in states:
+            state_dir = os.path.join(self.queue_dir, state)
+            for file_name in os.listdir(state_dir):
+                if not file_name.endswith(".json"):
+                    continue
+                job = read_json(os.path.join(state_dir, file_name))
+                if job is None:
+                    continue
+                job['state'] = state
+                jobs.append(job)
+        return sorted(jobs, key=lambda job: job['id'])
+
+    def get_heartbeat_file(self, token):
+
+        return os.path.join(self.queue_dir, 'runners', token + ".json")
+
+    def is_runner_alive(self):
+
+        runner = read_json(self.runner_file)
+        return bool(runner) and \
+               time.time() - runner.get('heartbeat', 0) < HEARTBEAT_TIMEOUT
+
+    def get_alive_runners(self):
+
+        """ Returns the tokens of the runners their own heartbeat is
+        recent, the runner holding the claim or not"""
+
+        tokens = []
+        runners_dir = os.path.join(self.queue_dir, 'runners')
+        for file_name in os.listdir(runners_dir):
+            if not file_name.endswith(".json"):
+                continue
+            runner = read_json(os.path.join(runners_dir, file_name))
+            if runner and time.time() - runner.get('heartbeat', 0) < HEARTBEAT_TIMEOUT:
+                tokens.append(file_name[:-len(".json")])
+        return tokens
+
+    def start_runner(self):
+
+        """ Start a detached runner process unless one is alive. The
+        runner file claimed for the new runner right away, so the jobs
+        added while it starts do not start more runners. The claim is
+        given up again when the runner can not be started"""
+
+        if self.is_runner_alive():
+            return
+        token = uuid.uuid4().hex
+        write_json(self.runner_file, {'token': token,
+                                      'pid': None,
+                                      'heartbeat': time.time()})
+        package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+                    [package_dir] + [path for path in [env.get('PYTHONPATH')] if path]
+        )
+        mayapy = env.get('MAYAPY', '') or MAYAPY_EXECUTABLE
+        kwargs = {}
+        if os.name == 'nt':
+            # DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP, no console
+            # and not killed with maya. No close_fds, Python 2 on 
+            # windows can not close the handles when the output is
+            # redirected
+            kwargs['creationflags'] = 0x00000008 | 0x00000200
+        else:
+            kwargs['preexec_fn'] = os.setsid
+            kwargs['close_fds'] = True
+        try:
+            with open(os.path.join(self.queue_dir, "runner.log"), "a") as log:
+                subprocess.Popen([mayapy,
+                                  '-m', '%s.render_queue' %__name__.rsplit('.', 1)[0],
+                                  '--queue-dir', self.queue_dir,
+                                  '--concurrency', str(self.concurrency),
+                                  '--token', token],
+                                 stdout=log,
+                                 stderr=subprocess.STDOUT,
+                                 env=env,
+                                 **kwargs)
+        except (IOError, OSError):
+            # Without the claim the next added job tries again instead
+            # of waiting for the heartbeat timeout
+            self.release_claim(token)
+            raise
+
+    def release_claim(self, token):
+
+        """ Remove runner.json if the claim is still the one of the 
+        token, never the claim of another runner"""
+
+        runner = read_json(self.runner_file) or {}
+        if runner.get('token') != token:
+            return
+        try:
+            os.remove(self.runner_file)
+        except OSError:
+            pass
+
+
+class RenderQueueRunner:
+
+    """ Render the queued jobs until the queue stays empty for
+    IDLE_TIMEOUT seconds
+
+    Args:
+        queue: RenderQueue
+        token: runner file token written by RenderQueue.start_runner.
+               Without it the runner only starts if no runner is alive"""
+
+    def __init__(self, queue, token=''):
+
+        self.queue = queue
+        self.token = token or uuid.uuid4().hex
+        self.renders = {}
+        self.lock = threading.Lock()
+        self.claimed = True
+
+    def write_heartbeat(self):
+
+        """ Refresh the heartbeat of this runner and, while this runner
+        holds the claim, the one of runner.json. Retried when the file
+        is held open by a reader, a failed heartbeat never stops the
+        runner and its renders
+
+        Returns:
+            False once the claim belongs to another runner"""
+
+        heartbeat = {'token': self.token,
+                     'pid': os.getpid(),
+                     'heartbeat': time.time()}
+        write_json_retried(self.queue.get_heartbeat_file(self.token), heartbeat)
+        if self.claimed:
+            runner = read_json(self.queue.runner_file)
+            if runner and runner.get('token') != self.token:
+                print("Runner %s took over the queue, no new job claimed" 
+                      %runner.get('token'))
+                sys.stdout.flush()
+                self.claimed = False
+            else:
+                # Also taken again when the claim was removed
+                write_json_retried(self.queue.runner_file, heartbeat)
+        return self.claimed
+
+    def requeue_orphaned_jobs(self):
+
+        """ Put back into the queue the running jobs of the runners that
+        died. A job without a runner yet is being claimed, it is only 
+        orphaned when no other runner is alive"""
+
+        alive = [token for token in self.queue.get_alive_runners() 
+                 if token != self.token]
+        for job in self.queue.get_jobs(states=('running',)):
+            runner = job.get('runner')
+            if runner == self.token or runner in alive or \
+                        (not runner and alive):
+                continue
+            self.queue.move_job(job['id'], 'running', 'queued')
+
+    def run_job(self, job):
+
+        """ Render a claimed job and execute its submission, the job
+        moved to its final state"""
+
+        job_id = job['id']
+        job['result'] = {'started': time.time()}
+        state = 'failed'
+        try:
+            render = local_render.LocalRender(**job['render'])
+            with self.lock:
+                self.renders[job_id] = render
+            if render.render():
+                message = "Rendered %s frames" %render.total_frames
+                if job['submission']:
+                    from . import submit_to_deadline
+                    submission = submit_to_deadline.SubmitToDeadline(**job['submission'])
+                    message += "\n" + submission.submit()
+                state = 'done'
+            elif render.cancelled:
+                message = "Cancelled"
+                state = 'cancelled'
+            else:
+                message = "Failed frames %s" %", ".join(
+                            "%s-%s" %frame_range for frame_range in render.failed_ranges)
+        except Exception as err:
+            message = "Failed\n%s" %err
+        job['result']['finished'] = time.time()
+        job['result']['message'] = message
+        print("%s %s %s" %(job_id, state, message))
+        sys.stdout.flush()
+
+        write_json_retried(self.queue.get_job_file('running', job_id), job)
+        self.queue.move_job(job_id, 'running', state)
+        cancel_file = os.path.join(self.queue.queue_dir, 'running', job_id + ".cancel")
+        if os.path.exists(cancel_file):
+            os.remove(cancel_file)
+        with self.lock:
+            del self.renders[job_id]
+
+    def check_cancelled(self):
+
+        with self.lock:
+            renders = dict(self.renders)
+        for job_id, render in renders.items():
+            cancel_file = os.path.join(self.queue.queue_dir, 'running', job_id + ".cancel")
+            if not render.cancelled and os.path.exists(cancel_file):
+                render.cancel()
+
+    def run(self):
+
+        """ Runner loop
+
+        Returns:
+            exit code, 1 if another runner is alive"""
+
+        runner = read_json(self.queue.runner_file) or {}
+        if self.queue.is_runner_alive() and runner.get('token') != self.token:
+            return 1
+        self.write_heartbeat()
+        self.requeue_orphaned_jobs()
+
+        threads = []
+        idle_since = time.time()
+        while True:
+            claimed = self.write_heartbeat()
+            self.check_cancelled()
+            threads = [thread for thread in threads if thread.is_alive()]
+            if claimed and len(threads) < self.queue.concurrency:
+                for job in self.queue.get_jobs(states=('queued',)):
+                    if len(threads) >= self.queue.concurrency:
+                        break
+                    # Claimed by the rename, another runner can not
+                    # take it anymore
+                    if not self.queue.move_job(job['id'], 'queued', 'running'):
+                        continue
+                    job['runner'] = self.token
+                    write_json_retried(self.queue.get_job_file('running', job['id']), job)
+                    thread = threading.Thread(target=self.run_job, args=(job,))
+                    thread.daemon = True
+                    thread.start()
+                    threads.append(thread)
+            if threads:
+                idle_since = time.time()
+            elif not claimed or time.time() - idle_since > IDLE_TIMEOUT:
+                break
+            time.sleep(HEARTBEAT_SECONDS)
+
+        self.queue.release_claim(self.token)
+        try:
+            os.remove(self.queue.get_heartbeat_file(self.token))
+        except OSError:
+            pass
+        # A job added while exiting saw this runner alive
+        if claimed and self.queue.get_jobs(states=('queued',)):
+            self.queue.start_runner()
+        return 0
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Local render queue runner")
+    parser.add_argument('--queue-dir', default='')
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--token', default='')
+    args = parser.parse_args()
+    return RenderQueueRunner(RenderQueue(args.queue_dir, args.concurrency),
+                             token=args.token).run()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+# Render snapshot scene of a camera.
+#
+# Instead of saving the working scene of the artist and rendering it
+# with everything it holds, only what the camera renders is exported
+# into a separate maya binary
+#   - the camera
+#   - the HUD rig of the camera, group, HUD camera and shaders
+#   - the geometry and lights that can be visible. Objects hidden for
+#     the whole shot, by themselves, a parent or a display layer, and 
+#     the intermediate shapes left out, the references having nothing
+#     visible are dropped with them. A visibility animated or driven 
+#     by a connection keeps the object, whatever its current value
+#   - the render globals, resolution and HW2.0 settings
+# The construction history, constraints, expressions and shaders of the
+# exported nodes come with them, so the animation and the deformations
+# are kept. The references stay references.
+#
+# Snapshots are versioned next to the scene and written read only
+#   <scene dir>/render_snapshots/<scene>/<scene>_<camera>_v001.mb
+#
+import os
+import re
+import stat
+import maya.cmds as cmds
+from . import hud_rig
+
+RENDER_GLOBAL_NODES = ('defaultRenderGlobals',
+                       'defaultResolution',
+                       'hardwareRenderingGlobals')
+
+
+def is_visibility_off(attribute):
+
+    """ Returns true if the visibility attribute is off and nothing 
+    animates or drives it"""
+
+    return not cmds.getAttr(attribute) and \
+           not cmds.listConnections(attribute, source=True, destination=False)
+
+
+def is_static_hidden(node, hidden_nodes):
+
+    """ Returns true if the dag node is hidden on every frame, by its
+    own visibility, a parent visibility or a display layer
+
+    Args:
+        node: long name of the dag node
+        hidden_nodes: dictionary of the nodes already checked, the 
+                      parents shared by many shapes checked once"""
+
+    if node in hidden_nodes:
+        return hidden_nodes[node]
+    hidden = is_visibility_off(node + '.visibility')
+    if not hidden:
+        for layer in cmds.listConnections(node + '.drawOverride',
+                                          type='displayLayer',
+                                          source=True,
+                                          destination=False) or []:
+            if cmds.getAttr(layer + '.enabled') and \
+                        is_visibility_off(layer + '.visibility'):
+                hidden = True
+                break
+    if not hidden:
+        parent = node.rsplit('|', 1)[0]
+        if parent:
+            hidden = is_static_hidden(parent, hidden_nodes)
+    hidden_nodes[node] = hidden
+    return hidden
+
+
+def get_snapshot_nodes(camera):
+
+    """ Returns the nodes the camera needs for the render
+
+    Args:
+        camera: camera transform
+
+    Returns:
+        list of the transforms and the render global nodes to export"""
+
+    nodes = cmds.ls(camera, long=True) or []
+
+    hud_group = hud_rig.find_hud_group(camera)
+    if hud_group:
+        nodes += cmds.ls(hud_group, long=True) or []
+        # The HUD camera drives the HUD group
+        nodes += cmds.ls(cmds.parentConstraint(hud_group,
+                                               q=True,
+                                               targetList=True) or [],
+                         long=True) or []
+
+    # Not visible=True, it only knows the current frame. A shape hidden
+    # now but shown later in the shot has to be in the snapshot
+    hidden_nodes = {}
+    shapes = [shape for shape in cmds.ls(geometry=True, lights=True,
+                                         noIntermediate=True, long=True) or []
+              if not is_static_hidden(shape, hidden_nodes)]
+    if shapes:
+        nodes += cmds.listRelatives(shapes, parent=True, fullPath=True) or []
+
+    nodes += [node for node in RENDER_GLOBAL_NODES if cmds.objExists(node)]
+
+    # The set for the lookup, the list keeps the order
+    unique_nodes = []
+    seen_nodes = set()
+    for node in nodes:
+        if node not in seen_nodes:
+            seen_nodes.add(node)
+            unique_nodes.append(node)
+    return unique_nodes
+
+
+def get_snapshot_path(scene_file, camera):
+
+    """ Returns the next version path of the camera snapshot"""
+
+    scene_dir, scene_base_name = os.path.split(scene_file)
+    scene_name = os.path.splitext(scene_base_name)[0]
+    camera_name = camera.split('|')[-1].replace(':', '_')
+    snapshot_dir = os.path.join(scene_dir, "render_snapshots", scene_name)
+    name = "%s_%s_v" %(scene_name, camera_name)
+
+    version_pattern = re.compile(r'^%s(\d+)\.mb$' %re.escape(name))
+    versions = [0]
+    if os.path.isdir(snapshot_dir):
+        for file_name in os.listdir(snapshot_dir):
+            match = version_pattern.match(file_name)
+            if match:
+                versions.append(int(match.group(1)))
+    return os.path.join(snapshot_dir, "%s%03d.mb" %(name, max(versions) + 1))
+
+
+def write_render_snapshot(camera, scene_file=''):
+
+    """ Export the render snapshot of the camera. The working scene is
+    neither saved nor renamed
+
+    Args:
+        camera: rendered camera
+        scene_file: working scene the snapshot is versioned next to.
+                    Defaults to the open scene
+
+    Returns:
+        snapshot file path"""
+
+    scene_file = scene_file or cmds.file(query=True, sceneName=True)
+    if not scene_file:
+        raise RuntimeError("The scene is not saved, no render snapshot path")
+    snapshot_path = get_snapshot_path(scene_file, camera)
+    snapshot_dir = os.path.dirname(snapshot_path)
+    if not os.path.exists(snapshot_dir):
+        os.makedirs(snapshot_dir)
+
+    selection = cmds.ls(selection=True, long=True) or []
+    try:
+        cmds.select(get_snapshot_nodes(camera), replace=True, noExpand=True)
+        cmds.file(snapshot_path,
+                  force=True,
+                  options='v=0;',
+                  type='mayaBinary',
+                  exportSelected=True,
+                  preserveReferences=True,
+                  constructionHistory=True,
+                  channels=True,
+                  constraints=True,
+                  expressions=True,
+                  shader=True)
+    finally:
+        if selection:
+            cmds.select(selection, replace=True, noExpand=True)
+        else:
+            cmds.select(clear=True)
+
+    os.chmod(snapshot_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+    return snapshot_path
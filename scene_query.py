@@ -0,0 +1,128 @@
+# Batched scene queries of the cameras and the HUD rigs.
+#
+# The HUD rig nodes are tagged with custom attributes at creation
+#   playblast_camera - HUD group, dummy HUD camera and the HUD shader
+#   constraint       - the parent, orient and point constraints of the rig
+# Instead of walking every constraint or transform of the scene and
+# asking attributeQuery on each, the tagged nodes are listed through
+# their attribute in a single ls call. Only the few HUD rig nodes are
+# queried further, so the cost no longer grows with the size of the
+# layout scene.
+#
+# A snapshot is taken once per GUI operation and answers all the
+# camera and HUD lookups of that operation.
+#
+import maya.cmds as cmds
+
+
+def ls_tagged(attribute, **kwargs):
+
+    """ Returns the nodes having the custom attribute, namespaces
+    included
+
+    Args:
+        attribute: custom attribute name
+        kwargs: any ls filter, likewise type='transform'"""
+
+    nodes = cmds.ls('*.%s' %attribute, objectsOnly=True, recursive=True) or []
+    if not nodes or not kwargs:
+        return nodes
+    return cmds.ls(nodes, **kwargs) or []
+
+
+class SceneSnapshot:
+
+    """ Cameras and HUD rigs of the scene collected in bulk
+
+    Attributes:
+        cameras: full path of the production camera transforms.
+                 Startup and HUD cameras excluded
+        hud_nodes: HUD group and HUD camera transforms, sorted
+        hud_materials: shaders created for the HUDs
+        hud_textures: image and placement nodes of the HUD cards
+        point_targets: HUD node to its point constraint target, the
+                       master camera of the HUD camera
+        parent_constrained: HUD nodes holding a parent constraint, the
+                            primary HUD groups
+        cameras_with_hud: full path of the master cameras having a HUD"""
+
+    def __init__(self):
+
+        self.cameras = []
+        self.hud_nodes = []
+        self.hud_materials = []
+        self.hud_textures = []
+        self.point_targets = {}
+        self.parent_constrained = []
+        self.cameras_with_hud = []
+        self.collect()
+
+    def collect(self):
+
+        """ Query the scene"""
+
+        # ls of an empty list returns every node of the scene,
+        # so the empty lists never passed further
+        self.hud_nodes = []
+        self.hud_materials = []
+        self.hud_textures = []
+        hud_long_names = set()
+        hud_tagged = ls_tagged('playblast_camera')
+        if hud_tagged:
+            self.hud_nodes = sorted(cmds.ls(hud_tagged, type='transform') or [])
+            self.hud_materials = cmds.ls(hud_tagged, materials=True) or []
+            self.hud_textures = cmds.ls(hud_tagged, 
+                                        type=['file', 'place2dTexture']) or []
+        if self.hud_nodes:
+            hud_long_names = set(cmds.ls(self.hud_nodes, long=True) or [])
+
+        # The shape long path holds the transform path, no
+        # listRelatives needed per camera
+        self.cameras = []
+        for camera_shape in cmds.ls(cameras=True, long=True) or []:
+            if cmds.camera(camera_shape, q=True, startupCamera=True):
+                continue
+            camera_transform = camera_shape.rsplit('|', 1)[0]
+            if camera_transform not in hud_long_names and \
+                        camera_transform not in self.cameras:
+                self.cameras.append(camera_transform)
+
+        self.point_targets = {}
+        self.parent_constrained = []
+        for hud_node in self.hud_nodes:
+            point_targets = cmds.pointConstraint(hud_node, q=True, tl=True)
+            if point_targets:
+                self.point_targets[hud_node] = point_targets[0]
+            if cmds.parentConstraint(hud_node, q=True):
+                self.parent_constrained.append(hud_node)
+
+        # Only the tagged point constraints, the master cameras
+        # are their targets
+        master_cameras = []
+        for constraint in ls_tagged('constraint', type='pointConstraint'):
+            master_cameras += cmds.pointConstraint(constraint,
+                                                   q=True,
+                                                   targetList=True) or []
+        self.cameras_with_hud = []
+        if master_cameras:
+            for camera in cmds.ls(master_cameras, long=True) or []:
+                if camera not in self.cameras_with_hud:
+                    self.cameras_with_hud.append(camera)
+
+    def get_hud_attributes(self, hud_node):
+
+        return get_hud_attributes(hud_node)
+
+
+def get_hud_attributes(hud_node):
+
+    """ Returns tuple of the toggle attributes and the custom
+    string HUD attributes of the primary HUD group"""
+
+    user_attributes = cmds.listAttr(hud_node, userDefined=True) or []
+    scalar_attributes = cmds.listAttr(hud_node,
+                                      userDefined=True,
+                                      scalar=True) or []
+    string_attributes = [attribute for attribute in user_attributes
+                         if attribute not in scalar_attributes]
+    return scalar_attributes, string_attributes
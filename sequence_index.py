@@ -0,0 +1,290 @@
+# Index of the image sequences under a folder tree.
+#
+# Every directory scanned once with scandir, its files grouped into
+# sequences and the result persisted in a json cache keyed by the
+# directory path and its mtime. Creating, deleting or renaming a file
+# changes the mtime of its directory, so an unchanged directory is
+# never listed again, the cached sub directories are still visited.
+#
+# Sequence entry
+#   {"name": "shot_v001.", "padding": 4, "extension": ".exr",
+#    "first_frame": 1001, "last_frame": 1100, "frame_count": 98,
+#    "gaps": [[1010, 1011]], "total_bytes": 123456789}
+#
+# The module do not import maya or Qt so it can be used from the GUI,
+# worker threads and the farm side scripts.
+#
+import json
+import os
+import re
+import threading
+try:
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+# shot_v001.1001.exr, shot_v001_1001.exr
+SEQUENCE_PATTERN = re.compile(r'^(?P<name>.*?[._])(?P<frame>\d+)(?P<extension>\.[^.]+)$')
+
+
+def list_directory(path):
+
+    """ Returns list of (name, is_dir, size) of the directory entries.
+    Uses scandir when available, on windows the sizes come with the
+    listing and cost no extra stat call"""
+
+    entries = []
+    if scandir is not None:
+        for entry in scandir(path):
+            try:
+                if entry.is_dir():
+                    entries.append((entry.name, True, 0))
+                else:
+                    entries.append((entry.name, False, entry.stat().st_size))
+            except OSError:
+                # Deleted while listing
+                continue
+        return entries
+
+    for name in os.listdir(path):
+        full_path = os.path.join(path, name)
+        try:
+            if os.path.isdir(full_path):
+                entries.append((name, True, 0))
+            else:
+                entries.append((name, False, os.path.getsize(full_path)))
+        except OSError:
+            continue
+    return entries
+
+
+def group_sequences(files, extensions=('.exr',)):
+
+    """ Group the file names into sequences
+
+    Args:
+        files: list of (name, size)
+        extensions: file extensions considered as image sequences
+
+    Returns:
+        list of sequence dictionaries sorted by name"""
+
+    grouped = {}
+    for name, size in files:
+        match = SEQUENCE_PATTERN.match(name)
+        if not match or match.group('extension').lower() not in extensions:
+            continue
+        key = (match.group('name'),
+               len(match.group('frame')),
+               match.group('extension'))
+        frames = grouped.setdefault(key, [[], 0])
+        frames[0].append(int(match.group('frame')))
+        frames[1] += size
+
+    sequences = []
+    for (name, padding, extension), (frames, total_bytes) in sorted(grouped.items()):
+        frames.sort()
+        gaps = []
+        for previous_frame, frame in zip(frames, frames[1:]):
+            if frame - previous_frame > 1:
+                gaps.append([previous_frame + 1, frame - 1])
+        sequences.append({
+            'name': name,
+            'padding': padding,
+            'extension': extension,
+            'first_frame': frames[0],
+            'last_frame': frames[-1],
+            'frame_count': len(frames),
+            'gaps': gaps,
+            'total_bytes': total_bytes
+        })
+    return sequences
+
+
+def get_sequence_path(directory, sequence):
+
+    """ Returns the hashed path of the sequence likewise
+    /renders/shot/shot_v001.####.exr"""
+
+    return os.path.join(directory,
+                        sequence['name'] +
+                        '#' * sequence['padding'] +
+                        sequence['extension'])
+
+
+class SequenceIndex:
+
+    """ Persistent, mtime keyed index of the image sequences
+
+    Args:
+        cache_file: json file the index persisted into. Defaults to
+                    the user temp directory
+        extensions: file extensions considered as image sequences"""
+
+    def __init__(self, cache_file='', extensions=('.exr',)):
+
+        if not cache_file:
+            cache_file = "Y:/pipeline/studio/temp/" + \
+                         os.environ.get('USERNAME', '') + "/" + \
+                         "maya_" + os.environ.get('maya_version', '') + "/" + \
+                         "sequence_index.json"
+        self.cache_file = cache_file
+        self.extensions = extensions
+        self.lock = threading.Lock()
+        self.directories = {}
+        self.modified = False
+        self.load()
+
+    @staticmethod
+    def __key(path):
+
+        return os.path.normcase(os.path.normpath(path))
+
+    def __forget(self, key):
+
+        """ Prune the entry of a directory gone or not readable"""
+
+        with self.lock:
+            if self.directories.pop(key, None) is not None:
+                self.modified = True
+
+    def load(self):
+
+        """ Load the persisted index"""
+
+        try:
+            with open(self.cache_file, "r") as read_file:
+                self.directories = json.load(read_file)
+        except (IOError, OSError, ValueError):
+            self.directories = {}
+
+    def save(self):
+
+        """ Persist the index if anything was rescanned. Written into a
+        temp file and moved so a reader never sees a half written file"""
+
+        with self.lock:
+            if not self.modified:
+                return
+            data = json.dumps(self.directories)
+            self.modified = False
+        cache_dir = os.path.dirname(self.cache_file)
+        if cache_dir and not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        tmp_file = "%s.%s.%s.tmp" %(self.cache_file,
+                                    os.getpid(),
+                                    threading.current_thread().ident)
+        with open(tmp_file, "w") as write_file:
+            write_file.write(data)
+        if os.path.exists(self.cache_file):
+            os.remove(self.cache_file)
+        os.rename(tmp_file, self.cache_file)
+
+    def scan_directory(self, directory, force=False):
+
+        """ Returns the index entry of a single directory, listed again
+        only when the directory mtime changed
+
+        Args:
+            directory: directory path
+            force: list the directory even if the mtime is unchanged.
+                   File systems with coarse mtime resolution do not
+                   change the mtime of files written within the same
+                   second
+
+        Returns:
+            dictionary of mtime, sub directory names and sequences,
+            None if the directory does not exist or can not be listed"""
+
+        key = self.__key(directory)
+        try:
+            mtime = os.path.getmtime(directory)
+        except OSError:
+            self.__forget(key)
+            return None
+
+        with self.lock:
+            entry = self.directories.get(key)
+        if entry and entry['mtime'] == mtime and not force:
+            return entry
+
+        try:
+            listing = list_directory(directory)
+        except OSError:
+            # Deleted after the mtime read or no permission to list it
+            self.__forget(key)
+            return None
+        subdirs = []
+        files = []
+        for name, is_dir, size in listing:
+            if is_dir:
+                subdirs.append(name)
+            else:
+                files.append((name, size))
+        entry = {
+            'mtime': mtime,
+            'subdirs': sorted(subdirs),
+            'sequences': group_sequences(files, self.extensions)
+        }
+        with self.lock:
+            self.directories[key] = entry
+            self.modified = True
+        return entry
+
+    def walk(self, root, is_cancelled=None, all_directories=False):
+
+        """ Walk the tree under the root through the index
+
+        Args:
+            root: top directory
+            is_cancelled: optional callable, the walk stops as soon
+                          as it returns true
+            all_directories: yield the directories without sequences too
+
+        Yields:
+            (directory, sequences) of every directory holding sequences"""
+
+        directories = [root]
+        while directories:
+            if is_cancelled and is_cancelled():
+                return
+            directory = directories.pop()
+            entry = self.scan_directory(directory)
+            if entry is None:
+                continue
+            if entry['sequences'] or all_directories:
+                yield directory, entry['sequences']
+            directories.extend(
+                os.path.join(directory, subdir)
+                for subdir in reversed(entry['subdirs'])
+            )
+
+    def scan(self, root):
+
+        """ Scan the whole tree and persist the index
+
+        Returns:
+            dictionary of directory and its sequences"""
+
+        sequences = dict(self.walk(root))
+        self.save()
+        return sequences
+
+    def get_mtime(self, directory):
+
+        """ Returns the indexed mtime of the directory, None if the
+        directory is not indexed yet"""
+
+        with self.lock:
+            entry = self.directories.get(self.__key(directory))
+        return entry['mtime'] if entry else None
+
+    def get_sequences(self, directory):
+
+        """ Returns the up to date sequences of a single directory"""
+
+        entry = self.scan_directory(directory)
+        return entry['sequences'] if entry else []
@@ -1,7 +1,27 @@
-import maya.cmds as cmds
+from __future__ import print_function
+import json
 import os
-import subprocess
-import sgtk
+import tempfile
+from multiprocessing.pool import ThreadPool
+from . import deadline_transport
+
+# Named Draft encode profiles. A profile without width and height 
+# takes the scene render resolution, the scale applied on top of it.
+#   dnxhd_1080 - the studio delivery mov
+#   review     - full scene resolution h264
+#   proxy      - half resolution mjpeg for quick dailies. The frames
+#                downscaled right after reading and mjpeg is far 
+#                cheaper to encode than dnxhd or h264
+ENCODE_PROFILES = {
+    'dnxhd_1080': {'codec': 'DNXHD', 'kbit_rate': 36000,
+                   'width': 1920, 'height': 1080, 'scale': 1.0},
+    'review': {'codec': 'H264', 'kbit_rate': 20000,
+               'width': None, 'height': None, 'scale': 1.0},
+    'proxy': {'codec': 'MJPEG', 'kbit_rate': 8000,
+              'width': None, 'height': None, 'scale': 0.5},
+}
+DEFAULT_ENCODE_PROFILE = 'dnxhd_1080'
+
 
 class SubmitToDeadline:
 
@@ -13,6 +33,8 @@ class SubmitToDeadline:
         1. HW2.0 exr 
         2. Draft Job
         3. Publishing Draft job to shotgrid
+    A farm rendered exr is verified before the Draft job, the bad
+    frames re-rendered by the verify job itself
     """
     
     def __init__(self,
@@ -38,6 +60,18 @@ class SubmitToDeadline:
                  shot='',
                  task='',
                  user='',
+                 multi_job_submission=True,
+                 transport=None,
+                 draft_segment_size=0,
+                 draft_prefetch_depth=4,
+                 draft_prefetch_memory_mb=2048,
+                 draft_checkpoint_size=0,
+                 encode_profile=DEFAULT_ENCODE_PROFILE,
+                 resolution=(1920, 1080),
+                 verify_frames=True,
+                 verify_retries=1,
+                 burn_in_lines=None,
+                 burn_in_frame_counter=False,
                 ):
         
         self.batch_name = batch_name
@@ -62,6 +96,18 @@ class SubmitToDeadline:
         self.shot = shot
         self.task = task
         self.user = user
+        self.multi_job_submission = multi_job_submission
+        self.transport = transport or deadline_transport.get_transport()
+        self.draft_segment_size = int(draft_segment_size)
+        self.draft_prefetch_depth = draft_prefetch_depth
+        self.draft_prefetch_memory_mb = draft_prefetch_memory_mb
+        self.draft_checkpoint_size = draft_checkpoint_size
+        self.encode_profile = encode_profile
+        self.resolution = resolution
+        self.verify_frames = verify_frames
+        self.verify_retries = verify_retries
+        self.burn_in_lines = list(burn_in_lines or [])
+        self.burn_in_frame_counter = burn_in_frame_counter
         
         self.deadline_files = []   
         self.msgs = ''
@@ -69,6 +115,7 @@ class SubmitToDeadline:
         self.maya_tmp_dir = "Y:/pipeline/studio/temp/" + \
                       os.environ.get( 'USERNAME' ) + "/" +\
                       "maya_" + os.environ.get('maya_version') + "/"
+        self.staging_dir = ''
 
     @staticmethod
     def __crete_directory(folder_path):
@@ -77,24 +124,58 @@ class SubmitToDeadline:
         
             dir_exist = os.path.exists(folder_path)
             if not dir_exist:
-                os.makedirs(folder_path)
+                try:
+                    os.makedirs(folder_path)
+                except OSError:
+                    # Created by a parallel submission in the meantime
+                    if not os.path.isdir(folder_path):
+                        raise
+
+    def get_staging_dir(self):
+
+        """ Returns the staging directory unique to this submission. 
+        All the job files and the publish script written inside it, so
+        parallel submissions of the same file name never overwrite 
+        each other"""
+
+        if not self.staging_dir:
+            submissions_dir = self.maya_tmp_dir + "submissions"
+            self.__crete_directory(submissions_dir)
+            self.staging_dir = tempfile.mkdtemp(
+                prefix="%s_%s_" %(self.file_name, 
+                                  self.camera_name.replace("|", "_").strip("_")),
+                dir=submissions_dir
+            )
+        return self.staging_dir
     
-    def __write_job_file(self, filename, data, job_type=''):
+    def __get_job_file(self, file_type, job_type=''):
 
-        """ Write the passing filename into .job file
+        """ Returns the .job file path of the job type
 
         Args:
-            filename: name of the file 
+            file_type: job_info or plugin_info
+            job_type: which job type. draft,exr or version publish"""
+
+        dl_job_dir =  self.get_staging_dir() + \
+                          "/%s/deadline_job_files" %job_type
+        return os.path.join(dl_job_dir, 
+                            "%s_%s_%s.job" %(file_type,
+                                             self.file_name, 
+                                             self.camera_name.replace("|", "_")))
+
+    def __write_job_file(self, file_type, data, job_type=''):
+
+        """ Write the passing data into .job file
+
+        Args:
+            file_type: job_info or plugin_info 
             job_type: which job type. draft,exr or version publish
 
         Returns:
             job file path"""
         
-        dl_job_dir =  self.maya_tmp_dir + \
-                          "/%s/deadline_job_files" %job_type
-        self.__crete_directory(dl_job_dir)
-
-        job_file = os.path.join(dl_job_dir, filename)
+        job_file = self.__get_job_file(file_type, job_type)
+        self.__crete_directory(os.path.dirname(job_file))
             
         with open(job_file, "w") as write_file:
             for key, value in data.items():
@@ -115,13 +196,15 @@ class SubmitToDeadline:
         
         if job_type == 'maya':
             plugin = 'MayaBatch'
-        elif job_type == 'draft':
+        elif job_type == 'draft' or \
+                    job_type == 'draft_concat':
             plugin = 'DraftPlugin'
-        elif job_type == 'version_publish':
+        elif job_type == 'version_publish' or \
+                    job_type == 'verify':
             plugin = 'Python'
                 
         dl_job_info = {
-            "BatchName": self.job_name,
+            "BatchName": self.batch_name or self.job_name,
             "Name": self.job_name,
             "Comment" : self.comment,
             "ChunkSize" : str(self.chunksize),
@@ -138,17 +221,67 @@ class SubmitToDeadline:
             dl_job_info["OutputFilename0"] = self.file_name 
             
         elif job_type == 'draft' or \
+                    job_type == 'draft_concat' or \
+                    job_type == 'verify' or \
                     job_type == 'version_publish':
                 if dep_job_id:
                     dl_job_info['JobDependency0'] = dep_job_id
 
-        job_info_file = self.__write_job_file("job_info_%s_%s.job" 
-                                        %(self.file_name, self.camera_name.replace("|", "_")), 
-                                        dl_job_info,
-                                        job_type)
+        # Chunked encode. Every deadline task of the draft job encodes
+        # one segment of frames, the concat job stitches them afterwards
+        if job_type == 'draft' and self.draft_segment_size:
+            dl_job_info['Frames'] = "%s-%s" %(str(self.start_frame), 
+                                              str(self.end_frame - 1))
+            dl_job_info['ChunkSize'] = str(self.draft_segment_size)
+        elif job_type == 'draft_concat':
+            dl_job_info['ChunkSize'] = '1'
+
+        job_info_file = self.__write_job_file("job_info", 
+                                              dl_job_info,
+                                              job_type)
         return job_info_file
         
         
+    def get_encode_settings(self):
+
+        """ Resolve the encode profile against the scene resolution
+
+        Returns:
+            dictionary of width, height, codec and kbit_rate"""
+
+        profile = ENCODE_PROFILES[self.encode_profile]
+        width = profile['width'] or self.resolution[0]
+        height = profile['height'] or self.resolution[1]
+        # Video codecs need even dimensions
+        width = int(width * profile['scale']) // 2 * 2
+        height = int(height * profile['scale']) // 2 * 2
+        return {
+            'width': width,
+            'height': height,
+            'codec': profile['codec'],
+            'kbit_rate': profile['kbit_rate']
+        }
+
+    def get_burn_in_file(self):
+
+        """ Write the burn in HUD fields the Draft job draws on every
+        frame. A json file keeps any character of the HUD text away 
+        from the deadline script argument quoting
+
+        Returns:
+            burn in json path, empty if there is nothing to burn in"""
+
+        if not self.burn_in_lines and not self.burn_in_frame_counter:
+            return ''
+        burn_in_file = os.path.join(self.get_staging_dir(), "burn_in.json")
+        if not os.path.exists(burn_in_file):
+            with open(burn_in_file, "w") as write_file:
+                json.dump({
+                    'lines': self.burn_in_lines,
+                    'frame_counter': self.burn_in_frame_counter
+                }, write_file, indent=4)
+        return burn_in_file
+
     def __plugin_job_info(self, job_type='', 
                         exr_path='',
                         mov_path=''):
@@ -175,17 +308,56 @@ class SubmitToDeadline:
                     "OutputFilePrefix" : os.path.join(self.folder_path ,
                                                 self.file_name,  self.file_name)
                 }
-        elif job_type == 'draft':
+        elif job_type == 'draft' or \
+                    job_type == 'draft_concat':
             
+            script_args = [
+                ('mov', mov_path),
+                ('exr', exr_path),
+                ('start_frame', str(self.start_frame)),
+                ('end_frame', str(self.end_frame)),
+                ('prefetch_depth', str(self.draft_prefetch_depth)),
+                ('prefetch_memory_mb', str(self.draft_prefetch_memory_mb)),
+                ('checkpoint_size', str(self.draft_checkpoint_size))
+            ]
+            encode_settings = self.get_encode_settings()
+            for setting in ('width', 'height', 'codec', 'kbit_rate'):
+                script_args.append((setting, str(encode_settings[setting])))
+            if self.draft_segment_size:
+                script_args += [
+                    ('mode', 'segment' if job_type == 'draft' else 'concat'),
+                    ('segment_size', str(self.draft_segment_size))
+                ]
+            burn_in_file = self.get_burn_in_file()
+            if burn_in_file:
+                script_args.append(('burn_in_file', burn_in_file))
             dl_plugin_job_info = {
-                'scriptFile': os.path.dirname(os.path.abspath(__file__)) +"/convert.py",
-                'ScriptArg0=mov': mov_path,
-                'ScriptArg1=exr': exr_path,
-                'ScriptArg2=start_frame': str(self.start_frame),
-                'ScriptArg3=end_frame':str(self.end_frame)   
+                'scriptFile': os.path.dirname(os.path.abspath(__file__)) +"/convert.py"
             }
+            for index, (arg_name, arg_value) in enumerate(script_args):
+                dl_plugin_job_info['ScriptArg%s=%s' %(index, arg_name)] = arg_value
             
-            
+
+        elif job_type == 'verify':
+            # The maya job files are read again by the verify job to
+            # submit the re-render of the bad frames
+            arguments = [
+                ('--exr', exr_path.replace("$F4", "####")),
+                ('--start-frame', str(self.start_frame)),
+                ('--end-frame', str(self.end_frame)),
+                ('--step', str(self.steps)),
+                ('--maya-job-info', self.__get_job_file("job_info", 'maya')),
+                ('--maya-plugin-info', self.__get_job_file("plugin_info", 'maya')),
+                ('--retries', str(self.verify_retries))
+            ]
+            dl_plugin_job_info = {
+                'ScriptFile': os.path.dirname(os.path.abspath(__file__)) +"/verify_frames.py",
+                'Arguments': " ".join('%s "%s"' %(arg_name, arg_value) 
+                                      for arg_name, arg_value in arguments),
+                'SingleFramesOnly': 'False',
+                'Version': '3.7'
+            }
+
         elif job_type == 'version_publish':
             dl_plugin_job_info = {
                 'Arguments' : ' ',
@@ -193,89 +365,86 @@ class SubmitToDeadline:
                 'Version': '3.7'
             }
             
-        plugin_info_file = self.__write_job_file("plugin_info_%s_%s.job" 
-                                            %(self.file_name, 
-                                                self.camera_name.replace("|", "_")),
-                                                dl_plugin_job_info,
-                                                job_type)
+        plugin_info_file = self.__write_job_file("plugin_info",
+                                                 dl_plugin_job_info,
+                                                 job_type)
         return plugin_info_file
     
 
     def send_to_farm(self, auxiliary_files = None):
 
-        """ Execute the deadline command 
-        
-        Submit the job and return the dealine job id
+        """ Submit the written job files through the transport
         
         Returns:
             job_id """
         
-        dl_path = os.environ['DEADLINE_PATH'] 
-        dl_path = dl_path.replace(r"/", "//") + "//deadlinecommand.exe"
-        dl_path = '"%s"' %dl_path
-        if not auxiliary_files:
-            dl_command = '%s %s' %(dl_path, " ".join(self.deadline_files))
-        else:
-            dl_command = '%s %s %s' %(dl_path, 
-                                    " ".join(self.deadline_files),
-                                    " ".join(auxiliary_files))
-        result = subprocess.Popen(dl_command, 
-                                stdout=subprocess.PIPE, 
-                                shell=True)
-        job_id = [id for id in result.communicate()[0].split() if 'JobID' in id]
-        return job_id[0]
+        job_files = list(self.deadline_files)
+        if auxiliary_files:
+            job_files += auxiliary_files
+        return self.transport.submit(job_files)
     
-    def submit(self):
+    def send_multiple_to_farm(self, jobs):
 
-        """ Perform submission of various job types
+        """ Submit several jobs in one transport call
 
-        if the publish mov parameter flag passed then the 
-        a draft job is created and passed to deadline farm.
-        The resulting job holds the job id of the HW2.0 job.
-        A publish Shotgrid is created and passed to renderfarm.
-        It holds the job id of the draft job
+        The whole HW2.0 -> Draft -> Publish chain goes to the repository
+        at once, every job depending on the job submitted before it.
+        For deadlinecommand it is a single multiple job submission, for
+        the web service the jobs share one keep-alive connection
 
-        Once all the submission done a pop up window appears and 
-        show the job id messages
-        """
-        
-        if self.farm_hardware_render:
-            self.__file_job_info(job_type='maya')
-            self.__plugin_job_info(job_type='maya')
-            
-            job_id = self.send_to_farm()
-            self.msgs += "Deadline Maya Job ID=%s\n" %str(job_id).split("=")[-1]
-        
-            self.deadline_files[:] = []
-            self.__file_job_info(job_type='draft', 
-                                 dep_job_id=job_id.split('=')[-1])
-        else:
-            
-            self.__file_job_info(job_type='draft')
-            
-        if self.publish_mov: 
-            
-            img_folder_path = os.path.join(self.folder_path ,
-                                    self.file_name )
-            full_path = img_folder_path + '/' + self.file_name + ".$F4.exr"
-            mov_path =  img_folder_path + '/' + self.file_name + ".mov"
-            self.__plugin_job_info(job_type='draft', 
-                            exr_path=full_path, 
-                            mov_path=mov_path)
-            draft_job_id = self.send_to_farm()
-            
-            engine = sgtk.platform.current_engine()
-            shot = self.shot if self.shot else engine.context.entity
-            shot_id = shot['id']
-            seq = self.seq if self.seq else engine.shotgun.find("Shot", 
-                                                    [['id', 'is', shot_id ]],
-                                                    ['sg_sequence'])[0]['sg_sequence']['name']
-            task = self.task if self.task else engine.context.task
-            project = self.project if self.project else engine.context.project
-            user = self.user if self.user else engine.context.user
-            exr_path = full_path.split("$F4")
-            exr_path = exr_path[0] + '####.exr'
-            publish_script = """ 
+        Args:
+            jobs: list of job file lists. Each item holds the job info,
+                  plugin info and any auxiliary files of a single job
+
+        Returns:
+            list of job ids in the submission order"""
+
+        return self.transport.submit_multiple(jobs)
+
+    def resolve_shotgrid_context(self):
+
+        """ Fill the shotgrid entities not passed by the caller from 
+        the current toolkit engine context.
+
+        Needs the toolkit engine, so the GUI calls it in the main thread 
+        before the submission is handed over to the worker thread"""
+
+        if self.shot and self.seq and self.task and \
+                    self.project and self.user:
+            return
+        # Imported here, the farm and the mayapy batch submission run
+        # without toolkit as long as no shotgrid entity is needed
+        import sgtk
+        engine = sgtk.platform.current_engine()
+        self.shot = self.shot if self.shot else engine.context.entity
+        shot_id = self.shot['id']
+        self.seq = self.seq if self.seq else engine.shotgun.find("Shot", 
+                                                [['id', 'is', shot_id ]],
+                                                ['sg_sequence'])[0]['sg_sequence']['name']
+        self.task = self.task if self.task else engine.context.task
+        self.project = self.project if self.project else engine.context.project
+        self.user = self.user if self.user else engine.context.user
+
+    def __write_publish_script(self, exr_path, mov_path):
+
+        """ Write the shotgrid version publish python script
+
+        Args:
+            exr_path: hw2.0 exr path
+            mov_path: draft job compleed mov path
+
+        Returns:
+            publish script file path"""
+
+        self.resolve_shotgrid_context()
+        shot = self.shot
+        seq = self.seq
+        task = self.task
+        project = self.project
+        user = self.user
+        exr_path = exr_path.split("$F4")
+        exr_path = exr_path[0] + '####.exr'
+        publish_script = """ 
 import shotgun_api3
 shotgun_api3.shotgun.NO_SSL_VALIDATION= True
 sg = shotgun_api3.Shotgun("https://future-associate.shotgunstudio.com",
@@ -304,36 +473,255 @@ sg.upload("Version", version_id['id'], r'%s', field_name="sg_uploaded_movie")
                     mov_path.replace("/", "\\"),
                     )
 
-            maya_playblast_version_py_dir =   self.maya_tmp_dir + \
-                                        "playblast/" + project['name'] + "/" + \
-                                        seq + "/" + shot['name'] 
-            self.__crete_directory(maya_playblast_version_py_dir) 
-            maya_playblast_version_py_file =  os.path.join(
-                        maya_playblast_version_py_dir, 
-                        self.file_name + ".py"
-            )
-            with open(maya_playblast_version_py_file, "w") as flipbook_file:
-                flipbook_file.write(publish_script)
+        maya_playblast_version_py_dir =   self.get_staging_dir() + \
+                                    "/playblast/" + project['name'] + "/" + \
+                                    seq + "/" + shot['name'] 
+        self.__crete_directory(maya_playblast_version_py_dir) 
+        maya_playblast_version_py_file =  os.path.join(
+                    maya_playblast_version_py_dir, 
+                    self.file_name + ".py"
+        )
+        with open(maya_playblast_version_py_file, "w") as flipbook_file:
+            flipbook_file.write(publish_script)
+        self.maya_playblast_version_py_files.append(
+                    maya_playblast_version_py_file
+        )
+        return maya_playblast_version_py_file
 
-            self.deadline_files[:] = []
-            
-            self.__file_job_info(job_type='version_publish', 
-                                 dep_job_id=draft_job_id.split('=')[-1])
-            self.__plugin_job_info(job_type='version_publish', 
-                            exr_path=full_path, 
-                            mov_path=mov_path)
-            
-            self.maya_playblast_version_py_files.append(
-                        maya_playblast_version_py_file
-            )
-            version_publish_job_id = self.send_to_farm(
-                auxiliary_files=self.maya_playblast_version_py_files
-            )
-            self.msgs+= "Deadline Draft Job Id=%s\n" %str(draft_job_id).split("=")[-1]
-            self.msgs+= "Deadline Mov Publish Job Id=%s\n" %str(version_publish_job_id).split("=")[-1]
-        
-        print self.msgs
-        myWin = cmds.window(title="FAE Message ", widthHeight=(300, 80))
-        cmds.columnLayout()
-        cmds.text(label=self.msgs)
-        cmds.showWindow(myWin)
+    def __write_job_files(self, job_type, dep_job_id='', 
+                          exr_path='', mov_path=''):
+
+        """ Write job info and plugin info of a single job 
+
+        Returns:
+            list of the written job file paths"""
+
+        self.deadline_files[:] = []
+        self.__file_job_info(job_type=job_type, dep_job_id=dep_job_id)
+        self.__plugin_job_info(job_type=job_type, 
+                               exr_path=exr_path, 
+                               mov_path=mov_path)
+        return list(self.deadline_files)
+
+    def __report(self, progress_callback, percent, stage):
+
+        """ Print the submission stage and pass it to the callback"""
+
+        print("Deadline submission %s%%: %s" %(percent, stage))
+        if progress_callback:
+            progress_callback(percent, stage)
+
+    def __get_job_types(self, full_path, mov_path, progress_callback=None):
+
+        """ Returns the chain of (job type, auxiliary files) in the 
+        dependency order. The publish script written here"""
+
+        job_types = []
+        if self.farm_hardware_render:
+            job_types.append(('maya', []))
+        if self.publish_mov:
+            if self.farm_hardware_render and self.verify_frames:
+                job_types.append(('verify', []))
+            self.__report(progress_callback, 10, "Writing publish script")
+            job_types.append(('draft', []))
+            if self.draft_segment_size:
+                job_types.append(('draft_concat', []))
+            job_types.append((
+                'version_publish', 
+                [self.__write_publish_script(full_path, mov_path)]
+            ))
+        return job_types
+
+    def write_job_chain(self, progress_callback=None):
+
+        """ Write the job files of every job in the chain up front
+
+        Returns:
+            list of (job type, job files) in the dependency order. 
+            Job files holds the job info, plugin info and the 
+            auxiliary files of the job"""
+
+        img_folder_path = os.path.join(self.folder_path ,
+                                self.file_name )
+        full_path = img_folder_path + '/' + self.file_name + ".$F4.exr"
+        mov_path =  img_folder_path + '/' + self.file_name + ".mov"
+
+        job_types = self.__get_job_types(full_path, mov_path, progress_callback)
+
+        job_chain = []
+        for job_type, auxiliary_files in job_types:
+            self.__report(progress_callback, 30, 
+                          "Writing %s job files" %job_type)
+            job_chain.append((
+                job_type,
+                self.__write_job_files(job_type, 
+                                       exr_path=full_path, 
+                                       mov_path=mov_path) + auxiliary_files
+            ))
+        return job_chain
+
+    def send_job_chain(self, job_chain, progress_callback=None):
+
+        """ Submit the written job chain in a single transport call
+
+        Returns:
+            job id messages"""
+
+        if not job_chain:
+            return self.msgs
+        self.__report(progress_callback, 60, 
+                      "Submitting %s jobs to deadline" %len(job_chain))
+        jobs = [job_files for job_type, job_files in job_chain]
+        if len(jobs) == 1:
+            job_ids = [self.transport.submit(jobs[0])]
+        else:
+            job_ids = self.send_multiple_to_farm(jobs)
+        self.__add_job_messages(job_chain, job_ids)
+        return self.msgs
+
+    def __add_job_messages(self, job_chain, job_ids):
+
+        job_messages = {
+            'maya': "Deadline Maya Job ID=%s\n",
+            'verify': "Deadline Frame Verify Job Id=%s\n",
+            'draft': "Deadline Draft Job Id=%s\n",
+            'draft_concat': "Deadline Draft Concat Job Id=%s\n",
+            'version_publish': "Deadline Mov Publish Job Id=%s\n"
+        }
+        for (job_type, job_files), job_id in zip(job_chain, job_ids):
+            self.msgs += job_messages[job_type] %job_id
+
+    def submit(self, progress_callback=None):
+
+        """ Perform submission of various job types
+
+        if the publish mov parameter flag passed then the 
+        a draft job is created and passed to deadline farm.
+        The resulting job holds the job id of the HW2.0 job.
+        A publish Shotgrid is created and passed to renderfarm.
+        It holds the job id of the draft job
+
+        In multi job submission mode all the job files written
+        up front and the chain submitted in one deadlinecommand call.
+        Otherwise every job is submitted one after another and the 
+        dependency written from the previous job id
+
+        No maya command is executed here so the method can run in
+        a worker thread.
+
+        Args:
+            progress_callback: optional callable receives the percent
+                               and the name of the current stage
+
+        Returns:
+            job id messages
+        """
+
+        if self.multi_job_submission:
+            job_chain = self.write_job_chain(progress_callback)
+            if job_chain:
+                self.send_job_chain(job_chain, progress_callback)
+        else:
+            img_folder_path = os.path.join(self.folder_path ,
+                                    self.file_name )
+            full_path = img_folder_path + '/' + self.file_name + ".$F4.exr"
+            mov_path =  img_folder_path + '/' + self.file_name + ".mov"
+
+            job_chain = self.__get_job_types(full_path, mov_path, progress_callback)
+
+            job_ids = []
+            dep_job_id = ''
+            for index, (job_type, auxiliary_files) in enumerate(job_chain):
+                self.__report(progress_callback, 
+                              20 + 70 * index // len(job_chain),
+                              "Submitting %s job to deadline" %job_type)
+                self.__write_job_files(job_type, 
+                                       dep_job_id=dep_job_id,
+                                       exr_path=full_path, 
+                                       mov_path=mov_path)
+                job_id = self.send_to_farm(auxiliary_files=auxiliary_files)
+                job_ids.append(job_id)
+                dep_job_id = job_id
+            self.__add_job_messages(job_chain, job_ids)
+
+        self.__report(progress_callback, 100, "Submitted")
+        print(self.msgs)
+        return self.msgs
+
+
+class SubmitBatchToDeadline:
+
+    """ Submit several SubmitToDeadline as one batch
+
+    Every submission (likewise one per camera) keeps its own staging
+    directory. The job files of all the submissions written in parallel
+    and the job chains submitted in parallel under a shared BatchName
+
+    Args:
+        submissions: list of SubmitToDeadline
+        batch_name: deadline batch name shared by all the jobs
+        processes: number of parallel threads
+
+    Attributes:
+        errors: error message of every submission after submit(),
+                empty for the submitted ones"""
+
+    def __init__(self, submissions, batch_name='', processes=4):
+
+        self.submissions = submissions
+        self.processes = processes
+        self.errors = [''] * len(submissions)
+        for submission in self.submissions:
+            submission.batch_name = batch_name
+
+    def submit(self, progress_callback=None):
+
+        """ Write and submit every job chain
+
+        A failing submission does not stop the others, its error is
+        reported in the returned messages
+
+        Returns:
+            job id messages of all the submissions"""
+
+        def write_job_chain(submission):
+            try:
+                return submission.write_job_chain(), ''
+            except Exception as err:
+                return None, "Writing the deadline job files failed\n%s\n" %err
+
+        def send_job_chain(submission_job_chain):
+            submission, (job_chain, error) = submission_job_chain
+            # Nothing sent for a submission whose job files failed
+            if error:
+                return error, error
+            try:
+                return submission.send_job_chain(job_chain), ''
+            except Exception as err:
+                error = "Deadline submission failed\n%s\n" %err
+                return error, error
+
+        def report(percent, stage):
+            print("Deadline batch submission %s%%: %s" %(percent, stage))
+            if progress_callback:
+                progress_callback(percent, stage)
+
+        pool = ThreadPool(self.processes)
+        try:
+            report(10, "Writing job files of %s submissions" %len(self.submissions))
+            job_chains = pool.map(write_job_chain, self.submissions)
+            report(50, "Submitting %s job chains to deadline" 
+                       %len([error for job_chain, error in job_chains if not error]))
+            results = pool.map(send_job_chain, zip(self.submissions, job_chains))
+        finally:
+            pool.close()
+            pool.join()
+
+        msgs = [msg for msg, error in results]
+        self.errors = [error for msg, error in results]
+
+        report(100, "Submitted")
+        return "\n".join(
+            "%s\n%s" %(submission.camera_name, msg) 
+            for submission, msg in zip(self.submissions, msgs)
+        )
@@ -0,0 +1,353 @@
+# Verifying the HW2.0 exrs before the Draft job encodes them.
+#
+# Runs on the farm as a deadline Python job between the Maya job and
+# the Draft job. Every expected frame checked in parallel
+#   - the frame exists and is not empty
+#   - the exr header is valid
+#   - for the scanline exrs, every chunk of the offset table points
+#     inside the file. A render killed while writing leaves zeroed
+#     offsets or a file ending before its last chunk
+# No pixel decoded, only the header and the offset table read.
+#
+# The missing or corrupt frames re-rendered by a new Maya job built
+# from the job files of the original Maya job with only those frames.
+# The verify job waits for the re-render and checks again, so the
+# Draft job depending on it is held until the frames are complete. A
+# re-render suspended, deleted or not finished within the timeout ends
+# the wait, the frames are checked again anyway.
+# The job fails when frames are still bad after the retries, and the
+# Draft job never starts.
+#
+# Arguments
+#   --exr               hashed exr path, shot_v001.####.exr
+#   --start-frame, --end-frame, --step
+#   --maya-job-info, --maya-plugin-info   job files of the Maya job
+#   --retries           re-render attempts (default 1)
+#   --threads           parallel frame checks (default 16)
+#   --poll-seconds      re-render job status poll interval (default 30)
+#   --timeout-minutes   longest wait for a re-render job (default 180)
+#
+from __future__ import print_function
+import argparse
+import math
+import os
+import struct
+import sys
+import time
+from multiprocessing.pool import ThreadPool
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import deadline_transport
+import sequence_index
+
+EXR_MAGIC = b'\x76\x2f\x31\x01'
+EXR_TILED_FLAG = 0x200
+EXR_DEEP_FLAG = 0x800
+EXR_MULTIPART_FLAG = 0x1000
+
+# Scanlines stored in a chunk by the compression method
+EXR_LINES_PER_CHUNK = {
+    0: 1,     # NONE
+    1: 1,     # RLE
+    2: 1,     # ZIPS
+    3: 16,    # ZIP
+    4: 32,    # PIZ
+    5: 16,    # PXR24
+    6: 32,    # B44
+    7: 32,    # B44A
+    8: 32,    # DWAA
+    9: 256    # DWAB
+}
+
+EXR_REQUIRED_ATTRIBUTES = ('channels', 'compression', 'dataWindow',
+                           'displayWindow', 'lineOrder')
+
+
+def get_frame_path(exr, frame):
+
+    """ Returns the frame path of the hashed exr path"""
+
+    directory, file_name = os.path.split(exr)
+    name, extension = os.path.splitext(file_name)
+    padding = len(name) - len(name.rstrip('#'))
+    if not padding:
+        return exr
+    return os.path.join(directory,
+                        "%s%0*d%s" %(name[:-padding], padding, frame, extension))
+
+
+def parse_exr_header(data):
+
+    """ Parse the exr attributes out of the leading bytes of the file
+
+    Returns:
+        tuple of version field, dictionary of attribute name to
+        (type, value bytes) and the offset the header ended. None if 
+        the header runs past the data
+
+    Raises:
+        ValueError: the header is not valid"""
+
+    if data[:4] != EXR_MAGIC:
+        raise ValueError("not an exr file")
+    if len(data) < 8:
+        return None
+    version = struct.unpack('<I', data[4:8])[0]
+
+    attributes = {}
+    offset = 8
+    while True:
+        name_end = data.find(b'\0', offset)
+        if name_end == -1:
+            return None
+        name = data[offset:name_end]
+        if not name:
+            # Empty name terminates the header
+            return version, attributes, name_end + 1
+        type_end = data.find(b'\0', name_end + 1)
+        if type_end == -1 or len(data) < type_end + 5:
+            return None
+        attribute_type = data[name_end + 1:type_end]
+        size = struct.unpack('<i', data[type_end + 1:type_end + 5])[0]
+        if size < 0:
+            raise ValueError("corrupt attribute %s" %name.decode('ascii', 'replace'))
+        value_start = type_end + 5
+        if len(data) < value_start + size:
+            return None
+        attributes[name.decode('ascii', 'replace')] = (
+            attribute_type.decode('ascii', 'replace'),
+            data[value_start:value_start + size]
+        )
+        offset = value_start + size
+
+
+def read_exr_header(read_file, file_size):
+
+    """ Read the exr header, more of the file read only when the
+    header is larger than the first block
+
+    Raises:
+        ValueError: the header is not valid or truncated"""
+
+    data = read_file.read(min(file_size, 65536))
+    while True:
+        header = parse_exr_header(data)
+        if header is not None:
+            return header
+        if len(data) >= file_size:
+            raise ValueError("truncated header")
+        data += read_file.read(min(file_size - len(data), len(data)))
+
+
+def check_exr(path, file_size):
+
+    """ Check the exr header and the offset table without decoding
+    any pixel
+
+    Returns:
+        error message, empty if the frame is valid"""
+
+    if file_size <= 0:
+        return "empty file"
+    try:
+        with open(path, 'rb') as read_file:
+            version, attributes, header_end = read_exr_header(read_file,
+                                                              file_size)
+            missing = [name for name in EXR_REQUIRED_ATTRIBUTES
+                       if name not in attributes]
+            if missing:
+                return "missing header attributes %s" %", ".join(missing)
+
+            # Tiled, deep and multipart exrs only get the header check
+            if version & (EXR_TILED_FLAG | EXR_DEEP_FLAG | EXR_MULTIPART_FLAG):
+                return ''
+
+            x_min, y_min, x_max, y_max = struct.unpack(
+                        '<4i', attributes['dataWindow'][1][:16])
+            compression = struct.unpack('<B',
+                        attributes['compression'][1][:1])[0]
+            if compression not in EXR_LINES_PER_CHUNK:
+                return "unknown compression %s" %compression
+            chunks = int(math.ceil((y_max - y_min + 1) /
+                                   float(EXR_LINES_PER_CHUNK[compression])))
+
+            read_file.seek(header_end)
+            table = read_file.read(chunks * 8)
+            if len(table) < chunks * 8:
+                return "truncated offset table"
+            offsets = struct.unpack('<%sQ' %chunks, table)
+            table_end = header_end + chunks * 8
+            for offset in offsets:
+                if offset < table_end or offset + 8 > file_size:
+                    return "missing scanline chunk, the file is truncated"
+
+            # The chunk written last has to end inside the file
+            last_offset = max(offsets)
+            read_file.seek(last_offset)
+            chunk_y, chunk_size = struct.unpack('<ii', read_file.read(8))
+            if chunk_size < 0 or last_offset + 8 + chunk_size > file_size:
+                return "last scanline chunk truncated"
+    except (IOError, OSError) as err:
+        return "unreadable: %s" %err
+    except (ValueError, struct.error) as err:
+        return "invalid header: %s" %err
+    return ''
+
+
+def verify_frames(exr, frames, threads=16):
+
+    """ Check every expected frame in parallel
+
+    The directory listed once through the sequence index helpers, the
+    missing and the empty frames known without opening any file
+
+    Returns:
+        dictionary of the bad frames and their errors"""
+
+    directory = os.path.dirname(exr)
+    try:
+        file_sizes = dict((name, size) for name, is_dir, size
+                          in sequence_index.list_directory(directory)
+                          if not is_dir)
+    except OSError:
+        file_sizes = {}
+
+    def check_frame(frame):
+        path = get_frame_path(exr, frame)
+        file_size = file_sizes.get(os.path.basename(path))
+        if file_size is None:
+            return frame, "missing"
+        return frame, check_exr(path, file_size)
+
+    pool = ThreadPool(max(1, threads))
+    try:
+        results = pool.map(check_frame, frames)
+    finally:
+        pool.close()
+        pool.join()
+    return dict((frame, error) for frame, error in results if error)
+
+
+def get_frame_ranges(frames):
+
+    """ Returns deadline frame list of the frames, likewise
+    1001-1003,1010"""
+
+    ranges = []
+    for frame in sorted(frames):
+        if ranges and frame == ranges[-1][1] + 1:
+            ranges[-1][1] = frame
+        else:
+            ranges.append([frame, frame])
+    return ",".join(
+        str(first) if first == last else "%s-%s" %(first, last)
+        for first, last in ranges
+    )
+
+
+def write_job_file(job_file, data):
+
+    with open(job_file, "w") as write_file:
+        for key, value in data.items():
+            write_file.write(key + "=" + value + "\n")
+
+
+def submit_rerender(maya_job_info, maya_plugin_info, frames, attempt, transport):
+
+    """ Submit a Maya job rendering only the frames, built from the
+    job files of the original Maya job
+
+    Returns:
+        job id"""
+
+    job_info = deadline_transport.read_job_file(maya_job_info)
+    plugin_info = deadline_transport.read_job_file(maya_plugin_info)
+    job_info['Frames'] = get_frame_ranges(frames)
+    job_info['ChunkSize'] = '1'
+    job_info['Name'] = "%s - rerender %s" %(job_info.get('Name', ''), attempt)
+
+    rerender_dir = os.path.join(os.path.dirname(maya_job_info),
+                                "rerender_%s" %attempt)
+    if not os.path.isdir(rerender_dir):
+        os.makedirs(rerender_dir)
+    job_files = [os.path.join(rerender_dir, os.path.basename(maya_job_info)),
+                 os.path.join(rerender_dir, os.path.basename(maya_plugin_info))]
+    write_job_file(job_files[0], job_info)
+    write_job_file(job_files[1], plugin_info)
+    return transport.submit(job_files)
+
+
+def wait_for_job(transport, job_id, poll_seconds=30, timeout_seconds=10800):
+
+    """ Wait until the job completed, failed, or was suspended or
+    deleted. A suspended job waits for someone to resume it, the
+    verify job does not hold its slot for that
+
+    Returns:
+        final status name, 'Timeout' if the job is still running after
+        timeout_seconds"""
+
+    start = time.time()
+    while True:
+        status = transport.get_job_status(job_id)
+        if status in ('Completed', 'Failed', 'Suspended', 'Deleted', 'Unknown'):
+            return status
+        if time.time() - start >= timeout_seconds:
+            return 'Timeout'
+        print("Waiting for the rerender job %s (%s)" %(job_id, status))
+        sys.stdout.flush()
+        time.sleep(poll_seconds)
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Verify the HW2.0 exrs")
+    parser.add_argument('--exr', required=True)
+    parser.add_argument('--start-frame', type=int, required=True)
+    parser.add_argument('--end-frame', type=int, required=True)
+    parser.add_argument('--step', type=int, default=1)
+    parser.add_argument('--maya-job-info', default='')
+    parser.add_argument('--maya-plugin-info', default='')
+    parser.add_argument('--retries', type=int, default=1)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--poll-seconds', type=int, default=30)
+    parser.add_argument('--timeout-minutes', type=int, default=180)
+    args = parser.parse_args()
+
+    frames = list(range(args.start_frame, args.end_frame + 1, max(1, args.step)))
+    transport = deadline_transport.get_transport()
+
+    attempt = 0
+    while True:
+        start = time.time()
+        bad_frames = verify_frames(args.exr, frames, args.threads)
+        print("Verified %s frames in %.2f seconds, %s bad" %(len(frames),
+                                                             time.time() - start,
+                                                             len(bad_frames)))
+        for frame in sorted(bad_frames):
+            print("  %s: %s" %(get_frame_path(args.exr, frame), bad_frames[frame]))
+        if not bad_frames:
+            return 0
+
+        if attempt >= args.retries or not args.maya_job_info:
+            print("Frames %s are still bad, the Draft job is not encoded"
+                  %get_frame_ranges(bad_frames))
+            return 1
+
+        attempt += 1
+        job_id = submit_rerender(args.maya_job_info,
+                                 args.maya_plugin_info,
+                                 bad_frames,
+                                 attempt,
+                                 transport)
+        print("Submitted rerender job %s for frames %s" %(job_id,
+                                                          get_frame_ranges(bad_frames)))
+        status = wait_for_job(transport, job_id, args.poll_seconds,
+                              args.timeout_minutes * 60)
+        print("Rerender job %s %s" %(job_id, status))
+        # Only the re-rendered frames need another check
+        frames = sorted(bad_frames)
+
+
+if __name__ == '__main__':
+    sys.exit(main())